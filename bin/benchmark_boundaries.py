@@ -0,0 +1,84 @@
+"""
+Time generating the annotation boundaries of a window containing 100,000
+phones, as done on every redraw while panning.
+
+    python bin/benchmark_boundaries.py [num_phones]
+"""
+import os
+import sys
+import time
+base = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0,base)
+
+import numpy as np
+
+from speechtools.intervals import AnnotationIndex
+from speechtools.plot.helper import generate_boundaries
+
+class Annotation(object):
+    def __init__(self, type, begin, end, label, **kwargs):
+        self._type = type
+        self.begin = begin
+        self.end = end
+        self.label = label
+        self.channel = 0
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+class Discourse(object):
+    def __init__(self, cache):
+        self.cache = cache
+
+class Hierarchy(object):
+    highest_to_lowest = ['utterance', 'word', 'phone']
+    lowest = 'phone'
+    subannotations = {}
+
+    def keys(self):
+        return self.highest_to_lowest
+
+def make_discourse(num_phones, phones_per_word = 4, words_per_utterance = 10):
+    phone_duration = 0.08
+    utterances = []
+    phones = []
+    words = []
+    for i in range(num_phones):
+        phones.append(Annotation('phone', i * phone_duration, (i + 1) * phone_duration, 'p'))
+        if len(phones) == phones_per_word or i == num_phones - 1:
+            words.append(Annotation('word', phones[0].begin, phones[-1].end, 'w', phone = phones))
+            phones = []
+        if len(words) == words_per_utterance or (i == num_phones - 1 and words):
+            utterances.append(Annotation('utterance', words[0].begin, words[-1].end, 'u',
+                                        word = words,
+                                        phone = [p for w in words for p in w.phone]))
+            words = []
+    return Discourse(utterances)
+
+def best_of(function, repeats = 5):
+    times = []
+    for i in range(repeats):
+        begin = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - begin)
+    return min(times)
+
+if __name__ == '__main__':
+    num_phones = 100000
+    if len(sys.argv) > 1:
+        num_phones = int(sys.argv[1])
+    discourse = make_discourse(num_phones)
+    hierarchy = Hierarchy()
+    end = discourse.cache[-1].end
+
+    begin = time.perf_counter()
+    index = AnnotationIndex(discourse)
+    for k in hierarchy.keys():
+        index.array(k, 0)
+    print('Building arrays for {} phones: {:.1f} ms'.format(num_phones, (time.perf_counter() - begin) * 1000))
+
+    redraw = lambda: generate_boundaries(index, hierarchy, 0, end)
+    print('Redraw with all phones visible: {:.1f} ms'.format(best_of(redraw) * 1000))
+
+    offsets = np.linspace(0, end * 0.9, 50)
+    pan = lambda: [generate_boundaries(index, hierarchy, x, x + end * 0.1) for x in offsets]
+    print('Redraw while panning over 10% of the phones: {:.2f} ms'.format(best_of(pan) / len(offsets) * 1000))
@@ -50,5 +50,6 @@ setup(name='speechtools',
     cmdclass={'test': PyTest},
     extras_require={
         'testing': ['pytest', 'pytest-qt'],
+        'export': ['pyarrow', 'pandas', 'tables'],
     }
       )
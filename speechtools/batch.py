@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import time
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .scheduler import JobScheduler
+
+from .tasks import ENRICHMENT_TASKS, export_query, invalidate_corpus
+
+CONNECTION_KEYS = ['graph_host', 'graph_port', 'graph_user', 'graph_password']
+
+class ProgressPrinter(object):
+    """
+    Call back for a task that prints its status messages, and its progress
+    every tenth of the way, to a stream.
+    """
+    lock = threading.Lock()
+
+    def __init__(self, label, out = sys.stdout):
+        self.label = label
+        self.out = out
+        self.maximum = None
+        self.last = None
+
+    def write(self, text):
+        with self.lock:
+            self.out.write('[{}] {}\n'.format(self.label, text))
+            self.out.flush()
+
+    def __call__(self, *args):
+        if isinstance(args[0], str):
+            self.write(args[0])
+            return
+        if isinstance(args[0], dict):
+            self.write(args[0]['status'])
+            return
+        if len(args) > 1:
+            self.maximum = args[1]
+            self.last = None
+        if not self.maximum:
+            return
+        tenth = int(10 * args[0] / self.maximum)
+        if tenth != self.last:
+            self.last = tenth
+            self.write('{}/{} ({}%)'.format(args[0], self.maximum, tenth * 10))
+
+def pipeline_steps(pipeline):
+    """
+    Convert a pipeline into the steps of a job graph.
+
+    A pipeline lists corpora, each with an optional directory to
+    ``import`` from, a list of ``enrichments`` and a list of ``exports`` of
+    saved query and export profiles.  The steps of a corpus run in that
+    order, each one after the previous, and its exports run after the last
+    enrichment, concurrently with each other.  Corpora are independent of
+    each other.
+    """
+    steps = []
+    for corpus in pipeline['corpora']:
+        name = corpus['name']
+        previous = []
+        if corpus.get('import') is not None:
+            steps.append({'name': '{}:import'.format(name), 'step': 'import',
+                        'corpus': name, 'params': {'directory': corpus['import']}})
+            previous = [steps[-1]['name']]
+        for i, enrichment in enumerate(corpus.get('enrichments', [])):
+            step = enrichment['step']
+            if step not in ENRICHMENT_TASKS or step == 'import':
+                raise(ValueError('Unknown enrichment {} for corpus {}.'.format(step, name)))
+            params = {k: v for k, v in enrichment.items() if k != 'step'}
+            steps.append({'name': '{}:{}:{}'.format(name, i, step), 'step': step,
+                        'corpus': name, 'params': params, 'after': previous})
+            previous = [steps[-1]['name']]
+        for i, export in enumerate(corpus.get('exports', [])):
+            steps.append({'name': '{}:export:{}'.format(name, i), 'step': 'export',
+                        'corpus': name, 'params': dict(export), 'after': previous,
+                        'writes': [('file', os.path.abspath(export['path']))]})
+    return steps
+
+def load_profile(cls, name):
+    """
+    Load a saved profile by its name, or from a path to a profile file.
+    """
+    if os.path.exists(name):
+        with open(name, 'rb') as f:
+            return pickle.load(f)
+    return cls.load_profile(name)
+
+def corpus_config(corpus, connection):
+    from polyglotdb.config import CorpusConfig
+    return CorpusConfig(corpus, **connection)
+
+def run_job(job, connection, call_back, stop_check):
+    """
+    Run one job of a pipeline in the current thread.
+    """
+    params = dict(job.params)
+    params['call_back'] = call_back
+    params['stop_check'] = stop_check
+    if job.step == 'import':
+        params['name'] = job.corpus
+        params.update({k: v for k, v in connection.items() if k in ('graph_host', 'graph_port')})
+        try:
+            return ENRICHMENT_TASKS['import'](**params)
+        finally:
+            invalidate_corpus(job.corpus)
+    params['config'] = corpus_config(job.corpus, connection)
+    if job.step == 'export':
+        from .profiles import QueryProfile, ExportProfile
+        params['profile'] = load_profile(QueryProfile, params.pop('query_profile'))
+        params['export_profile'] = load_profile(ExportProfile, params.pop('export_profile'))
+        return export_query(**params)
+    try:
+        return ENRICHMENT_TASKS[job.step](**params)
+    finally:
+        invalidate_corpus(job.corpus)
+
+def run_pipeline(pipeline, out = sys.stdout, max_concurrent = None):
+    """
+    Run a pipeline, printing progress to ``out``, and return a report of
+    the state and timing of every job.
+
+    Jobs run in threads, at most ``max_concurrent`` at a time (by default
+    the pipeline's ``max_concurrent``, or 2), and steps writing to the
+    same corpus run one after another.  A KeyboardInterrupt stops the
+    running jobs and cancels the rest.
+    """
+    if max_concurrent is None:
+        max_concurrent = pipeline.get('max_concurrent', 2)
+    connection = {k: pipeline[k] for k in CONNECTION_KEYS if k in pipeline}
+    scheduler = JobScheduler(max_concurrent)
+    jobs = scheduler.add_graph(pipeline_steps(pipeline))
+    stopped = threading.Event()
+    printers = {job: ProgressPrinter('{} {}'.format(job.corpus, job.step), out) for job in jobs}
+
+    begin = time.time()
+    running = {}
+    with ThreadPoolExecutor(max_workers = max_concurrent) as executor:
+        try:
+            while True:
+                for job in scheduler.ready():
+                    scheduler.start(job)
+                    printers[job].write('running')
+                    future = executor.submit(run_job, job, connection, printers[job], stopped.is_set)
+                    running[future] = job
+                if not running:
+                    break
+                done, pending = wait(running, return_when = FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        changed = scheduler.finish(job, 'failed', repr(error))
+                    elif stopped.is_set() or future.result() is False:
+                        changed = scheduler.finish(job, 'cancelled')
+                    else:
+                        changed = scheduler.finish(job)
+                    for x in changed:
+                        if x.state == 'failed':
+                            printers[x].write('failed: {}'.format(x.error))
+                        elif x.duration is not None:
+                            printers[x].write('{} in {:.1f} seconds'.format(x.state, x.duration))
+                        else:
+                            printers[x].write(x.state)
+        except KeyboardInterrupt:
+            stopped.set()
+            for job in scheduler.pending():
+                scheduler.cancel(job)
+            wait(running)
+            for future, job in running.items():
+                error = future.exception()
+                scheduler.finish(job, 'cancelled' if error is None else 'failed',
+                                None if error is None else repr(error))
+    timings = scheduler.timings()
+    for timing, job in zip(timings, scheduler.jobs):
+        if job.begin is not None:
+            timing['begin'] -= begin
+            timing['end'] -= begin
+        timing['error'] = job.error
+    return {'total': time.time() - begin, 'succeeded': all(x.state == 'done' for x in jobs),
+            'jobs': timings}
+
+def run_pipeline_file(path, timings = None, max_concurrent = None, out = sys.stdout):
+    """
+    Run the pipeline in a JSON file and write the JSON report to
+    ``timings``, or to ``out`` if no path is given.  Returns the exit
+    status of the run.
+    """
+    with open(path, 'r') as f:
+        pipeline = json.load(f)
+    report = run_pipeline(pipeline, out, max_concurrent)
+    report['pipeline'] = os.path.abspath(path)
+    if timings is None:
+        json.dump(report, out, indent = 2)
+        out.write('\n')
+    else:
+        with open(timings, 'w') as f:
+            json.dump(report, f, indent = 2)
+    return 0 if report['succeeded'] else 1
@@ -0,0 +1,159 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+
+from polyglotdb.config import BASE_DIR
+
+CACHE_DIR = os.path.join(BASE_DIR, 'query_cache')
+
+MAX_CACHE_SIZE = 500 * 1024 * 1024
+
+def hash_string(string):
+    return hashlib.sha1(string.encode('utf8')).hexdigest()
+
+class QueryCache(object):
+    """
+    On-disk cache of query results.
+
+    Entries are keyed on the corpus name, the Cypher of the query, its
+    parameters and a version stamp for the corpus.  The stamp combines
+    the corpus hierarchy with a counter that is bumped by ``invalidate``
+    whenever the graph is changed from within the program, so stale
+    results are never returned.  The least recently used entries are
+    removed once the cache grows past ``max_size`` bytes.
+    """
+    extension = '.pickle'
+    def __init__(self, directory = CACHE_DIR, max_size = MAX_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+    @property
+    def versions_path(self):
+        return os.path.join(self.directory, 'versions.json')
+
+    def files(self):
+        try:
+            return os.listdir(self.directory)
+        except OSError:
+            return []
+
+    def load_versions(self):
+        try:
+            with open(self.versions_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def version(self, corpus_name):
+        with self.lock:
+            return self.load_versions().get(corpus_name, 0)
+
+    def prefix(self, corpus_name):
+        return hash_string(corpus_name)[:10] + '-'
+
+    def key(self, corpus_context, query):
+        corpus_name = corpus_context.corpus_name
+        try:
+            hierarchy = hashlib.sha1(pickle.dumps(corpus_context.hierarchy)).hexdigest()
+        except Exception:
+            hierarchy = ''
+        params = ''
+        # Filter values are passed separately from the Cypher text
+        # when the query supports it, so they must be part of the key
+        if hasattr(query, 'cypher_params'):
+            params = repr(sorted(query.cypher_params().items()))
+        key = '\n'.join([corpus_name, str(self.version(corpus_name)), hierarchy,
+                        query.cypher(), params])
+        return self.prefix(corpus_name) + hash_string(key)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.extension)
+
+    def get(self, corpus_context, query):
+        path = self.path(self.key(corpus_context, query))
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return None
+        try:
+            with f:
+                results = pickle.load(f)
+        except Exception:
+            # Truncated files, or results pickled by other versions of
+            # the program or its dependencies, are dropped as misses
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return results
+
+    def put(self, corpus_context, query, results):
+        path = self.path(self.key(corpus_context, query))
+        temp_path = path + '.tmp{}'.format(threading.get_ident())
+        try:
+            os.makedirs(self.directory, exist_ok = True)
+            with open(temp_path, 'wb') as f:
+                pickle.dump(results, f, protocol = pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.evict()
+
+    def entries(self):
+        entries = []
+        for f in self.files():
+            if not f.endswith(self.extension):
+                continue
+            path = os.path.join(self.directory, f)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        with self.lock:
+            entries = sorted(self.entries())
+            total = sum(x[1] for x in entries)
+            for mtime, size, path in entries:
+                if total <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+
+    def invalidate(self, corpus_name):
+        with self.lock:
+            versions = self.load_versions()
+            versions[corpus_name] = versions.get(corpus_name, 0) + 1
+            os.makedirs(self.directory, exist_ok = True)
+            with open(self.versions_path, 'w') as f:
+                json.dump(versions, f)
+            prefix = self.prefix(corpus_name)
+            for f in self.files():
+                if f.startswith(prefix):
+                    try:
+                        os.remove(os.path.join(self.directory, f))
+                    except OSError:
+                        pass
+
+    def clear(self):
+        with self.lock:
+            for f in self.files():
+                if f.endswith(self.extension):
+                    os.remove(os.path.join(self.directory, f))
+
+query_cache = QueryCache()
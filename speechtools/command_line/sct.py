@@ -1,5 +1,6 @@
 import os
 import sys
+import argparse
 
 import mock
 
@@ -19,13 +20,54 @@ for mod_name in MOCK_MODULES:
 
 import multiprocessing
 
-from speechtools.main import MainWindow, QtWidgets
+def parse_args(argv):
+    # The GUI passes unknown arguments on to Qt, so ``run`` is recognized
+    # here rather than as an argparse subcommand
+    if argv[:1] == ['run']:
+        parser = argparse.ArgumentParser(prog = 'sct run',
+                        description = 'Run a pipeline of imports, enrichments and exports '
+                        'without the GUI')
+        parser.add_argument('pipeline', help = 'JSON file describing the pipeline')
+        parser.add_argument('--timings', default = None, metavar = 'PATH',
+                            help = 'write the JSON timings of the jobs to PATH instead of stdout')
+        parser.add_argument('-j', '--max-concurrent', type = int, default = None,
+                            help = 'number of jobs to run at once (overrides the pipeline)')
+        args = parser.parse_args(argv[1:])
+        args.command = 'run'
+        return args, []
+    parser = argparse.ArgumentParser(prog = 'sct', description = 'Speech Corpus Tools',
+                                    epilog = 'Use "sct run PIPELINE" to run a pipeline without the GUI.')
+    parser.add_argument('--import-times', nargs = '?', const = '', default = None, metavar = 'LOG',
+                        help = 'write a summary of the time taken by imports at startup and '
+                        'exit to LOG (import_times.log in the SCT directory by default)')
+    args, qt_args = parser.parse_known_args(argv)
+    args.command = None
+    return args, qt_args
 
-if __name__ == '__main__':
+def main():
     multiprocessing.freeze_support()
-    app = QtWidgets.QApplication(sys.argv)
+    args, qt_args = parse_args(sys.argv[1:])
+    if args.command == 'run':
+        from speechtools.batch import run_pipeline_file
+        sys.exit(run_pipeline_file(args.pipeline, args.timings, args.max_concurrent))
+    if args.import_times is not None:
+        from speechtools.importtime import import_timer
+        import_timer.install()
+
+    from speechtools.main import MainWindow, QtWidgets
+
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
     main = MainWindow(app)
 
     app.setActiveWindow(main)
     main.show()
+    if args.import_times is not None:
+        from polyglotdb.config import BASE_DIR
+        path = args.import_times or os.path.join(BASE_DIR, 'import_times.log')
+        import_timer.write_report(path, 'startup')
+        app.aboutToQuit.connect(lambda: import_timer.write_report(path, 'session'))
+        print('Writing import times to {}'.format(path))
     sys.exit(app.exec_())
+
+if __name__ == '__main__':
+    main()
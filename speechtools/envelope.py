@@ -0,0 +1,175 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from polyglotdb.config import BASE_DIR
+
+from .sound import load_signal
+
+ENVELOPE_DIR = os.path.join(BASE_DIR, 'envelopes')
+
+ENVELOPE_VERSION = 1
+
+def envelope_paths(sound_path):
+    """
+    Return the data and metadata paths for a sound file's envelope,
+    next to the sound file if that directory is writable and under
+    BASE_DIR otherwise.
+    """
+    directory = os.path.dirname(os.path.abspath(sound_path))
+    name = os.path.basename(sound_path)
+    if not os.access(directory, os.W_OK):
+        directory = ENVELOPE_DIR
+        os.makedirs(directory, exist_ok = True)
+        name = hashlib.sha1(os.path.abspath(sound_path).encode('utf8')).hexdigest() + '_' + name
+    base = os.path.join(directory, name + '.envelope')
+    return base + '.npy', base + '.json'
+
+class EnvelopePyramid(object):
+    """
+    Min/max envelope of a sound file at power-of-two block sizes.
+
+    Level ``k`` holds the minimum and maximum of every block of
+    ``base_block * 2 ** k`` samples, for each channel.  All levels are
+    stored in a single memory-mapped .npy file with a JSON file of
+    offsets, so that drawing any window only reads about as many blocks
+    as there are pixel columns.
+    """
+    base_block = 16
+    chunk_size = 2 ** 20
+    def __init__(self, sound_path, data, meta):
+        self.sound_path = sound_path
+        self.data = data
+        self.sr = meta['sr']
+        self.num_channels = meta['num_channels']
+        self.num_samples = meta['num_samples']
+        self.block_sizes = meta['block_sizes']
+        self.offsets = meta['offsets']
+        self.lengths = meta['lengths']
+
+    @staticmethod
+    def source_stamp(sound_path):
+        stat = os.stat(sound_path)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime, 'version': ENVELOPE_VERSION}
+
+    @classmethod
+    def load(cls, sound_path):
+        data_path, meta_path = envelope_paths(sound_path)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('source') != cls.source_stamp(sound_path):
+            return None
+        try:
+            data = np.load(data_path, mmap_mode = 'r')
+        except (OSError, ValueError):
+            return None
+        return cls(sound_path, data, meta)
+
+    @classmethod
+    def load_or_build(cls, sound_path, call_back = None, stop_check = None):
+        pyramid = cls.load(sound_path)
+        if pyramid is None:
+            pyramid = cls.build(sound_path, call_back, stop_check)
+        return pyramid
+
+    @classmethod
+    def build(cls, sound_path, call_back = None, stop_check = None):
+        data_path, meta_path = envelope_paths(sound_path)
+        sr, signal, scale, offset = load_signal(sound_path)
+        num_samples, num_channels = signal.shape
+
+        lengths = []
+        block_sizes = []
+        length = int(np.ceil(num_samples / cls.base_block))
+        block = cls.base_block
+        while True:
+            lengths.append(length)
+            block_sizes.append(block)
+            if length <= 1:
+                break
+            length = int(np.ceil(length / 2))
+            block *= 2
+        offsets = [int(x) for x in np.cumsum([0] + lengths[:-1])]
+
+        temp_path = data_path + '.tmp'
+        data = np.lib.format.open_memmap(temp_path, mode = 'w+', dtype = np.float32,
+                                        shape = (sum(lengths), num_channels, 2))
+        if call_back is not None:
+            call_back('Building waveform envelope...')
+            call_back(0, num_samples)
+
+        for begin in range(0, num_samples, cls.chunk_size):
+            if stop_check is not None and stop_check():
+                del data
+                os.remove(temp_path)
+                return None
+            chunk = np.asarray(signal[begin:begin + cls.chunk_size], dtype = np.float32)
+            chunk = (chunk - offset) / scale
+            remainder = chunk.shape[0] % cls.base_block
+            if remainder:
+                pad = np.repeat(chunk[-1:], cls.base_block - remainder, axis = 0)
+                chunk = np.concatenate([chunk, pad])
+            chunk = chunk.reshape(-1, cls.base_block, num_channels)
+            b = begin // cls.base_block
+            data[b:b + chunk.shape[0], :, 0] = chunk.min(axis = 1)
+            data[b:b + chunk.shape[0], :, 1] = chunk.max(axis = 1)
+            if call_back is not None:
+                call_back(begin + chunk.shape[0] * cls.base_block)
+
+        for k in range(1, len(lengths)):
+            previous = data[offsets[k - 1]:offsets[k - 1] + lengths[k - 1]]
+            if previous.shape[0] % 2:
+                previous = np.concatenate([previous, previous[-1:]])
+            previous = previous.reshape(-1, 2, num_channels, 2)
+            level = data[offsets[k]:offsets[k] + lengths[k]]
+            level[:, :, 0] = previous[:, :, :, 0].min(axis = 1)
+            level[:, :, 1] = previous[:, :, :, 1].max(axis = 1)
+        data.flush()
+        del data
+        os.replace(temp_path, data_path)
+
+        meta = {'sr': int(sr), 'num_channels': num_channels, 'num_samples': num_samples,
+                'block_sizes': block_sizes, 'offsets': offsets, 'lengths': lengths,
+                'source': cls.source_stamp(sound_path)}
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+        return cls(sound_path, np.load(data_path, mmap_mode = 'r'), meta)
+
+    def level_for(self, begin, end, num_columns):
+        """
+        Return the coarsest level with at least one block per pixel column,
+        or None if the window is zoomed in past the finest level.
+        """
+        samples_per_column = (end - begin) * self.sr / max(num_columns, 1)
+        level = None
+        for k, block in enumerate(self.block_sizes):
+            if block > samples_per_column:
+                break
+            level = k
+        return level
+
+    def visible(self, begin, end, channel, num_columns):
+        """
+        Return the envelope of a window as an (N, 2) array of times and
+        amplitudes alternating between each block's minimum and maximum,
+        or None if the raw signal should be drawn instead.
+        """
+        level = self.level_for(begin, end, num_columns)
+        if level is None:
+            return None
+        if channel >= self.num_channels:
+            channel = 0
+        block = self.block_sizes[level]
+        first = max(int(np.floor(begin * self.sr / block)), 0)
+        last = min(int(np.ceil(end * self.sr / block)), self.lengths[level])
+        if last <= first:
+            return None
+        offset = self.offsets[level]
+        values = np.asarray(self.data[offset + first:offset + last, channel, :]).reshape(-1)
+        times = np.repeat((np.arange(first, last) + 0.5) * block / self.sr, 2)
+        return np.column_stack((times, values)).astype(np.float64)
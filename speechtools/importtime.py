@@ -0,0 +1,100 @@
+import sys
+import time
+
+class TimedLoader(object):
+    """
+    Wraps a module loader to time the execution of the module.
+    """
+    def __init__(self, loader, timer):
+        self.loader = loader
+        self.timer = timer
+
+    def __getattr__(self, key):
+        return getattr(self.loader, key)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.timer.enter(module.__name__)
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.timer.exit()
+
+class ImportTimer(object):
+    """
+    Records how long each module takes to import, in the manner of
+    ``python -X importtime``.
+
+    Once installed, the timer finds modules through the rest of
+    ``sys.meta_path`` and wraps their loaders.  The cumulative time of a
+    module includes the modules it imports for the first time, and its
+    self time excludes them.
+    """
+    def __init__(self):
+        self.records = []
+        self.stack = []
+        self.installed = False
+
+    def find_spec(self, name, path, target = None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                spec.loader = TimedLoader(spec.loader, self)
+            return spec
+        return None
+
+    def enter(self, name):
+        self.stack.append([name, time.perf_counter(), 0])
+
+    def exit(self):
+        name, begin, children = self.stack.pop()
+        cumulative = time.perf_counter() - begin
+        if self.stack:
+            self.stack[-1][2] += cumulative
+        self.records.append((name, cumulative - children, cumulative, len(self.stack)))
+
+    def install(self):
+        if not self.installed:
+            sys.meta_path.insert(0, self)
+            self.installed = True
+
+    def uninstall(self):
+        if self.installed:
+            sys.meta_path.remove(self)
+            self.installed = False
+
+    def report(self, limit = 40):
+        """
+        Return a summary of the slowest imports by cumulative time, and of
+        the top-level packages by self time.
+        """
+        lines = ['Imported {} modules'.format(len(self.records))]
+        lines.append('')
+        lines.append('{:>10} | {:>10} | module'.format('self (ms)', 'cum. (ms)'))
+        for name, own, cumulative, depth in sorted(self.records, key = lambda x: -x[2])[:limit]:
+            lines.append('{:>10.1f} | {:>10.1f} | {}{}'.format(own * 1000, cumulative * 1000,
+                                                            '  ' * depth, name))
+        packages = {}
+        for name, own, cumulative, depth in self.records:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + own
+        lines.append('')
+        lines.append('{:>10} | package'.format('self (ms)'))
+        for package, own in sorted(packages.items(), key = lambda x: -x[1])[:limit]:
+            lines.append('{:>10.1f} | {}'.format(own * 1000, package))
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, path, title = None):
+        with open(path, 'a') as f:
+            if title is not None:
+                f.write('== {} ==\n'.format(title))
+            f.write(self.report())
+            f.write('\n')
+
+import_timer = ImportTimer()
@@ -0,0 +1,191 @@
+import numpy as np
+
+annotation_dtype = np.dtype([('begin', np.float64), ('end', np.float64), ('label', object),
+                            ('slot', np.int32), ('slots', np.int32)])
+
+class IntervalIndex(object):
+    """
+    Static index over a set of intervals.
+
+    Intervals are kept sorted by begin time along with a running maximum
+    of their end times, so that both the candidates overlapping a window
+    and those containing a point can be found with binary searches.
+    Lookups are O(log n + k) for tiers without deeply nested intervals,
+    which covers annotation tiers.
+
+    Parameters
+    ----------
+    items : list
+        Objects to index
+    begins : iterable of float
+        Begin time of each item
+    ends : iterable of float
+        End time of each item
+    """
+    def __init__(self, items, begins, ends):
+        begins = np.asarray(begins, dtype = np.float64)
+        ends = np.asarray(ends, dtype = np.float64)
+        order = np.argsort(begins, kind = 'mergesort')
+        self.items = [items[i] for i in order]
+        self.begins = begins[order]
+        self.ends = ends[order]
+        if len(self.ends):
+            self.max_ends = np.maximum.accumulate(self.ends)
+        else:
+            self.max_ends = self.ends
+
+    def __len__(self):
+        return len(self.items)
+
+    def overlapping_indices(self, begin, end):
+        lo = 0
+        hi = len(self.items)
+        if begin is not None:
+            lo = np.searchsorted(self.max_ends, begin, side = 'right')
+        if end is not None:
+            hi = np.searchsorted(self.begins, end, side = 'left')
+        if lo >= hi:
+            return np.empty(0, dtype = np.int64)
+        indices = np.arange(lo, hi)
+        if begin is not None:
+            indices = indices[self.ends[lo:hi] > begin]
+        return indices
+
+    def overlapping(self, begin = None, end = None):
+        """
+        Return the items ending after ``begin`` and beginning before ``end``,
+        ordered by begin time.
+        """
+        return [self.items[i] for i in self.overlapping_indices(begin, end)]
+
+    def containing(self, time):
+        """
+        Return the first item (by begin time) whose interval includes
+        ``time``, or None.
+        """
+        lo = np.searchsorted(self.max_ends, time, side = 'left')
+        hi = np.searchsorted(self.begins, time, side = 'right')
+        if lo >= hi:
+            return None
+        matches = np.nonzero(self.ends[lo:hi] >= time)[0]
+        if not len(matches):
+            return None
+        return self.items[lo + matches[0]]
+
+class AnnotationIndex(object):
+    """
+    Interval indexes over the annotations cached by a discourse model,
+    one per annotation key and channel.
+
+    Keys follow ``find_annotation``: the highest annotation type, the name
+    of a lower annotation type, or a tuple of an annotation type and a
+    subannotation type.  Indexes for keys other than the highest type are
+    built the first time they are needed, and every index that has been
+    built is rebuilt by ``rebuild`` whenever the cache changes.
+    """
+    def __init__(self, discourse_model = None):
+        self.discourse_model = discourse_model
+        self.indexes = {}
+        self.arrays = {}
+        self.keys = set()
+        self.rebuild()
+
+    def rebuild(self):
+        self.indexes = {}
+        self.arrays = {}
+        if self.discourse_model is None:
+            return
+        for channel in self.channels():
+            self.build(None, channel)
+            for key in self.keys:
+                self.build(key, channel)
+
+    def channels(self):
+        return sorted(set(a.channel for a in self.discourse_model.cache))
+
+    def elements(self, key, channel):
+        for a in self.discourse_model.cache:
+            if a.channel != channel:
+                continue
+            if key is None or key == a._type:
+                yield a
+            elif isinstance(key, tuple):
+                for e in self.parents(a, key[0]):
+                    for s in getattr(e, key[1]):
+                        yield s
+            else:
+                for e in getattr(a, key):
+                    yield e
+
+    def parents(self, annotation, type):
+        if annotation._type == type:
+            return [annotation]
+        return getattr(annotation, type)
+
+    def build(self, key, channel):
+        elements = list(self.elements(key, channel))
+        index = IntervalIndex(elements, [x.begin for x in elements], [x.end for x in elements])
+        self.indexes[key, channel] = index
+        return index
+
+    def resolve(self, key):
+        cache = self.discourse_model.cache
+        if key is not None and len(cache) and key == cache[0]._type:
+            return None
+        return key
+
+    def index(self, key, channel):
+        if self.discourse_model is None:
+            return IntervalIndex([], [], [])
+        key = self.resolve(key)
+        if key is not None:
+            self.keys.add(key)
+        try:
+            return self.indexes[key, channel]
+        except KeyError:
+            return self.build(key, channel)
+
+    def array(self, key, channel = 0):
+        """
+        Structured array of the begin, end and label of each element of
+        ``index(key, channel)``, in the same order.  ``slot`` and ``slots``
+        give the position of a subannotation among those of its parent, and
+        are 0 and 1 for other annotations.
+        """
+        if self.discourse_model is None:
+            return np.empty(0, dtype = annotation_dtype)
+        key = self.resolve(key)
+        try:
+            return self.arrays[key, channel]
+        except KeyError:
+            pass
+        index = self.index(key, channel)
+        array = np.empty(len(index), dtype = annotation_dtype)
+        array['begin'] = index.begins
+        array['end'] = index.ends
+        labels = [getattr(x, 'label', None) for x in index.items]
+        array['label'] = ['' if x is None else x for x in labels]
+        array['slot'] = 0
+        array['slots'] = 1
+        if isinstance(key, tuple):
+            positions = {}
+            for a in self.discourse_model.cache:
+                if a.channel != channel:
+                    continue
+                for e in self.parents(a, key[0]):
+                    subs = getattr(e, key[1])
+                    for i, s in enumerate(subs):
+                        positions[id(s)] = (i, len(subs))
+            for i, x in enumerate(index.items):
+                array['slot'][i], array['slots'][i] = positions[id(x)]
+        self.arrays[key, channel] = array
+        return array
+
+    def annotations(self, begin = None, end = None, channel = 0):
+        """
+        Highest level annotations overlapping the window, ordered by begin.
+        """
+        return self.index(None, channel).overlapping(begin, end)
+
+    def find_annotation(self, key, time, channel = 0):
+        return self.index(key, channel).containing(time)
@@ -4,12 +4,13 @@ import pickle
 
 from PyQt5 import QtGui, QtCore, QtWidgets
 import PyQt5
-import vispy
 
 from polyglotdb.config import BASE_DIR, CorpusConfig
 
 from polyglotdb import CorpusContext
 
+from .metadata import metadata_cache
+
 from polyglotdb.exceptions import ConnectionError
 
 from .widgets import (ViewWidget, HelpWidget, DiscourseWidget, QueryWidget, CollapsibleWidgetPair,
@@ -34,7 +35,8 @@ from .workers import (AcousticAnalysisWorker, ImportCorpusWorker,
                     SyllabicEncodingWorker, PhoneSubsetEncodingWorker,
                     SyllableEncodingWorker, LexiconEnrichmentWorker,
                     FeatureEnrichmentWorker, HierarchicalPropertiesWorker,
-                    QueryWorker, ExportQueryWorker, RelativizedMeasuresWorker, SpeakerEnrichmentWorker)
+                    QueryWorker, ExportQueryWorker, RelativizedMeasuresWorker, SpeakerEnrichmentWorker,
+                    MetadataWorker, WorkerRegistry, JobQueue)
 
 sct_config_pickle_path = os.path.join(BASE_DIR, 'config')
 
@@ -59,6 +61,7 @@ class LeftPane(Pane):
         self.queryWidget.needsShrinking.connect(self.growLower)
         self.viewWidget.needsShrinking.connect(self.growUpper)
         self.queryWidget.viewRequested.connect(self.changeDiscourse)
+        self.queryWidget.lookaheadRequested.connect(self.viewWidget.prepareDiscourses)
 
         self.splitter = CollapsibleWidgetPair(QtCore.Qt.Vertical, self.queryWidget, self.viewWidget, collapsible = 0)
 
@@ -85,7 +88,8 @@ class RightPane(Pane):
         if os.path.exists(sct_config_pickle_path):
             with open(sct_config_pickle_path, 'rb') as f:
                 config = pickle.load(f)
-            if config.corpus_name:
+            # Cached metadata is revalidated in the background once connected
+            if config.corpus_name and metadata_cache.load(config) is None:
                 try:
                     with CorpusContext(config) as c:
                         c.hierarchy = c.generate_hierarchy()
@@ -99,10 +103,8 @@ class RightPane(Pane):
         self.discourseWidget = DiscourseWidget()
         self.configUpdated.connect(self.discourseWidget.updateConfig)
         self.discourseWidget.discourseChanged.connect(self.discourseChanged.emit)
-        self.helpWidget = HelpWidget()
-        self.helpPopup = ExportHelpWidget()
+        self.helpPopup = None
         self.detailsWidget = DetailsWidget()
-        self.acousticsWidget = AcousticDetailsWidget()
         upper = CollapsibleTabWidget()
         upper.needsShrinking.connect(self.growLower)
 
@@ -114,9 +116,11 @@ class RightPane(Pane):
 
         lower.addTab(self.detailsWidget, 'Details')
 
-        lower.addTab(self.acousticsWidget, 'Acoustics')
+        # Tabs that start hidden are only constructed once they are shown
+        # or sent something to display
+        self.acousticsWidget = lower.addLazyTab(AcousticDetailsWidget, 'Acoustics')
 
-        lower.addTab(self.helpWidget, 'Help')
+        self.helpWidget = lower.addLazyTab(HelpWidget, 'Help')
 
         self.splitter = CollapsibleWidgetPair(QtCore.Qt.Vertical, upper, lower)
 
@@ -124,6 +128,11 @@ class RightPane(Pane):
         layout.addWidget(self.splitter)
         self.setLayout(layout)
 
+    def exportHelp(self, options):
+        if self.helpPopup is None:
+            self.helpPopup = ExportHelpWidget()
+        self.helpPopup.exportHelp(options)
+
 class MainWindow(QtWidgets.QMainWindow):
     enrichHelpBroadcast= QtCore.pyqtSignal()
     configUpdated = QtCore.pyqtSignal(object)
@@ -138,24 +147,25 @@ class MainWindow(QtWidgets.QMainWindow):
         self.leftPane = LeftPane()
         self.configUpdated.connect(self.leftPane.updateConfig)
         self.leftPane.viewWidget.connectionIssues.connect(self.havingConnectionIssues)
+        self.leftPane.viewWidget.lookaheadFailed.connect(self.showLookaheadError)
 
         self.rightPane = RightPane()
         self.rightPane.configUpdated.connect(self.updateConfig)
         self.rightPane.discourseChanged.connect(self.leftPane.changeDiscourse)
 
-        self.rightPane.connectWidget.corporaHelpBroadcast.connect(self.rightPane.helpWidget.getConnectionHelp)
+        self.rightPane.connectWidget.corporaHelpBroadcast.connect(self.rightPane.helpWidget.forward('getConnectionHelp'))
 
 
         self.leftPane.viewWidget.discourseWidget.nextRequested.connect(self.leftPane.queryWidget.requestNext)
         self.leftPane.viewWidget.discourseWidget.previousRequested.connect(self.leftPane.queryWidget.requestPrevious)
         self.leftPane.viewWidget.discourseWidget.markedAsAnnotated.connect(self.leftPane.queryWidget.markAnnotated)
         self.leftPane.viewWidget.discourseWidget.selectionChanged.connect(self.rightPane.detailsWidget.showDetails)
-        self.leftPane.viewWidget.discourseWidget.acousticsSelected.connect(self.rightPane.acousticsWidget.showDetails)
+        self.leftPane.viewWidget.discourseWidget.acousticsSelected.connect(self.rightPane.acousticsWidget.forward('showDetails'))
         self.mainWidget = CollapsibleWidgetPair(QtCore.Qt.Horizontal, self.leftPane,self.rightPane)
-        self.leftPane.queryWidget.needsHelp.connect(self.rightPane.helpWidget.getHelpInfo)
-        self.leftPane.queryWidget.exportHelpBroadcast.connect(self.rightPane.helpPopup.exportHelp)
-        self.enrichHelpBroadcast.connect(self.rightPane.helpWidget.getEnrichHelp)
-        self.leftPane.viewWidget.discourseWidget.discourseHelpBroadcast.connect(self.rightPane.helpWidget.getDiscourseHelp)
+        self.leftPane.queryWidget.needsHelp.connect(self.rightPane.helpWidget.forward('getHelpInfo'))
+        self.leftPane.queryWidget.exportHelpBroadcast.connect(self.rightPane.exportHelp)
+        self.enrichHelpBroadcast.connect(self.rightPane.helpWidget.forward('getEnrichHelp'))
+        self.leftPane.viewWidget.discourseWidget.discourseHelpBroadcast.connect(self.rightPane.helpWidget.forward('getDiscourseHelp'))
         self.leftPane.queryWidget.queryForm.queryToRun.connect(self.runQuery)
         self.leftPane.queryWidget.queryForm.queryToExport.connect(self.exportQuery)
 
@@ -173,84 +183,64 @@ class MainWindow(QtWidgets.QMainWindow):
         self.createActions()
         self.createMenus()
 
+        # Workers are only constructed when they are first used
+        self.workers = WorkerRegistry()
+        # Each revalidation is numbered, and one requested while another is
+        # running starts once that one has finished
+        self.metadataGeneration = 0
+        self.metadataPending = False
+        self.workers.register('metadata', MetadataWorker,
+                            dataReady = self.refreshMetadata,
+                            errorEncountered = self.havingConnectionIssues,
+                            finished = self.startMetadata)
+
         self.updateStatus()
 
         if os.path.exists(sct_config_pickle_path):
             self.rightPane.connectWidget.connectToServer(ignore=True)
 
 
-        self.queryWorker = QueryWorker()
-        self.queryWorker.dataReady.connect(self.leftPane.queryWidget.updateResults)
-        self.queryWorker.errorEncountered.connect(self.showError)
-        self.queryWorker.errorEncountered.connect(self.leftPane.queryWidget.queryForm.finishQuery)
-        self.queryWorker.dataReady.connect(self.leftPane.queryWidget.queryForm.finishQuery)
-        self.queryWorker.finishedCancelling.connect(self.leftPane.queryWidget.queryForm.finishQuery)
-
-        self.exportWorker = ExportQueryWorker()
-        self.exportWorker.errorEncountered.connect(self.showError)
-        self.exportWorker.errorEncountered.connect(self.leftPane.queryWidget.queryForm.finishExport)
-        self.exportWorker.dataReady.connect(self.leftPane.queryWidget.queryForm.finishExport)
-        self.exportWorker.finishedCancelling.connect(self.leftPane.queryWidget.queryForm.finishExport)
-
-        self.acousticWorker = AcousticAnalysisWorker()
-        self.acousticWorker.errorEncountered.connect(self.showError)
-
-        self.importWorker = ImportCorpusWorker()
-        self.importWorker.errorEncountered.connect(self.showError)
-        self.importWorker.dataReady.connect(self.checkImport)
-
-        self.syllabicsWorker = SyllabicEncodingWorker()
-        self.syllabicsWorker.errorEncountered.connect(self.showError)
-        self.syllabicsWorker.dataReady.connect(self.updateStatus)
-
-        self.syllablesWorker = SyllableEncodingWorker()
-        self.syllablesWorker.errorEncountered.connect(self.showError)
-        self.syllablesWorker.dataReady.connect(self.updateStatus)
-
-        self.pauseWorker = PauseEncodingWorker()
-        self.pauseWorker.errorEncountered.connect(self.showError)
-        self.pauseWorker.dataReady.connect(self.updateStatus)
-
-        self.utteranceWorker = UtteranceEncodingWorker()
-        self.utteranceWorker.errorEncountered.connect(self.showError)
-        self.utteranceWorker.dataReady.connect(self.updateStatus)
-
-        self.speechRateWorker = SpeechRateWorker()
-        self.speechRateWorker.errorEncountered.connect(self.showError)
-        self.speechRateWorker.dataReady.connect(self.updateStatus)
-
-        self.utterancePositionWorker = UtterancePositionWorker()
-        self.utterancePositionWorker.errorEncountered.connect(self.showError)
-        self.utterancePositionWorker.dataReady.connect(self.updateStatus)
-
-        self.phoneSubsetWorker = PhoneSubsetEncodingWorker()
-        self.phoneSubsetWorker.errorEncountered.connect(self.showError)
-        self.phoneSubsetWorker.dataReady.connect(self.updateStatus)
-
-        self.enrichLexiconWorker = LexiconEnrichmentWorker()
-        self.enrichLexiconWorker.errorEncountered.connect(self.showError)
-        self.enrichLexiconWorker.dataReady.connect(self.updateStatus)
-
-        self.enrichFeaturesWorker = FeatureEnrichmentWorker()
-        self.enrichFeaturesWorker.errorEncountered.connect(self.showError)
-        self.enrichFeaturesWorker.dataReady.connect(self.updateStatus)
-
-        self.enrichSpeakersWorker = SpeakerEnrichmentWorker()
-        self.enrichSpeakersWorker.errorEncountered.connect(self.showError)
-        self.enrichSpeakersWorker.dataReady.connect(self.updateStatus)
-
-        self.hierarchicalPropertiesWorker = HierarchicalPropertiesWorker()
-        self.hierarchicalPropertiesWorker.errorEncountered.connect(self.showError)
-        self.hierarchicalPropertiesWorker.dataReady.connect(self.updateStatus)
-
-        self.relativizedMeasuresWorker = RelativizedMeasuresWorker()
-        self.relativizedMeasuresWorker.errorEncountered.connect(self.showError)
-        self.relativizedMeasuresWorker.dataReady.connect(self.updateStatus)
+        finishQuery = self.leftPane.queryWidget.queryForm.finishQuery
+        finishExport = self.leftPane.queryWidget.queryForm.finishExport
+        self.workers.register('query', QueryWorker,
+                            dataReady = [self.leftPane.queryWidget.updateResults, finishQuery],
+                            errorEncountered = [self.showError, finishQuery],
+                            finishedCancelling = finishQuery)
+        self.workers.register('export', ExportQueryWorker,
+                            dataReady = finishExport,
+                            errorEncountered = [self.showError, finishExport],
+                            finishedCancelling = finishExport)
+        self.workers.register('acoustic', AcousticAnalysisWorker, errorEncountered = self.showError)
+        self.workers.register('import', ImportCorpusWorker,
+                            dataReady = self.checkImport, errorEncountered = self.showError)
+
+        enrichment = [('syllabics', SyllabicEncodingWorker),
+                    ('syllables', SyllableEncodingWorker),
+                    ('pauses', PauseEncodingWorker),
+                    ('utterances', UtteranceEncodingWorker),
+                    ('speech_rate', SpeechRateWorker),
+                    ('utterance_position', UtterancePositionWorker),
+                    ('subset', PhoneSubsetEncodingWorker),
+                    ('lexicon', LexiconEnrichmentWorker),
+                    ('features', FeatureEnrichmentWorker),
+                    ('speakers', SpeakerEnrichmentWorker),
+                    ('hierarchical', HierarchicalPropertiesWorker),
+                    ('relativized', RelativizedMeasuresWorker)]
+        for name, worker in enrichment:
+            self.workers.register(name, worker,
+                                dataReady = self.updateStatus, errorEncountered = self.showError)
         
-        self.rightPane.connectWidget.corporaList.cancelImporter.connect(self.importWorker.stop)
+        self.rightPane.connectWidget.corporaList.cancelImporter.connect(lambda: self.workers.stop('import'))
         self.rightPane.connectWidget.corporaList.corpusToImport.connect(self.importCorpus)
         self.progressWidget = ProgressWidget(self)
 
+        # Enrichments and imports run through a queue that orders them by
+        # their dependencies and runs steps writing to the same corpus one
+        # at a time
+        self.jobs = JobQueue(self.workers, max_concurrent = 2)
+        self.jobs.jobChanged.connect(self.progressWidget.updateJob)
+        self.jobs.jobStarted.connect(self.showJob)
+
     def exportQuery(self, query_profile, export_profile, path):
 
         kwargs = {}
@@ -258,20 +248,20 @@ class MainWindow(QtWidgets.QMainWindow):
         kwargs['profile'] = query_profile
         kwargs['export_profile'] = export_profile
         kwargs['path'] = path
-        self.exportWorker.setParams(kwargs)
-        self.progressWidget.createProgressBar('export', self.exportWorker)
+        self.workers['export'].setParams(kwargs)
+        self.progressWidget.createProgressBar('export', self.workers['export'])
         self.progressWidget.show()
-        self.exportWorker.start()
+        self.workers['export'].start()
 
     def runQuery(self, query_profile):
         kwargs = {}
         kwargs['config'] = self.corpusConfig
         kwargs['profile'] = query_profile
 
-        self.queryWorker.setParams(kwargs)
-        self.progressWidget.createProgressBar('query', self.queryWorker)
+        self.workers['query'].setParams(kwargs)
+        self.progressWidget.createProgressBar('query', self.workers['query'])
         self.progressWidget.show()
-        self.queryWorker.start()
+        self.workers['query'].start()
 
     def checkImport(self, could_not_parse):
         if could_not_parse:
@@ -289,6 +279,12 @@ class MainWindow(QtWidgets.QMainWindow):
         reply.setDetailedText(str(e))
         ret = reply.exec_()
 
+    def showLookaheadError(self, e):
+        # Tracebacks end with the message of the exception
+        lines = str(e).strip().splitlines()
+        message = lines[-1] if lines else ''
+        self.statusBar().showMessage('Could not prepare upcoming results: {}'.format(message), 10000)
+
     def havingConnectionIssues(self):
         size = get_system_font_height()
         self.connectionStatus.setPixmap(QtWidgets.qApp.style().standardIcon(QtWidgets.QStyle.SP_MessageBoxWarning).pixmap(size, size))
@@ -297,6 +293,34 @@ class MainWindow(QtWidgets.QMainWindow):
     def updateConfig(self, config):
         self.corpusConfig = config
         self.updateStatus()
+        self.revalidateMetadata()
+
+    def revalidateMetadata(self):
+        self.metadataGeneration += 1
+        if self.corpusConfig is None or not self.corpusConfig.corpus_name:
+            self.metadataPending = False
+            return
+        self.metadataPending = True
+        if self.workers['metadata'].isRunning():
+            # Its results are stale and ignored once it returns
+            self.workers['metadata'].stop()
+            return
+        self.startMetadata()
+
+    def startMetadata(self):
+        if not self.metadataPending:
+            return
+        self.metadataPending = False
+        self.workers['metadata'].setParams({'config': self.corpusConfig,
+                                            'generation': self.metadataGeneration})
+        self.workers['metadata'].start()
+
+    def refreshMetadata(self, data):
+        config, changed, generation = data
+        if generation != self.metadataGeneration:
+            return
+        if changed and config is self.corpusConfig:
+            self.updateStatus()
 
     def updateStatus(self):
         self.encodeHierarchicalPropertiesAct.setEnabled(False)
@@ -328,37 +352,39 @@ class MainWindow(QtWidgets.QMainWindow):
             if not c_name:
                 c_name = 'No corpus selected'
             else:
-                with CorpusContext(self.corpusConfig) as c:
-                    self.pausesAct.setEnabled(True)
-                    self.encodeHierarchicalPropertiesAct.setEnabled(True)
-                    self.enrichLexiconAct.setEnabled(True)
-                    self.enrichFeaturesAct.setEnabled(True)
-                    self.syllabicsAct.setEnabled(True)
-                    self.phoneSubsetAct.setEnabled(True)
-                    if c.hierarchy.has_type_subset(c.phone_name, 'syllabic'):
-                        self.syllabicsAct.setText("Re-encode syllabic segments...")
-                        self.syllablesAct.setEnabled(True)
-                    if 'syllable' in c.hierarchy.annotation_types:
-                        self.syllablesAct.setText("Re-encode syllables...")
-                    if c.hierarchy.has_token_subset(c.word_name, 'pause'):
-                        self.pausesAct.setText("Re-encode non-speech elements...")
-                    if c.hierarchy.has_token_subset(c.word_name, 'pause') and self.corpusConfig.graph_host == 'localhost':
-                        self.utterancesAct.setEnabled(True)
-                    else:
-                        self.utterancesAct.setEnabled(False)
-                    if 'utterance' in c.hierarchy.annotation_types:
-                        self.utterancesAct.setText("Re-encode utterances...")
-                        self.speechRateAct.setEnabled(True)
-                        self.utterancePositionAct.setEnabled(True)
-                    else:
-                        self.speechRateAct.setEnabled(False)
-                        self.utterancePositionAct.setEnabled(False)
-
-                    if c.hierarchy.has_token_property('utterance', 'speech_rate'):
-                        self.speechRateAct.setText("Re-encode speech rate...")
-
-                    if c.hierarchy.has_token_property(c.word_name, 'position_in_utterance'):
-                        self.utterancePositionAct.setText("Re-encode position in utterance...")
+                hierarchy = metadata_cache.get(self.corpusConfig, 'hierarchy')
+                phone_name = metadata_cache.get(self.corpusConfig, 'phone_name')
+                word_name = metadata_cache.get(self.corpusConfig, 'word_name')
+                self.pausesAct.setEnabled(True)
+                self.encodeHierarchicalPropertiesAct.setEnabled(True)
+                self.enrichLexiconAct.setEnabled(True)
+                self.enrichFeaturesAct.setEnabled(True)
+                self.syllabicsAct.setEnabled(True)
+                self.phoneSubsetAct.setEnabled(True)
+                if hierarchy.has_type_subset(phone_name, 'syllabic'):
+                    self.syllabicsAct.setText("Re-encode syllabic segments...")
+                    self.syllablesAct.setEnabled(True)
+                if 'syllable' in hierarchy.annotation_types:
+                    self.syllablesAct.setText("Re-encode syllables...")
+                if hierarchy.has_token_subset(word_name, 'pause'):
+                    self.pausesAct.setText("Re-encode non-speech elements...")
+                if hierarchy.has_token_subset(word_name, 'pause') and self.corpusConfig.graph_host == 'localhost':
+                    self.utterancesAct.setEnabled(True)
+                else:
+                    self.utterancesAct.setEnabled(False)
+                if 'utterance' in hierarchy.annotation_types:
+                    self.utterancesAct.setText("Re-encode utterances...")
+                    self.speechRateAct.setEnabled(True)
+                    self.utterancePositionAct.setEnabled(True)
+                else:
+                    self.speechRateAct.setEnabled(False)
+                    self.utterancePositionAct.setEnabled(False)
+
+                if hierarchy.has_token_property('utterance', 'speech_rate'):
+                    self.speechRateAct.setText("Re-encode speech rate...")
+
+                if hierarchy.has_token_property(word_name, 'position_in_utterance'):
+                    self.utterancePositionAct.setText("Re-encode position in utterance...")
             self.enrichHelpAct.setEnabled(True)
             self.enrichHelpAct.setText("Help")
             self.status.setText('Connected to {} ({})'.format(self.corpusConfig.graph_hostname, c_name))
@@ -495,10 +521,7 @@ class MainWindow(QtWidgets.QMainWindow):
             kwargs = {'config': self.corpusConfig,
                         'path': path,
                         'case_sensitive': case_sensitive}
-            self.enrichLexiconWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('lexicon', self.enrichLexiconWorker)
-            self.progressWidget.show()
-            self.enrichLexiconWorker.start()
+            self.submitJob('lexicon', kwargs)
 
     def enrichFeatures(self):
         dialog = EnrichFeaturesDialog(self.corpusConfig, self)
@@ -506,10 +529,7 @@ class MainWindow(QtWidgets.QMainWindow):
             path = dialog.value()
             kwargs = {'config': self.corpusConfig,
                         'path': path}
-            self.enrichFeaturesWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('features', self.enrichFeaturesWorker)
-            self.progressWidget.show()
-            self.enrichFeaturesWorker.start()
+            self.submitJob('features', kwargs)
 
     def enrichSpeakers(self):
         dialog = EnrichSpeakersDialog(self.corpusConfig, self)
@@ -517,10 +537,7 @@ class MainWindow(QtWidgets.QMainWindow):
             path = dialog.value()
             kwargs = {'config': self.corpusConfig,
                         'path': path}
-            self.enrichSpeakersWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('speakers', self.enrichSpeakersWorker)
-            self.progressWidget.show()
-            self.enrichSpeakersWorker.start()
+            self.submitJob('speakers', kwargs)
 
     def encodeSyllabics(self):
         dialog = EncodeSyllabicsDialog(self.corpusConfig, self)
@@ -528,10 +545,7 @@ class MainWindow(QtWidgets.QMainWindow):
             segments = dialog.value()
             kwargs = {'config': self.corpusConfig,
                         'segments': segments}
-            self.syllabicsWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('syllabics', self.syllabicsWorker)
-            self.progressWidget.show()
-            self.syllabicsWorker.start()
+            self.submitJob('syllabics', kwargs)
 
     def encodeSyllables(self):
         dialog = EncodeSyllablesDialog(self.corpusConfig, self)
@@ -539,10 +553,7 @@ class MainWindow(QtWidgets.QMainWindow):
             algorithm = dialog.value()
             kwargs = {'config': self.corpusConfig,
                         'algorithm': algorithm}
-            self.syllablesWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('syllables', self.syllablesWorker)
-            self.progressWidget.show()
-            self.syllablesWorker.start()
+            self.submitJob('syllables', kwargs)
 
     def encodePhoneSubset(self):
         dialog = EncodePhoneSubsetDialog(self.corpusConfig, self)
@@ -551,10 +562,7 @@ class MainWindow(QtWidgets.QMainWindow):
             kwargs = {'config': self.corpusConfig,
                         'label': label,
                         'segments': segments}
-            self.phoneSubsetWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('subset', self.phoneSubsetWorker)
-            self.progressWidget.show()
-            self.phoneSubsetWorker.start()
+            self.submitJob('subset', kwargs)
 
     def encodePauses(self):
         dialog = EncodePauseDialog(self.corpusConfig, self)
@@ -562,20 +570,14 @@ class MainWindow(QtWidgets.QMainWindow):
             words = dialog.value()
             kwargs = {'config': self.corpusConfig,
                         'pause_words': words}
-            self.pauseWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('pauses', self.pauseWorker)
-            self.progressWidget.show()
-            self.pauseWorker.start()
+            self.submitJob('pauses', kwargs)
 
     def encodeHierarchicalProperties(self):
         dialog = EncodeHierarchicalPropertiesDialog(self.corpusConfig, self)
         if dialog.exec_() == QtWidgets.QDialog.Accepted:
             kwargs = dialog.value()
             kwargs.update({'config': self.corpusConfig})
-            self.hierarchicalPropertiesWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('hierarchical', self.hierarchicalPropertiesWorker)
-            self.progressWidget.show()
-            self.hierarchicalPropertiesWorker.start()
+            self.submitJob('hierarchical', kwargs)
 
     def encodeUtterances(self):
         dialog = EncodeUtteranceDialog(self.corpusConfig, self)
@@ -584,10 +586,7 @@ class MainWindow(QtWidgets.QMainWindow):
             kwargs = {'config': self.corpusConfig,
                         'min_pause_length': min_pause,
                         'min_utterance_length': min_utt}
-            self.utteranceWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('utterances', self.utteranceWorker)
-            self.progressWidget.show()
-            self.utteranceWorker.start()
+            self.submitJob('utterances', kwargs)
 
     def encodeRelativizedMeasures(self):
         dialog = EncodeRelativizedMeasuresDialog(self.corpusConfig, self)
@@ -596,10 +595,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
             kwargs = ({'config': self.corpusConfig,
                         'measure': measure})    
-            self.relativizedMeasuresWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('relativized', self.relativizedMeasuresWorker)
-            self.progressWidget.show()
-            self.relativizedMeasuresWorker.start()
+            self.submitJob('relativized', kwargs)
         
 
     def getEnrichHelp(self):
@@ -611,19 +607,13 @@ class MainWindow(QtWidgets.QMainWindow):
             subset = dialog.value()
             kwargs = {'config': self.corpusConfig,
                         'to_count': subset}
-            self.speechRateWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('speech_rate', self.speechRateWorker)
-            self.progressWidget.show()
-            self.speechRateWorker.start()
+            self.submitJob('speech_rate', kwargs)
 
     def utterancePosition(self):
         dialog = EncodeUtterancePositionDialog(self.corpusConfig, self)
         if dialog.exec_() == QtWidgets.QDialog.Accepted:
             kwargs = {'config': self.corpusConfig}
-            self.utterancePositionWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('utterance_position', self.utterancePositionWorker)
-            self.progressWidget.show()
-            self.utterancePositionWorker.start()
+            self.submitJob('utterance_position', kwargs)
 
     def analyzeAcoustics(self):
         dialog = AnalyzeAcousticsDialog(self.corpusConfig, self)
@@ -631,19 +621,20 @@ class MainWindow(QtWidgets.QMainWindow):
             acoustics = dialog.value()
             kwargs = {'config': self.corpusConfig,
                     'acoustics': acoustics}
-            self.acousticWorker.setParams(kwargs)
-            self.progressWidget.createProgressBar('acoustic', self.acousticWorker)
-            self.progressWidget.show()
-            self.acousticWorker.start()
+            self.submitJob('acoustic', kwargs)
 
     def importCorpus(self, name, directory):
         kwargs = {'name': name,
                 'directory': directory}
-        self.importWorker.setParams(kwargs)
-        self.progressWidget.createProgressBar('import', self.importWorker)
-        self.progressWidget.show()
-        self.importWorker.start()
+        self.submitJob('import', kwargs)
         self.updateStatus()
 
+    def submitJob(self, step, kwargs):
+        self.jobs.submit(step, kwargs)
+        self.progressWidget.show()
+
+    def showJob(self, job, worker):
+        self.progressWidget.createProgressBar(job.step, worker)
+
     def createProgressBar(self, key, worker):
         self.progressWidget.createProgressBar(key, worker)
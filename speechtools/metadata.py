@@ -0,0 +1,162 @@
+import os
+import pickle
+import hashlib
+import threading
+
+from polyglotdb.config import BASE_DIR
+
+from .pool import config_key, borrow_context
+
+METADATA_DIR = os.path.join(BASE_DIR, 'metadata')
+
+METADATA_VERSION = 1
+
+def hash_string(string):
+    return hashlib.sha1(string.encode('utf8')).hexdigest()
+
+fetchers = {'hierarchy': lambda c: c.hierarchy,
+            'phone_name': lambda c: c.phone_name,
+            'word_name': lambda c: c.word_name,
+            'discourses': lambda c: sorted(c.discourses),
+            'speakers': lambda c: sorted(c.speakers),
+            'phones': lambda c: list(c.lexicon.phones())}
+
+def fetch_labels(corpus_context, annotation, label):
+    if label == 'label':
+        return corpus_context.lexicon.list_labels(annotation)
+    return corpus_context.lexicon.get_property_levels(label, annotation)
+
+def change_marker(corpus_context):
+    """
+    Return a cheap marker of the state of a corpus on the server, or None
+    if it could not be determined.
+
+    The marker is the number of nodes in the corpus, which the server keeps
+    a count of, so it changes when annotations are added or removed.
+    Changes made from within the program that only set properties are
+    covered by the version counter of the query cache.
+    """
+    from .cache import query_cache
+    statement = 'MATCH (n:{}) RETURN count(n) AS count'.format(corpus_context.cypher_safe_name)
+    try:
+        count = None
+        for r in corpus_context.execute_cypher(statement):
+            count = r['count']
+    except Exception:
+        return None
+    return count, query_cache.version(corpus_context.corpus_name)
+
+class MetadataCache(object):
+    """
+    Versioned on-disk cache of corpus metadata.
+
+    The hierarchy, discourses, speakers and lexicon label lists of a corpus
+    are kept for each connection, so that they are available at launch and
+    when dialogs open without a round trip to the server.  Each entry holds
+    the change marker of the corpus when it was collected, and is
+    revalidated against the server in the background by comparing markers.
+    Values missing from an entry are fetched through a borrowed context the
+    first time they are needed.
+    """
+    extension = '.pickle'
+    def __init__(self, directory = METADATA_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def prefix(self, corpus_name):
+        return hash_string(corpus_name)[:10] + '-'
+
+    def path(self, config):
+        key = config_key(config)
+        return os.path.join(self.directory,
+                            self.prefix(key[0]) + hash_string(repr(key)) + self.extension)
+
+    def load(self, config):
+        """
+        Return the entry for a config, or None if there is none or it was
+        written by another version of the cache.
+        """
+        key = config_key(config)
+        with self.lock:
+            try:
+                return self.entries[key]
+            except KeyError:
+                pass
+            try:
+                with open(self.path(config), 'rb') as f:
+                    entry = pickle.load(f)
+            except Exception:
+                return None
+            if not isinstance(entry, dict) or entry.get('version') != METADATA_VERSION:
+                return None
+            self.entries[key] = entry
+            return entry
+
+    def store(self, config, entry):
+        entry['version'] = METADATA_VERSION
+        path = self.path(config)
+        with self.lock:
+            self.entries[config_key(config)] = entry
+            temp_path = path + '.tmp{}'.format(threading.get_ident())
+            try:
+                os.makedirs(self.directory, exist_ok = True)
+                with open(temp_path, 'wb') as f:
+                    pickle.dump(entry, f, protocol = pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, path)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def value(self, config, name, fetch):
+        entry = self.load(config)
+        if entry is not None and name in entry['values']:
+            return entry['values'][name]
+        with borrow_context(config) as c:
+            value = fetch(c)
+        entry = self.load(config)
+        if entry is None:
+            entry = {'marker': None, 'values': {}}
+        else:
+            entry = {'marker': entry['marker'], 'values': dict(entry['values'])}
+        entry['values'][name] = value
+        self.store(config, entry)
+        return value
+
+    def get(self, config, name):
+        """
+        Return the hierarchy, phone_name, word_name, discourses, speakers
+        or phones of a corpus.
+        """
+        return self.value(config, name, fetchers[name])
+
+    def labels(self, config, annotation, label):
+        """
+        Return the levels of a string property of an annotation type.
+        """
+        return self.value(config, ('labels', annotation, label),
+                            lambda c: fetch_labels(c, annotation, label))
+
+    def collect(self, corpus_context, marker):
+        """
+        Collect the metadata of a corpus from an entered context.
+        """
+        values = {name: fetch(corpus_context) for name, fetch in fetchers.items()}
+        return {'marker': marker, 'values': values}
+
+    def invalidate(self, corpus_name):
+        with self.lock:
+            for key in list(self.entries.keys()):
+                if key[0] == corpus_name:
+                    del self.entries[key]
+            if not os.path.exists(self.directory):
+                return
+            prefix = self.prefix(corpus_name)
+            for f in os.listdir(self.directory):
+                if f.startswith(prefix):
+                    try:
+                        os.remove(os.path.join(self.directory, f))
+                    except OSError:
+                        pass
+
+metadata_cache = MetadataCache()
@@ -1,34 +1,196 @@
 
+import numpy as np
+
 from PyQt5 import QtGui, QtCore, QtWidgets
 
-def make_safe(data):
-    if isinstance(data,float):
-        data = str(round(data, 3))
-    elif isinstance(data,bool):
-        if data:
-            data = 'Yes'
-        else:
-            data = 'No'
-    elif isinstance(data,(list, tuple)):
-        data = ', '.join(make_safe(x) for x in data)
-    else:
-        data = str(data)
-    return data
+from .results import make_safe, ColumnarResults, filter_index
+
+from .workers import QueryPageWorker, ResultsIndexWorker, thread_finished
 
 class QueryResultsModel(QtCore.QAbstractTableModel):
-    SortRole = 999
-    def __init__(self, results, parent = None):
-        if len(results) > 0:
-            self.columns = [x for x in results[0].properties if x not in ['id']] + ['discourse', 'speaker']
-        else:
-            self.columns = ['label', 'begin', 'end', 'discourse', 'speaker']
-        self.rows = results
+    """
+    Table of query results, fetched a page at a time in annotation id
+    order as the view scrolls.
+
+    Sorting and filtering are done locally on the loaded rows.  Sorting
+    on a column needs every row, so once a sort column is set the
+    remaining pages are loaded, in pages ``sort_page_factor`` times larger,
+    and the order is only applied once all of them have arrived.  Until
+    then rows stay in id order.
+    """
+    sort_page_factor = 10
+    def __init__(self, results, parent = None, fetch_params = None):
+        self.results = results
+        self.columns = results.columns
         QtCore.QAbstractTableModel.__init__(self, parent)
 
+        self.order = None
+        self.sortColumn = None
+        self.sortDescending = False
+        self.filterText = ''
+        self.generation = 0
+        self.appliedGeneration = 0
+        self.indexWorkers = []
+
+        self.fetch_params = fetch_params
+        self.pageWorker = None
+        if fetch_params is None or len(results) < fetch_params['page_size']:
+            self.exhausted = True
+        else:
+            self.exhausted = False
+            self.requestedPageSize = fetch_params['page_size']
+            self.pageWorker = QueryPageWorker()
+            self.pageWorker.dataReady.connect(self.addPage)
+            self.pageWorker.errorEncountered.connect(self.stopFetching)
+            # Loading for a sort continues once the previous page's thread
+            # has finished, since it cannot be started again before then
+            thread_finished(self.pageWorker).connect(self.continueFetching)
+
         self.destroyed.connect(self.reset)
 
+    def canFetchMore(self, parent = QtCore.QModelIndex()):
+        if parent.isValid():
+            return False
+        return not self.exhausted
+
+    def fetchMore(self, parent = QtCore.QModelIndex()):
+        if self.exhausted or self.pageWorker.isRunning():
+            return
+        kwargs = dict(self.fetch_params)
+        if self.sortColumn is not None:
+            kwargs['page_size'] = self.fetch_params['page_size'] * self.sort_page_factor
+        self.requestedPageSize = kwargs['page_size']
+        kwargs['cursor'] = self.results.last_id
+        kwargs['columns'] = self.columns
+        self.pageWorker.setParams(kwargs)
+        self.pageWorker.start()
+
+    def addPage(self, results):
+        if len(results) < self.requestedPageSize:
+            self.exhausted = True
+        if len(results):
+            self.appendRows(results)
+        if self.sortColumn is not None:
+            # The order is applied once every row is loaded
+            if self.exhausted:
+                self.updateOrder()
+        elif self.order is not None and self.generation != self.appliedGeneration:
+            self.updateOrder()
+
+    def appendRows(self, results):
+        begin = len(self.results)
+        if self.order is None:
+            self.beginInsertRows(QtCore.QModelIndex(), begin, begin + len(results) - 1)
+            self.results.extend(results)
+            self.endInsertRows()
+            return
+        self.results.extend(results)
+        rows = np.arange(begin, len(self.results))
+        if self.filterText:
+            rows = filter_index(self.results, self.filterText, rows)
+        if len(rows):
+            self.beginInsertRows(QtCore.QModelIndex(), len(self.order), len(self.order) + len(rows) - 1)
+            self.order = np.concatenate([self.order, rows])
+            self.endInsertRows()
+
+    def continueFetching(self):
+        if self.sortColumn is not None and not self.exhausted:
+            self.fetchMore()
+
+    def stopFetching(self, e):
+        self.exhausted = True
+        if self.sortColumn is not None:
+            self.updateOrder()
+
+    def sort(self, column, order = QtCore.Qt.AscendingOrder):
+        if column < 0 or column >= len(self.columns):
+            self.sortColumn = None
+        else:
+            self.sortColumn = self.columns[column]
+        self.sortDescending = order == QtCore.Qt.DescendingOrder
+        if self.sortColumn is not None and not self.exhausted:
+            self.fetchMore()
+        self.updateOrder()
+
+    def setFilterText(self, text):
+        text = text.strip()
+        previous = self.filterText
+        self.filterText = text
+        if previous.lower() in text.lower() and \
+                self.order is not None and self.generation == self.appliedGeneration:
+            # Matches for the longer text are a subset of the current rows,
+            # which are already sorted, so only those need to be checked
+            self.updateOrder(rows = self.order, sort = False)
+        else:
+            self.updateOrder()
+
+    def updateOrder(self, rows = None, sort = True):
+        self.generation += 1
+        # Rows stay in id order until every row is loaded for a sort
+        sorting = self.sortColumn is not None and self.exhausted
+        if not self.filterText and not sorting:
+            self.setOrder(None)
+            return
+        self.indexWorkers = [x for x in self.indexWorkers if x.isRunning()]
+        worker = ResultsIndexWorker()
+        worker.dataReady.connect(self.updateIndex)
+        kwargs = {'results': self.results, 'rows': rows,
+                'num_rows': len(self.results),
+                'filter': self.filterText,
+                'sort': None, 'generation': self.generation}
+        if sort and sorting:
+            kwargs['sort'] = (self.sortColumn, self.sortDescending)
+        worker.setParams(kwargs)
+        self.indexWorkers.append(worker)
+        worker.start()
+
+    def updateIndex(self, result):
+        generation, order = result
+        if generation != self.generation:
+            return
+        self.setOrder(order)
+
+    def setOrder(self, order):
+        """
+        Swap in a new row order, keeping selections on the same rows.
+        """
+        self.appliedGeneration = self.generation
+        old_count = self.rowCount()
+        new_count = len(self.results) if order is None else len(order)
+        if old_count != new_count:
+            self.beginResetModel()
+            self.order = order
+            self.endResetModel()
+            return
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        source_rows = [self.sourceRow(x.row()) for x in persistent]
+        self.order = order
+        if order is None:
+            inverse = np.arange(len(self.results))
+        else:
+            inverse = np.empty(len(self.results), dtype = np.int64)
+            inverse.fill(-1)
+            inverse[order] = np.arange(len(order))
+        new = []
+        for i, x in enumerate(persistent):
+            row = inverse[source_rows[i]]
+            if row < 0:
+                new.append(QtCore.QModelIndex())
+            else:
+                new.append(self.index(int(row), x.column()))
+        self.changePersistentIndexList(persistent, new)
+        self.layoutChanged.emit()
+
+    def sourceRow(self, row):
+        if self.order is None:
+            return row
+        return int(self.order[row])
+
     def rowCount(self, parent = None):
-        return len(self.rows)
+        if self.order is None:
+            return len(self.results)
+        return len(self.order)
 
     def columnCount(self, parent = None):
         return len(self.columns)
@@ -37,85 +199,46 @@ class QueryResultsModel(QtCore.QAbstractTableModel):
         if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
             return self.columns[col]
         if orientation == QtCore.Qt.Vertical and role == QtCore.Qt.DisplayRole:
-            return col
+            return col + 1
         return None
 
     def reset(self):
-        del self.rows
-        self.rows = []
+        if self.pageWorker is not None:
+            self.pageWorker.stop()
+        self.exhausted = True
+        self.generation += 1
+        self.order = None
+        self.results = ColumnarResults(self.columns)
         beg = self.index(0, 0)
         end = self.index(0, len(self.columns) - 1)
         self.dataChanged.emit(beg, end)
 
     def times(self, index):
-        row = index.row()
-        result = self.rows[row]
-
-        return result.begin, result.end
+        row = self.sourceRow(index.row())
+        return self.results.value(row, 'begin'), self.results.value(row, 'end')
 
     def markRowAsAnnotated(self, row, value):
         return
-        if value is None:
-            current = self.rows[row]['Annotated']
-            value = not current
-        setattr(self.rows[row], 'Annotated', value)
-        beg = self.index(row, 0)
-        end = self.index(row, len(self.columns) - 1)
-        self.dataChanged.emit(beg, end)
 
     def discourse(self, index):
-        row = index.row()
-        result = self.rows[row]
-
-        return result.discourse.name
+        row = self.sourceRow(index.row())
+        return self.results.value(row, 'discourse')
 
     def data(self, index, role = None):
         if not index.isValid():
             return None
-        row = index.row()
+        row = self.sourceRow(index.row())
         col = index.column()
         col = self.columns[col]
 
         if role == QtCore.Qt.DisplayRole:
             try:
-                data = self.rows[row]
-                if col == 'speaker':
-                    data = data.speaker.name
-                elif col == 'discourse':
-                    data = data.discourse.name
-                else:
-                    data = getattr(data, col)
-                data = make_safe(data)
+                data = self.results.display(row, col)
             except IndexError:
                 data = ''
-
-            return data
-        elif role == self.SortRole:
-            data = self.rows[row]
-            if col == 'speaker':
-                data = data.speaker.name
-            elif col == 'discourse':
-                data = data.discourse.name
-            else:
-                data = getattr(data, col)
-            if isinstance(data, (tuple,list)):
-                if len(data):
-                    data = data[0]
-                else:
-                    return None
             return data
         return None
 
-class ProxyModel(QtCore.QSortFilterProxyModel):
-    # Adapted from http://stackoverflow.com/questions/15111965/qsortfilterproxymodel-and-row-numbers
-    def headerData(self, section, orientation, role):
-        # if display role of vertical headers
-        if orientation == QtCore.Qt.Vertical and role == QtCore.Qt.DisplayRole:
-            # return the actual row number
-            return section + 1
-        # for other cases, rely on the base implementation
-        return super(ProxyModel, self).headerData(section, orientation, role)
-
 class DiscourseModel(object):
     dataChanged = QtCore.pyqtSignal(object)
     def __init__(self):
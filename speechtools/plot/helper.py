@@ -1,3 +1,5 @@
+import collections
+
 import numpy as np
 
 max_sig = 1
@@ -28,155 +30,217 @@ def get_histogram_mesh_data(data, bins=100, color='k', orientation='h'):
     tris[1::2] = tri_2 + offsets
     return (rr, tris)
 
-def generate_boundaries(annotations, hierarchy, min_time, max_time):
-    num_types = len(hierarchy.keys())
-    lowest = hierarchy.lowest
-    size = max_sig / (num_types)
-    line_outputs = {x: [] for x in hierarchy.keys()}
-    text_pos = {x: [] for x in hierarchy.keys()}
-    text_labels = {x: [] for x in hierarchy.keys()}
-    subannotation_keys = []
-    for k,v in hierarchy.subannotations.items():
-        for s in v:
-            line_outputs[k,s] = []
-            text_pos[k,s] = []
-            text_labels[k,s] = []
-            subannotation_keys.append((k,s))
-    subannotation_keys.sort()
-
+def tier_layout(hierarchy):
+    """
+    Return the vertical extent of each annotation type and subannotation
+    key, from the highest type at the top to subannotations below zero.
+    """
+    types = hierarchy.highest_to_lowest
+    size = max_sig / len(types)
+    layout = {}
+    for i, t in enumerate(types):
+        if t == hierarchy.lowest:
+            vert_min = 0
+        else:
+            vert_min = max_sig - size * (i + 1)
+        layout[t] = (vert_min, vert_min + size)
+    subannotation_keys = sorted((k, s) for k, v in hierarchy.subannotations.items() for s in v)
     try:
-        sub_size = max_sig/len(subannotation_keys)
+        sub_size = max_sig / len(subannotation_keys)
     except ZeroDivisionError:
         sub_size = max_sig
-    subannotation_keys = {s: i for i, s in enumerate(subannotation_keys)}
-    cur = 0
-    main_vert_min = max_sig - size
-    main_vert_max = max_sig
-    main_vert_mid = (main_vert_max - main_vert_min)/2 + main_vert_min
-
-    vis_mid = (max_time - min_time) /2 + min_time
-
-    for a in annotations:
-        #if a.end < min_time:
-        #    continue
-        #if a.begin > max_time:
-        #    continue
-        end = a.end
-        begin = a.begin
-        midpoint = ((end - begin) / 2) + begin
-        #if midpoint > max_time or midpoint < min_time:
-        #    midpoint = vis_mid
-        text = a.label
-        if text is None:
-            text = ''
-        text_labels[a._type].append(text)
-        text_pos[a._type].append((midpoint, main_vert_mid))
-
-        line_outputs[a._type].append([begin,main_vert_min])
-        line_outputs[a._type].append([begin,main_vert_max])
-        line_outputs[a._type].append([end,main_vert_min])
-        line_outputs[a._type].append([end,main_vert_max])
-        if a._type in hierarchy.subannotations:
-            for stype in hierarchy.subannotations[a._type]:
-                subs = getattr(a, stype)
-                ind = subannotation_keys[a._type,stype]
-                lines, text_poses, texts = generate_subannotation_lines(subs,
-                                                ind, sub_size, min_time, max_time)
-                line_outputs[a._type, stype].extend(lines)
-                text_pos[a._type, stype].extend(text_poses)
-                text_labels[a._type, stype].extend(texts)
-
-        for i, t in enumerate(hierarchy.get_lower_types(a._type)):
-            elements = getattr(a, t)
-            i += 1
-            if t == lowest:
-                vert_min = 0
-                vert_max = size
-            else:
-                vert_min = max_sig - size * (i+1)
-                vert_max = vert_min + size
-            vert_mid = (vert_max - vert_min)/2 + vert_min
-            for e in elements:
-                end = e.end
-                begin = e.begin
-                if end < min_time:
-                    continue
-                if begin > max_time:
-                    continue
-                midpoint = ((end - begin) /2) + begin
-                #if (midpoint > max_time or midpoint < min_time) and (begin < min_time and end > max_time):
-                #    midpoint = vis_mid
-                text = e.label
-                if text is None:
-                    text = ''
-                text_labels[t].append(text)
-                text_pos[t].append((midpoint, vert_mid))
-
-                line_outputs[t].append([begin,vert_min])
-                line_outputs[t].append([begin,vert_max])
-                line_outputs[t].append([end,vert_min])
-                line_outputs[t].append([end,vert_max])
-                if t in hierarchy.subannotations:
-                    for stype in hierarchy.subannotations[t]:
-                        subs = getattr(e, stype)
-                        ind = subannotation_keys[t,stype]
-                        lines, text_poses, texts = generate_subannotation_lines(subs,
-                                                ind, sub_size, min_time, max_time)
-                        line_outputs[t, stype].extend(lines)
-                        text_pos[t, stype].extend(text_poses)
-                        text_labels[t, stype].extend(texts)
+    for i, k in enumerate(subannotation_keys):
+        vert_min = 0 - sub_size * (i + 1)
+        layout[k] = (vert_min, vert_min + sub_size)
+    return layout
+
+def boundary_lines(begins, ends, vert_min, vert_max):
+    """
+    Vertices of a begin and an end line segment for each annotation.
+    """
+    lines = np.empty((4 * len(begins), 2))
+    lines[0::4, 0] = begins
+    lines[1::4, 0] = begins
+    lines[2::4, 0] = ends
+    lines[3::4, 0] = ends
+    lines[0::2, 1] = vert_min
+    lines[1::2, 1] = vert_max
+    return lines
+
+def subannotation_lines(begins, ends, vert_min, vert_max):
+    """
+    Vertices of begin, bottom and end line segments for each
+    subannotation.
+    """
+    lines = np.empty((6 * len(begins), 2))
+    for i in range(3):
+        lines[i::6, 0] = begins
+        lines[i + 3::6, 0] = ends
+    for i in [0, 2, 3, 4]:
+        lines[i::6, 1] = vert_min
+    lines[1::6, 1] = vert_max
+    lines[5::6, 1] = vert_max
+    return lines
 
+def generate_boundaries(index, hierarchy, min_time, max_time, channel = 0, min_label_width = 0):
+    """
+    Generate the line vertices and label positions of the annotations
+    visible between ``min_time`` and ``max_time``.
+
+    Parameters
+    ----------
+    index : AnnotationIndex
+        Index of the discourse's annotations
+    hierarchy : Hierarchy
+        Annotation hierarchy of the corpus
+    min_time : float
+        Beginning of the window
+    max_time : float
+        End of the window
+    channel : int
+        Channel to draw
+    min_label_width : float
+        Annotations shorter than this (in seconds) are drawn without labels,
+        as are annotations whose label would be centred outside the window
+
+    Returns
+    -------
+    dict
+        Line segment vertices for each annotation type and subannotation key
+    dict
+        Labels and label positions for each key, which may be fewer than
+        the annotations drawn
+    dict
+        Positions in ``index.index(key, channel)`` of the annotations drawn
+        for each key
+    """
+    layout = tier_layout(hierarchy)
+    vis_mid = (max_time - min_time) / 2 + min_time
+    line_outputs = {}
     text_outputs = {}
-    for t in hierarchy.highest_to_lowest:
-        line_outputs[t] = np.array(line_outputs[t])
-        text_outputs[t] = (text_labels[t], np.array(text_pos[t]))
-    for k in subannotation_keys.keys():
-        line_outputs[k] = np.array(line_outputs[k])
-        text_outputs[k] = (text_labels[k], np.array(text_pos[k]))
+    element_outputs = {}
+    for k, (vert_min, vert_max) in layout.items():
+        indices = index.index(k, channel).overlapping_indices(min_time, max_time)
+        elements = index.array(k, channel)[indices]
+        begins = elements['begin']
+        ends = elements['end']
+        midpoints = (ends - begins) / 2 + begins
+        if isinstance(k, tuple):
+            size = (vert_max - vert_min) / elements['slots']
+            vert_min = vert_min + size * elements['slot']
+            vert_max = vert_min + size
+            midpoints[(midpoints > max_time) | (midpoints < min_time)] = vis_mid
+            line_outputs[k] = subannotation_lines(begins, ends, vert_min, vert_max)
+        else:
+            line_outputs[k] = boundary_lines(begins, ends, vert_min, vert_max)
+        labelled = ends - begins >= min_label_width
+        if not isinstance(k, tuple):
+            labelled &= (midpoints >= min_time) & (midpoints <= max_time)
+        vert_mids = np.broadcast_to((vert_max - vert_min) / 2 + vert_min, midpoints.shape)
+        text_pos = np.empty((np.count_nonzero(labelled), 2))
+        text_pos[:, 0] = midpoints[labelled]
+        text_pos[:, 1] = vert_mids[labelled]
+        text_outputs[k] = (elements['label'][labelled].tolist(), text_pos)
+        element_outputs[k] = indices
+    return line_outputs, text_outputs, element_outputs
 
-    return line_outputs, text_outputs
 
+def spectrogram_window(win_len, window):
+    """
+    Return the analysis window of the spectrogram, ``win_len`` samples
+    long.  The Gaussian window has a standard deviation of 0.45 of its
+    half length, and other windows are any known to scipy.
+    """
+    from scipy.signal import get_window
+    if window == 'gaussian':
+        return get_window(('gaussian', 0.45 * win_len / 2), win_len, fftbins = False)
+    return get_window(window, win_len, fftbins = True)
+
+def scale_spectrum(magnitudes, color_scale):
+    """
+    Convert spectrogram magnitudes to decibels for the log color scale.
+    """
+    if color_scale == 'log':
+        with np.errstate(divide = 'ignore'):
+            return 20 * np.log10(magnitudes)
+    return magnitudes
 
 def rescale(value, oldmax, newmax):
     return value * newmax/oldmax
 
-def generate_subannotation_lines(subs, ind, sub_size, min_time, max_time):
-    vis_mid = (max_time - min_time) /2 + min_time
-    output = []
-    text_output = []
-    text_labels = []
-    if len(subs) > 1:
-        rel_sub_size = sub_size / len(subs)
-    else:
-        rel_sub_size = sub_size
-    for i,s in enumerate(subs):
-        sub_vert_min = 0 - sub_size * (ind + 1) + rel_sub_size * i
-        sub_vert_max = sub_vert_min + rel_sub_size
-        sub_vert_mid = (sub_vert_max - sub_vert_min)/2 + sub_vert_min
-        end = s.end
-        begin = s.begin
-        if end < min_time:
-            continue
-        if begin > max_time:
-            break
-        midpoint = ((end - begin) / 2) + begin
-        if midpoint > max_time or midpoint < min_time:
-            midpoint = vis_mid
-        text = s.label
-        if text is None:
-            text = ''
-        text_output.append((midpoint, sub_vert_mid))
-        try:
-            text = s.label
-        except AttributeError:
-            text = None
-        if text is None:
-            text = ''
-        text_labels.append(text)
-        output.append([begin,sub_vert_min])
-        output.append([begin,sub_vert_max])
-        output.append([begin, sub_vert_min])
-        output.append([end, sub_vert_min])
-        output.append([end,sub_vert_min])
-        output.append([end,sub_vert_max])
-    return output, text_output, text_labels
+def index_boundaries(data):
+    """
+    Sort the times of the vertical segments of line data, given as pairs
+    of vertices, for finding the boundary nearest a point.  Returns the
+    sorted times and the index of the first vertex of each segment.
+    """
+    if data is None or len(data) < 2:
+        return np.empty(0), np.empty(0, dtype = np.int64)
+    data = np.asarray(data)
+    starts = data[0:len(data) - 1:2, 0]
+    vertical = np.nonzero(starts == data[1::2, 0])[0]
+    times = starts[vertical]
+    order = np.argsort(times, kind = 'mergesort')
+    return times[order], vertical[order] * 2
+
+def nearest_boundary(times, indices, time, radius):
+    """
+    Return the index of the first vertex of the boundary nearest a time,
+    or -1 if none is within ``radius``.
+    """
+    if not len(times):
+        return -1
+    i = np.searchsorted(times, time)
+    candidates = [x for x in (i - 1, i) if 0 <= x < len(times)]
+    nearest = min(candidates, key = lambda x: abs(times[x] - time))
+    # Adjacent annotations share boundaries, take the first one drawn
+    nearest = np.searchsorted(times, times[nearest])
+    if abs(times[nearest] - time) < radius:
+        return int(indices[nearest])
+    return -1
+
+def highlight_segment(colors, highlighted, selected, normal_color, highlight_color):
+    """
+    Reset the colors of the highlighted segment and highlight the selected
+    one, both given as the index of their first vertex or -1.  Returns the
+    newly highlighted index and the ranges of colors that changed.
+    """
+    changed = []
+    if 0 <= highlighted < len(colors):
+        colors[highlighted:highlighted + 2] = normal_color
+        changed.append((highlighted, highlighted + 2))
+    highlighted = -1
+    if 0 <= selected < len(colors):
+        colors[selected:selected + 2] = highlight_color
+        highlighted = selected
+        changed.append((selected, selected + 2))
+    return highlighted, changed
+
+class LRUCache(object):
+    """
+    Mapping that keeps at most ``max_size`` entries, dropping the least
+    recently used one when full.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        value = self.entries[key]
+        self.entries.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last = False)
+
+    def clear(self):
+        self.entries.clear()
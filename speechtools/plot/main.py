@@ -75,6 +75,12 @@ class SpectralWidget(vp.Fig):
     def update_signal(self, data):
         self[0:2, 0].set_signal(data)
 
+    def update_tiled_signal(self, sound, channel, begin, end):
+        self[0:2, 0].set_tiled_signal(sound, channel, begin, end)
+
+    def prefetch_tiles(self, sound, channel, begin, end):
+        self[0:2, 0].prefetch_tiles(sound, channel, begin, end)
+
     def update_pitch(self, pitch):
         self[0:2, 0].set_pitch(pitch)
 
@@ -116,8 +122,11 @@ class AnnotationWidget(vp.Fig):
     def update_signal(self, data):
         self[0:2, 0].set_signal(data)
 
-    def update_annotations(self, annotations):
-        self[0:2, 0].set_annotations(annotations)
+    def update_annotations(self, index, channel = 0):
+        self[0:2, 0].set_annotations(index, channel)
+
+    def get_boundary_element(self, key, ind):
+        return self[0:2, 0].boundary_element(key, ind)
 
     def get_play_time(self):
         return self[0:2, 0].play_time_line.pos[0][0]
@@ -0,0 +1,179 @@
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from PyQt5 import QtCore
+
+from .helper import spectrogram_window, scale_spectrum
+
+TILE_COLUMNS = 256
+
+TARGET_COLUMNS = 1000
+
+def hop_for(num_samples, target_columns = TARGET_COLUMNS):
+    """
+    Return the power-of-two hop (in samples) giving roughly
+    ``target_columns`` spectrogram columns for a window, so that nearby
+    zoom levels share tiles.
+    """
+    hop = max(num_samples / target_columns, 1)
+    return int(2 ** round(np.log2(hop)))
+
+def analysis_window(n_fft, win_len, window):
+    """
+    Return the spectrogram window centred in ``n_fft`` samples.
+    """
+    if win_len is None or win_len > n_fft:
+        win_len = n_fft
+    padded = np.zeros(n_fft)
+    left = (n_fft - win_len) // 2
+    padded[left:left + win_len] = spectrogram_window(win_len, window)
+    return padded
+
+def compute_tile(sound, key):
+    """
+    Compute the spectrogram columns of one tile, with the same window and
+    color scale as ``SCTSpectrogramVisual._do_spec``.
+
+    Column ``j`` is centred on sample ``j * hop`` of the pre-emphasized
+    signal, as with a centred STFT over the whole file, so tiles line up
+    exactly when stitched together.
+    """
+    path, channel, n_fft, win_len, window, color_scale, hop, index = key
+    first = index * TILE_COLUMNS
+    start = first * hop - n_fft // 2
+    stop = (first + TILE_COLUMNS - 1) * hop + n_fft - n_fft // 2
+    x = sound.padded_samples(start - 1, stop, channel)
+    x = x[1:] - 0.95 * x[:-1]
+    frames = np.lib.stride_tricks.as_strided(x, shape = (TILE_COLUMNS, n_fft),
+                                            strides = (x.strides[0] * hop, x.strides[0]))
+    spec = np.abs(np.fft.rfft(frames * analysis_window(n_fft, win_len, window), axis = 1))
+    return scale_spectrum(spec, color_scale).T.astype(np.float32)
+
+class SpectrogramTileCache(QtCore.QObject):
+    """
+    LRU cache of spectrogram tiles computed on a thread pool.
+
+    Tiles are ``TILE_COLUMNS`` columns wide and keyed on the sound file,
+    channel, window settings, color scale, hop and tile index.  Requesting a view
+    stitches together the cached tiles, leaves the missing ones as NaN
+    and queues them, and ``tileReady`` is emitted as each one finishes.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Memory cap for cached tiles
+    max_workers : int
+        Number of threads computing tiles
+    """
+    tileReady = QtCore.pyqtSignal(object)
+    def __init__(self, max_bytes = 128 * 1024 * 1024, max_workers = 2, parent = None):
+        super(SpectrogramTileCache, self).__init__(parent)
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.tiles = collections.OrderedDict()
+        self.pending = {}
+        self.prefetching = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers = max_workers)
+
+    def get(self, key):
+        with self.lock:
+            try:
+                tile = self.tiles[key]
+            except KeyError:
+                return None
+            self.tiles.move_to_end(key)
+            return tile
+
+    def store(self, key, tile):
+        with self.lock:
+            self.pending.pop(key, None)
+            self.prefetching.discard(key)
+            if key in self.tiles:
+                return
+            self.tiles[key] = tile
+            self.num_bytes += tile.nbytes
+            while self.num_bytes > self.max_bytes and len(self.tiles) > 1:
+                k, t = self.tiles.popitem(last = False)
+                self.num_bytes -= t.nbytes
+        self.tileReady.emit(key)
+
+    def compute(self, sound, key):
+        try:
+            tile = compute_tile(sound, key)
+        except Exception:
+            with self.lock:
+                self.pending.pop(key, None)
+                self.prefetching.discard(key)
+            raise
+        self.store(key, tile)
+
+    def request(self, sound, keys):
+        """
+        Queue the tiles that are neither cached nor pending, and cancel
+        queued tiles that are no longer needed, other than those being
+        prefetched.
+        """
+        keys = set(keys)
+        with self.lock:
+            for k, future in list(self.pending.items()):
+                if k not in keys and k not in self.prefetching and future.cancel():
+                    del self.pending[k]
+            for k in sorted(keys, key = lambda x: x[-1]):
+                if k in self.tiles or k in self.pending:
+                    continue
+                self.pending[k] = self.executor.submit(self.compute, sound, k)
+
+    def columns(self, sound, begin, end):
+        """
+        Return the hop and the range of columns covering a window.
+        """
+        begin = max(begin, 0)
+        end = min(end, sound.duration)
+        hop = hop_for((end - begin) * sound.sr)
+        first = int(np.floor(begin * sound.sr / hop))
+        last = max(int(np.ceil(end * sound.sr / hop)), first + 1)
+        return hop, first, last
+
+    def prefetch(self, sound, channel, begin, end, n_fft, win_len, window, color_scale = 'log'):
+        """
+        Queue the tiles of a window that is likely to be shown next, without
+        cancelling any tiles already queued.
+        """
+        hop, first, last = self.columns(sound, begin, end)
+        keys = []
+        for index in range(first // TILE_COLUMNS, (last - 1) // TILE_COLUMNS + 1):
+            key = (sound.path, channel, n_fft, win_len, window, color_scale, hop, index)
+            if self.get(key) is None:
+                keys.append(key)
+        with self.lock:
+            for k in keys:
+                if k in self.pending:
+                    continue
+                self.prefetching.add(k)
+                self.pending[k] = self.executor.submit(self.compute, sound, k)
+
+    def stitch(self, sound, channel, begin, end, n_fft, win_len, window, color_scale = 'log'):
+        """
+        Return the spectrogram of ``begin`` to ``end`` as an image with one
+        column per hop, the hop, and the index of its first column.
+        """
+        hop, first, last = self.columns(sound, begin, end)
+        image = np.empty((n_fft // 2 + 1, last - first), dtype = np.float32)
+        image.fill(np.nan)
+        keys = []
+        for index in range(first // TILE_COLUMNS, (last - 1) // TILE_COLUMNS + 1):
+            key = (sound.path, channel, n_fft, win_len, window, color_scale, hop, index)
+            tile = self.get(key)
+            if tile is None:
+                keys.append(key)
+                continue
+            tile_first = index * TILE_COLUMNS
+            lo = max(first, tile_first)
+            hi = min(last, tile_first + TILE_COLUMNS)
+            image[:, lo - first:hi - first] = tile[:, lo - tile_first:hi - tile_first]
+        self.request(sound, keys)
+        return image, hop, first
@@ -1,10 +1,6 @@
 import time
-from functools import partial
 
 import numpy as np
-import scipy
-from scipy.signal import gaussian
-from librosa.core.spectrum import stft
 
 from vispy import scene, visuals, gloo
 
@@ -15,6 +11,61 @@ from vispy.visuals.shaders import Function
 from vispy.visuals import collections
 from vispy.color import Color, ColorArray, get_colormap
 
+from .helper import (index_boundaries, nearest_boundary, highlight_segment, LRUCache,
+                    spectrogram_window, scale_spectrum)
+
+# Versions of vispy whose TextVisual internals ScalingText was checked
+# against, see text_buffers
+TEXT_VISPY_VERSIONS = [(0, 5)]
+
+LAYOUT_CACHE_SIZE = 4096
+
+def vispy_version():
+    import vispy
+    try:
+        return tuple(int(x) for x in vispy.__version__.split('.')[:2])
+    except ValueError:
+        return None
+
+def text_buffers(text_visual, layouts):
+    """
+    Build the vertex and index buffers of a TextVisual from glyph layouts
+    cached per label, so that only new labels are laid out.
+
+    This relies on private parts of vispy, so it is only used with the
+    versions in TEXT_VISPY_VERSIONS and anything unexpected returns False
+    without touching the visual, leaving TextVisual to lay out the text
+    itself.
+    """
+    if vispy_version() not in TEXT_VISPY_VERSIONS:
+        return False
+    try:
+        from vispy.visuals.text.text import _text_to_vbo
+        font = text_visual._font
+        anchors = text_visual._anchors
+        lowres_size = font._lowres_size
+        program = text_visual.shared_program
+        configure = text_visual._configure_gl_state
+    except (ImportError, AttributeError):
+        return False
+    text = text_visual.text
+    if isinstance(text, str):
+        text = [text]
+    vertices = []
+    for t in text:
+        key = (t, anchors[0], anchors[1])
+        if key not in layouts:
+            layouts[key] = _text_to_vbo(t, font, anchors[0], anchors[1], lowres_size)
+        vertices.append(layouts[key])
+    n_char = sum(len(t) for t in text)
+    text_visual._vertices = gloo.VertexBuffer(np.concatenate(vertices))
+    idx = (np.array([0, 1, 2, 0, 2, 3], np.uint32) +
+            np.arange(0, 4 * n_char, 4, dtype = np.uint32)[:, np.newaxis])
+    text_visual._index_buffer = gloo.IndexBuffer(idx.ravel())
+    program.bind(text_visual._vertices)
+    configure()
+    return True
+
 class WaveformLineVisual(visuals.LineVisual):
     def __init__(self):
         super(WaveformLineVisual, self).__init__(method = 'gl', color = 'k')
@@ -30,6 +81,24 @@ class WaveformLineVisual(visuals.LineVisual):
             self.update()
 
 
+def uploaded_color_buffer(line):
+    """
+    Return the color buffer of a line visual if it is already on the GPU
+    and no full upload is pending, or None.
+
+    vispy does not expose the buffer, so this is the only place relying on
+    the internals of LineVisual, and anything unexpected makes colors go
+    through ``set_data`` instead.
+    """
+    try:
+        vbo = line._line_visual._color_vbo
+        pending = line._changed['color']
+    except (AttributeError, KeyError, TypeError):
+        return None
+    if pending or not hasattr(vbo, 'set_subdata') or not hasattr(vbo, 'size'):
+        return None
+    return vbo
+
 class SCTLineVisual(visuals.LineVisual):
     def __init__(self, *args, **kwargs):
         kwargs.update(width = 40)
@@ -41,18 +110,28 @@ class SCTLineVisual(visuals.LineVisual):
         except KeyError:
             color = Color(self._color).rgba
         self.non_selected_color = color
+        self.boundary_times = np.empty(0)
+        self.boundary_indices = np.empty(0, dtype = np.int64)
+        self.colors = None
+        self.highlighted = -1
         self.freeze()
 
     def set_data(self, data):
+        self.highlighted = -1
         if data is not None:
-            color = np.array([self.non_selected_color for x in range(len(data))])
-            scene.visuals.Line.set_data(self, pos = data, color = color)
+            self.colors = np.empty((len(data), 4), dtype = np.float32)
+            self.colors[:] = self.non_selected_color
+            scene.visuals.Line.set_data(self, pos = data, color = self.colors)
         else:
-            color = None
+            self.colors = None
             self._bounds = None
             self._changed['pos'] = True
             self._pos = None
             self.update()
+        self.index_boundaries(data)
+
+    def index_boundaries(self, data):
+        self.boundary_times, self.boundary_indices = index_boundaries(data)
 
     #Adapted from the vispy line_draw example
     def contains_vert(self, pos):
@@ -72,26 +151,16 @@ class SCTLineVisual(visuals.LineVisual):
         return False
 
     def select_line(self, event, radius=5):
-        if self.pos is None:
+        if self.pos is None or not len(self.boundary_times):
             return None, -1
         radius_time = event.source.transform_pos_to_time([radius]) - \
                     event.source.transform_pos_to_time([0])
         pos_scene = event.source.transform_pos_to_time(event.pos)
 
-        index = -1
-        for p in self.pos:
-            index += 1
-            if index % 2 == 0:
-                if p[0] != self.pos[index+1][0]:
-                    continue
-            else:
-                if p[0] != self.pos[index-1][0]:
-                    continue
-            if np.linalg.norm(pos_scene - p[0]) < radius_time:
-                # point found, return point and its index
-                return p, index
-        # no point found, return None
-        return None, -1
+        index = nearest_boundary(self.boundary_times, self.boundary_indices, pos_scene, radius_time)
+        if index < 0:
+            return None, -1
+        return self.pos[index], index
 
     def update_boundary(self, selected_index, new_time):
         if 0 <= selected_index < len(self.pos):
@@ -104,16 +173,29 @@ class SCTLineVisual(visuals.LineVisual):
                 p[selected_index - 1][0] = new_time
 
             scene.visuals.Line.set_data(self, pos = p)
+            self.index_boundaries(p)
 
 
     def update_markers(self, selected_index=-1, highlight_color=(1, 1, 0, 1)):
         """ update marker colors, and highlight a marker with a given color """
-        c = np.array([self.non_selected_color for x in range(len(self.pos))])
-        if 0 <= selected_index < len(self.pos):
-            c[selected_index] = highlight_color
-            c[selected_index + 1] = highlight_color
+        if self.colors is None:
+            return
+        self.highlighted, changed = highlight_segment(self.colors, self.highlighted, selected_index,
+                                                    self.non_selected_color, highlight_color)
+        for start, stop in changed:
+            self.upload_colors(start, stop)
 
-        scene.visuals.Line.set_data(self, color = c)
+    def upload_colors(self, start, stop):
+        """
+        Copy a range of vertex colors to the color buffer already on the
+        GPU, or upload all of them if it has not been created yet.
+        """
+        vbo = uploaded_color_buffer(self)
+        if vbo is None or vbo.size != len(self.colors):
+            scene.visuals.Line.set_data(self, color = self.colors)
+            return
+        vbo.set_subdata(self.colors[start:stop], offset = start)
+        self.update()
 
 class LineCollectionVisual(visuals.visual.BaseVisual, collections.agg_segment_collection.AggSegmentCollection):
     pass
@@ -205,6 +287,7 @@ class PlayLineVisual(visuals.LineVisual):
         self.add_subvisual(self._line_visual)
 
 class SCTSpectrogramVisual(visuals.ImageVisual):
+    tile_n_fft = 256
     def __init__(self, window_length = 0.005, step = 0.001):
         self._signal = None
         self.window_length = window_length
@@ -218,6 +301,7 @@ class SCTSpectrogramVisual(visuals.ImageVisual):
         self.min_time = 0
         self.max_time = None
         self._win_len = None
+        self._hop = None
 
         self._n_fft = None
 
@@ -237,12 +321,29 @@ class SCTSpectrogramVisual(visuals.ImageVisual):
 
     def set_signal(self, data):
         self._signal = data
+        self._hop = None
         if data is None:
             self._n_fft = None
         else:
             self._n_fft = 256
         self._do_spec()
 
+    def set_tiles(self, tile_cache, sound, channel, begin, end):
+        """
+        Show the spectrogram of a window from precomputed tiles, with
+        columns still being computed drawn at the bottom of the range.
+        """
+        self._signal = None
+        self._n_fft = self.tile_n_fft
+        image, self._hop, first = tile_cache.stitch(sound, channel, begin, end, self._n_fft,
+                                            self._win_len, self._window, self._color_scale)
+        self.set_data(image)
+
+    def prefetch_tiles(self, tile_cache, sound, channel, begin, end):
+        win_len = int(self.window_length * sound.sr)
+        tile_cache.prefetch(sound, channel, begin, end, self.tile_n_fft, win_len,
+                            self._window, self._color_scale)
+
     @property
     def yscale(self):
         if self._n_fft is not None and self._sr is not None:
@@ -251,6 +352,8 @@ class SCTSpectrogramVisual(visuals.ImageVisual):
 
     @property
     def xscale(self):
+        if self._hop is not None:
+            return self._sr / self._hop
         if self._signal is None or len(self._signal) == 0 :
             return 1
         num_steps = self._data.shape[1]
@@ -286,18 +389,14 @@ class SCTSpectrogramVisual(visuals.ImageVisual):
         #    step_samp = 28
         #    step = step_samp / self._sr
         #self._n_fft = 512
-        #window = partial(gaussian, std = 250/12)
-        if self._window == 'gaussian':
-            window = partial(gaussian, std = 0.45*(self._win_len)/2)
-        else:
-            window = None
-        #import matplotlib.pyplot as plt
-        #plt.plot(window(250))
-        #plt.show()
-        data = stft(self._signal, self._n_fft, step_samp, center = True, win_length = self._win_len, window = window)
+        from librosa.core.spectrum import stft
+        win_len = self._win_len
+        if win_len is None or win_len > self._n_fft:
+            win_len = self._n_fft
+        window = spectrogram_window(win_len, self._window)
+        data = stft(self._signal, self._n_fft, step_samp, center = True, win_length = win_len, window = window)
 
-        data = np.abs(data)
-        data = 20 * np.log10(data) if self._color_scale == 'log' else data
+        data = scale_spectrum(np.abs(data), self._color_scale)
 
         self.set_data(data)
 
@@ -309,8 +408,14 @@ class SCTSpectrogramVisual(visuals.ImageVisual):
             The image data.
         """
         data = np.asarray(image)
-        max_spec = data.max()
+        finite = np.isfinite(data)
+        if finite.any():
+            max_spec = data[finite].max()
+        else:
+            max_spec = 0
         clim = (max_spec - self._dynamic_range, max_spec)
+        if not finite.all():
+            data = np.where(finite, data, clim[0])
         self.clim = clim
         if self._data is None or self._data.shape != data.shape:
             self._need_vertex_update = True
@@ -414,6 +519,10 @@ class ScalingText(scene.visuals.Text):
         self.maxpps = 3000
         self.min_font_size = 1
         self.max_font_size = 18
+        self.font_step = 0.5
+        # Glyph layouts do not depend on the font size, so they are kept
+        # across zooms for the most recently drawn labels
+        self.layouts = LRUCache(LAYOUT_CACHE_SIZE)
         super(ScalingText, self).__init__(*args, **kwargs)
 
     def set_lowest(self):
@@ -434,14 +543,22 @@ class ScalingText(scene.visuals.Text):
         else:
             per = (pps - self.minpps) / (self.maxpps - self.minpps)
             font_size = self.min_font_size + (self.max_font_size - self.min_font_size) * per
-        self.font_size = font_size
+        font_size = round(font_size / self.font_step) * self.font_step
+        if font_size != self.font_size:
+            # Setting the font size requests another draw
+            self.font_size = font_size
+        if getattr(self, '_vertices', None) is None:
+            text_buffers(self, self.layouts)
         super(ScalingText, self)._prepare_draw(view)
 
     def set_data(self, text, pos):
-
-        self.text = None
         if pos is None:
             pos = [0,0]
+        if text is not None and text == self.text:
+            # Same labels in new places, keep the glyph vertices
+            self.pos = pos
+            return
+        self.text = None
         self.pos = pos
         self.text = text
 
@@ -14,6 +14,8 @@ from ..visuals import SCTLinePlot, ScalingText, SCTAnnotation, SelectionLine, Ti
 from ..helper import generate_boundaries
 
 class AnnotationPlotWidget(SelectablePlotWidget):
+    # Annotations narrower than this many pixels are drawn without labels
+    label_min_pixels = 8
 
     def __init__(self, *args, **kwargs):
         super(AnnotationPlotWidget, self).__init__(*args, **kwargs)
@@ -21,7 +23,9 @@ class AnnotationPlotWidget(SelectablePlotWidget):
         self.hierarchy = None
         self.num_types = 0
         self.annotation_visuals = {}
-        self.annotations = None
+        self.annotation_index = None
+        self.channel = 0
+        self.visible_indices = {}
         self.min_time = None
         self.max_time = None
         self.line_visuals = {}
@@ -100,10 +104,11 @@ class AnnotationPlotWidget(SelectablePlotWidget):
                 ind += 1
         except AttributeError:
             pass
-    def set_annotations(self, data):
-        #Assume that data is the highest level of the hierarchy
-        self.annotations = data
-        if data is None:
+    def set_annotations(self, index, channel = 0):
+        self.annotation_index = index
+        self.channel = channel
+        self.visible_indices = {}
+        if index is None:
             if self.hierarchy is not None:
                 for k in self.hierarchy.keys():
                     self.line_visuals[k].visible = False
@@ -118,9 +123,14 @@ class AnnotationPlotWidget(SelectablePlotWidget):
                         self.annotation_visuals[k, s].set_data(None, None)
             return
         if self.hierarchy is not None:
-            line_data, text_data = generate_boundaries(data, self.hierarchy, self.min_time, self.max_time)
+            min_label_width = 0
+            if self.view.width > 0:
+                min_label_width = self.label_min_pixels * (self.max_time - self.min_time) / self.view.width
+            line_data, text_data, self.visible_indices = generate_boundaries(index, self.hierarchy,
+                                                            self.min_time, self.max_time, channel,
+                                                            min_label_width)
             for k in self.hierarchy.keys():
-                if text_data[k][0] and (self.max_time - self.min_time < 10 or k != self.hierarchy.lowest):
+                if len(line_data[k]) and (self.max_time - self.min_time < 10 or k != self.hierarchy.lowest):
                         self.line_visuals[k].set_data(line_data[k])
                         self.line_visuals[k].visible = True
                         self.annotation_visuals[k].set_data(text_data[k][0], pos = text_data[k][1])
@@ -130,7 +140,7 @@ class AnnotationPlotWidget(SelectablePlotWidget):
                     self.annotation_visuals[k].set_data(None, None)
             for k, v in self.hierarchy.subannotations.items():
                 for s in v:
-                    if text_data[k, s][0] and self.max_time - self.min_time < 10:
+                    if len(line_data[k, s]) and self.max_time - self.min_time < 10:
                         self.line_visuals[k, s].set_data(line_data[k, s])
                         self.line_visuals[k, s].visible = True
                         self.annotation_visuals[k, s].set_data(text_data[k, s][0], pos = text_data[k, s][1])
@@ -141,6 +151,19 @@ class AnnotationPlotWidget(SelectablePlotWidget):
                         self.annotation_visuals[k, s].visible = False
                         self.annotation_visuals[k, s].set_data(None, None)
 
+    def boundary_element(self, key, ind):
+        """
+        Return the annotation drawn with line vertex ``ind`` of a key, and
+        whether the vertex is on its begin boundary.
+        """
+        if isinstance(key, tuple):
+            per_element = 6
+        else:
+            per_element = 4
+        indices = self.visible_indices[key]
+        items = self.annotation_index.index(key, self.channel).items
+        return items[indices[ind // per_element]], ind % per_element == 0
+
     def rank_key_by_relevance(self, key):
         ranking = []
         if isinstance(key, tuple):
@@ -6,6 +6,8 @@ from ..visuals import Spectrogram, SCTLinePlot, scene
 
 from ..axis import ScaledTicker
 
+from ..tiles import SpectrogramTileCache
+
 class SpectralPlotWidget(SelectablePlotWidget):
     def __init__(self, *args, **kwargs):
         super(SpectralPlotWidget, self).__init__(*args, **kwargs)
@@ -25,6 +27,9 @@ class SpectralPlotWidget(SelectablePlotWidget):
         self.show_spec = True
         self.show_voicing = False
         self.show_formants = True
+        self.tile_cache = SpectrogramTileCache()
+        self.tile_cache.tileReady.connect(self.tile_ready)
+        self.tile_view = None
         self.freeze()
         self.view.add(self.spec)
         self.selection_time_line.parent = None
@@ -87,11 +92,27 @@ class SpectralPlotWidget(SelectablePlotWidget):
     def set_signal(self, data):
         if not self.show_spec:
             self.spec.visible = False
+        self.tile_view = None
         self.spec.set_signal(data)
         self.view.camera.rect = (0, 0, self.spec.xmax(), self.spec.ymax())
         self.yaxis.axis.ticker.scale = self.spec.yscale
         #self.xaxis.axis.ticker.scale = 1/ self.spec.xscale
 
+    def set_tiled_signal(self, sound, channel, begin, end):
+        if not self.show_spec:
+            self.spec.visible = False
+        self.tile_view = (sound, channel, begin, end)
+        self.draw_tiles()
+
+    def prefetch_tiles(self, sound, channel, begin, end):
+        self.spec.prefetch_tiles(self.tile_cache, sound, channel, begin, end)
+
+    def draw_tiles(self):
+        self.spec.set_tiles(self.tile_cache, *self.tile_view)
+        self.view.camera.rect = (0, 0, self.spec.xmax(), self.spec.ymax())
+        self.yaxis.axis.ticker.scale = self.spec.yscale
+        #self.xaxis.axis.ticker.scale = 1/ self.spec.xscale
+
     def set_selection_time(self, pos):
         if pos is None:
             self.selection_time_line.visible = False
@@ -108,6 +129,15 @@ class SpectralPlotWidget(SelectablePlotWidget):
             pos = np.array([[pos, -1], [pos, self.spec.ymax() + 1]])
             self.play_time_line.set_data(pos = pos)
 
+    def tile_ready(self, key):
+        if self.tile_view is None:
+            return
+        sound, channel, begin, end = self.tile_view
+        if key[0] != sound.path or key[1] != channel:
+            return
+        self.draw_tiles()
+        self.update()
+
     def update_windowing(self, window_length, step):
         self.spec.update_windowing(window_length, step)
 
@@ -0,0 +1,227 @@
+import time
+import threading
+import contextlib
+import collections
+
+def config_key(config):
+    """
+    Return the key of the pool entries that can serve a corpus config.
+    """
+    return tuple(getattr(config, x, None) for x in ['corpus_name', 'graph_host', 'graph_port',
+                                                    'graph_user', 'graph_password'])
+
+def check_context(context):
+    """
+    Default health check, a trivial round trip to the graph database.
+    """
+    context.execute_cypher('RETURN 1')
+
+class ContextPool(object):
+    """
+    Process-wide pool of entered corpus contexts.
+
+    Opening a CorpusContext connects to the database and loads the
+    hierarchy of the corpus, so widgets and workers borrow contexts from
+    the pool instead and return them when they are done.  Each borrower has
+    a context to itself, and contexts are only shared over time.  Contexts
+    that have been idle for longer than ``check_after`` are checked before
+    being lent again, those idle for longer than ``idle_timeout`` are
+    closed, and those of a corpus are discarded by ``invalidate`` once its
+    hierarchy changes.
+
+    Parameters
+    ----------
+    factory : callable
+        Creates a context from a config, CorpusContext by default
+    max_idle : int
+        Number of idle contexts to keep for each config
+    idle_timeout : float
+        Seconds before an idle context is closed
+    check_after : float
+        Seconds of idleness after which a context is checked before reuse
+    check : callable
+        Raises if a context can no longer be used
+    """
+    def __init__(self, factory = None, max_idle = 4, idle_timeout = 300,
+                check_after = 10, check = check_context):
+        if factory is None:
+            from polyglotdb import CorpusContext
+            factory = CorpusContext
+        self.factory = factory
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self.check = check
+        self.lock = threading.Lock()
+        self.idle = collections.defaultdict(list)
+        self.generations = collections.defaultdict(int)
+
+    def close(self, context):
+        try:
+            context.__exit__(None, None, None)
+        except Exception:
+            pass
+
+    def expired(self, now):
+        """
+        Remove and return the contexts idle for longer than the timeout.
+        """
+        expired = []
+        for key, entries in list(self.idle.items()):
+            keep = [x for x in entries if now - x[1] <= self.idle_timeout]
+            expired.extend(x[0] for x in entries if now - x[1] > self.idle_timeout)
+            if keep:
+                self.idle[key] = keep
+            else:
+                del self.idle[key]
+        return expired
+
+    def acquire(self, config):
+        """
+        Return an entered context for a config along with the generation
+        of its corpus, reusing an idle one if it is healthy.
+        """
+        key = config_key(config)
+        while True:
+            now = time.monotonic()
+            with self.lock:
+                expired = self.expired(now)
+                generation = self.generations[key[0]]
+                entries = self.idle.get(key)
+                entry = entries.pop() if entries else None
+            for context in expired:
+                self.close(context)
+            if entry is None:
+                break
+            context, returned = entry
+            if now - returned <= self.check_after:
+                return context, generation
+            try:
+                self.check(context)
+            except Exception:
+                self.close(context)
+                continue
+            return context, generation
+        context = self.factory(config)
+        context.__enter__()
+        return context, generation
+
+    def release(self, config, context, generation):
+        key = config_key(config)
+        with self.lock:
+            entries = self.idle[key]
+            if generation == self.generations[key[0]] and len(entries) < self.max_idle:
+                entries.append((context, time.monotonic()))
+                return
+        self.close(context)
+
+    @contextlib.contextmanager
+    def borrow(self, config):
+        """
+        Borrow a context for the duration of a ``with`` block.  A context
+        is closed rather than returned if an error was raised while it was
+        in use.
+        """
+        context, generation = self.acquire(config)
+        try:
+            yield context
+        except BaseException:
+            self.close(context)
+            raise
+        self.release(config, context, generation)
+
+    def invalidate(self, corpus_name = None):
+        """
+        Close the idle contexts of a corpus, or of every corpus, and make
+        sure those currently lent out are closed when they are returned.
+        """
+        with self.lock:
+            closing = []
+            for key in list(self.idle.keys()):
+                if corpus_name is None or key[0] == corpus_name:
+                    closing.extend(x[0] for x in self.idle.pop(key))
+            if corpus_name is None:
+                for k in list(self.generations.keys()):
+                    self.generations[k] += 1
+            else:
+                self.generations[corpus_name] += 1
+        for context in closing:
+            self.close(context)
+
+    def clear(self):
+        self.invalidate()
+
+class ContextLease(object):
+    """
+    A context acquired from a pool and held until ``release``.
+
+    Discourse models and annotations keep a reference to the context they
+    were loaded with and use it again later, so they cannot be loaded in a
+    ``borrow`` block.  A lease keeps that context out of the pool for as
+    long as they are in use, and threads sharing it take ``lock`` around
+    each use.
+
+    Parameters
+    ----------
+    pool : ContextPool
+        Pool to acquire the context from
+    config : CorpusConfig
+        Config of the corpus
+    """
+    def __init__(self, pool, config):
+        self.pool = pool
+        self.config = config
+        self.lock = threading.RLock()
+        self.context, self.generation = pool.acquire(config)
+
+    def take(self):
+        with self.lock:
+            context, self.context = self.context, None
+        return context
+
+    def release(self):
+        """
+        Return the context to the pool.  Releasing twice does nothing.
+        """
+        context = self.take()
+        if context is not None:
+            self.pool.release(self.config, context, self.generation)
+
+    def discard(self):
+        """
+        Close the context instead of returning it, after an error.
+        """
+        context = self.take()
+        if context is not None:
+            self.pool.close(context)
+
+_context_pool = None
+_pool_lock = threading.Lock()
+
+def context_pool():
+    global _context_pool
+    with _pool_lock:
+        if _context_pool is None:
+            _context_pool = ContextPool()
+        return _context_pool
+
+def borrow_context(config):
+    """
+    Borrow an entered CorpusContext for a config from the shared pool::
+
+        with borrow_context(config) as c:
+            discourses = c.discourses
+    """
+    return context_pool().borrow(config)
+
+def lease_context(config):
+    """
+    Acquire a context for a config from the shared pool, held until the
+    lease is released::
+
+        lease = lease_context(config)
+        model = lease.context.inspect_discourse(discourse, begin, end)
+        ...
+        lease.release()
+    """
+    return ContextLease(context_pool(), config)
@@ -0,0 +1,227 @@
+import time
+
+class Prefetcher(object):
+    """
+    Plans which parts of a discourse to cache while browsing it.
+
+    The velocity of the view is tracked as it pans, and the window cached
+    ahead of it grows with the speed in that direction, so that fast
+    scrolling fetches further ahead than the fixed window used when idle.
+    When the cached annotations go over a budget, those farthest from the
+    view are evicted first.
+
+    Parameters
+    ----------
+    min_window : float
+        Seconds to keep cached on either side of the view when it is still
+    max_window : float
+        Largest look-ahead window, in seconds
+    lookahead : float
+        Seconds of motion at the current velocity to cache ahead of the view
+    max_annotations : int
+        Budget of cached annotations, counting every annotation of the
+        lower types as well as the highest
+    """
+    smoothing = 0.5
+    idle_time = 0.5
+    def __init__(self, min_window = 5, max_window = 60, lookahead = 2, max_annotations = 200000):
+        self.min_window = min_window
+        self.max_window = max_window
+        self.lookahead = lookahead
+        self.max_annotations = max_annotations
+        self.reset()
+
+    def reset(self):
+        self.velocity = 0
+        self.view_width = 0
+        self.last_center = None
+        self.last_time = None
+
+    def observe(self, begin, end, now = None):
+        """
+        Record the current view and update the smoothed velocity of its
+        centre.  Pausing for longer than ``idle_time`` resets the velocity.
+        """
+        if now is None:
+            now = time.monotonic()
+        center = (end - begin) / 2 + begin
+        if self.last_time is not None:
+            elapsed = now - self.last_time
+            if elapsed > self.idle_time:
+                self.velocity = 0
+            elif elapsed > 0:
+                velocity = (center - self.last_center) / elapsed
+                self.velocity = self.smoothing * velocity + (1 - self.smoothing) * self.velocity
+        self.view_width = end - begin
+        self.last_center = center
+        self.last_time = now
+
+    def window(self, direction):
+        """
+        Seconds to cache before (``direction`` of -1) or after (1) the view.
+        """
+        window = max(self.min_window, self.view_width)
+        speed = self.velocity * direction
+        if speed > 0:
+            window += speed * self.lookahead
+        return min(window, max(self.max_window, self.min_window))
+
+    def preceding_range(self, begin, end, cached_begin):
+        """
+        Return the range to fetch before the cache, or None if the view is
+        far enough from its beginning.
+        """
+        window = self.window(-1)
+        if begin >= cached_begin + window:
+            return None
+        fetch_begin = cached_begin - 2 * window
+        if begin < fetch_begin:
+            fetch_begin = begin - 2 * window
+        return fetch_begin, cached_begin
+
+    def following_range(self, begin, end, cached_end):
+        window = self.window(1)
+        if end <= cached_end - window:
+            return None
+        fetch_end = cached_end + 2 * window
+        if end > fetch_end:
+            fetch_end = end + 2 * window
+        return cached_end, fetch_end
+
+    def evict(self, annotations, begin, end, lower_types):
+        """
+        Choose which cached annotations to keep.
+
+        Parameters
+        ----------
+        annotations : list
+            Cached highest level annotations, ordered by begin time
+        begin : float
+            Beginning of the view
+        end : float
+            End of the view
+        lower_types : list
+            Annotation types preloaded under each annotation
+
+        Returns
+        -------
+        int
+            Index of the first annotation to keep
+        int
+            Index after the last annotation to keep
+        """
+        sizes = [1 + sum(len(getattr(a, t, [])) for t in lower_types) for a in annotations]
+        total = sum(sizes)
+        keep_begin = begin - self.window(-1)
+        keep_end = end + self.window(1)
+        center = (end - begin) / 2 + begin
+        lo = 0
+        hi = len(annotations)
+        while total > self.max_annotations and lo < hi:
+            first = annotations[lo]
+            last = annotations[hi - 1]
+            before = center - first.end if first.end < keep_begin else None
+            after = last.begin - center if last.begin > keep_end else None
+            if before is None and after is None:
+                break
+            if after is None or (before is not None and before >= after):
+                total -= sizes[lo]
+                lo += 1
+            else:
+                hi -= 1
+                total -= sizes[hi]
+        return lo, hi
+
+def subtract_range(begin, end, other):
+    """
+    Return the parts of ``begin`` to ``end`` not covered by the range
+    ``other``.
+    """
+    if other is None or other[1] <= begin or other[0] >= end:
+        return [(begin, end)]
+    parts = []
+    if begin < other[0]:
+        parts.append((begin, other[0]))
+    if end > other[1]:
+        parts.append((other[1], end))
+    return parts
+
+class RangeQueue(object):
+    """
+    Queue of time ranges to fetch.
+
+    Overlapping requests are merged into one range, and the parts of a
+    request already pending or being fetched are skipped.
+    """
+    def __init__(self):
+        self.pending = []
+        self.in_flight = None
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, begin, end):
+        """
+        Queue a range, returning whether any of it was new.
+        """
+        parts = subtract_range(begin, end, self.in_flight)
+        for p in self.pending:
+            parts = [x for part in parts for x in subtract_range(part[0], part[1], p)]
+        if not parts:
+            return False
+        ranges = sorted(self.pending + parts)
+        merged = [ranges[0]]
+        for b, e in ranges[1:]:
+            if b <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+            else:
+                merged.append((b, e))
+        self.pending = merged
+        return True
+
+    def pop(self):
+        self.in_flight = self.pending.pop(0)
+        return self.in_flight
+
+    def done(self):
+        self.in_flight = None
+
+    def discard_outside(self, begin, end):
+        """
+        Drop pending ranges that neither overlap nor touch ``begin`` to ``end``.
+        """
+        self.pending = [x for x in self.pending if x[1] >= begin and x[0] <= end]
+
+    def clear(self):
+        self.pending = []
+
+def split_window(cache, cached_begin, cached_end, begin, end, results):
+    """
+    Split a fetched window of annotations into those to add before and
+    after the cached ones.
+
+    Annotations already cached are skipped, and a side of the window that
+    does not reach the cache is dropped, since adding it would leave a gap.
+
+    Returns
+    -------
+    list
+        Annotations to add before the cache
+    list
+        Annotations to add after the cache
+    float
+        New beginning and
+    float
+        end of the cached time range
+    """
+    cached_ids = set(x.id for x in cache)
+    preceding = []
+    following = []
+    if begin < cached_begin <= end:
+        preceding = [r for r in results if r.begin < cached_begin and r.id not in cached_ids]
+        cached_ids.update(r.id for r in preceding)
+        cached_begin = begin
+    if begin <= cached_end < end:
+        following = [r for r in results if r.end > cached_end and r.id not in cached_ids]
+        cached_end = end
+    return preceding, following, cached_begin, cached_end
@@ -29,11 +29,38 @@ class Column(object):
         att = att.column_name(self.name)
         return att
 
+    def type(self, hierarchy, to_find):
+        """
+        Look up the Python type of the column's values from the token and
+        type properties in the hierarchy, returning None if it is unknown.
+        """
+        prop = self.attribute[-1]
+        if prop in ['begin', 'end', 'duration'] or 'pitch' in self.attribute:
+            return float
+        if 'speaker' in self.attribute or 'discourse' in self.attribute:
+            if prop == 'name':
+                return str
+            return None
+        a_type = to_find
+        for a in self.attribute[:-1]:
+            if a in hierarchy.annotation_types:
+                a_type = a
+        properties = list(hierarchy.token_properties.get(a_type, [])) + \
+                    list(hierarchy.type_properties.get(a_type, []))
+        for k, t in properties:
+            if k == prop and t in [str, int, float, bool]:
+                return t
+        return None
+
     def __repr__(self):
         return '<Column {}, {}>'.format(self.attribute, self.name)
 
 class ExportProfile(BaseProfile):
     extension = '.exportprofile'
+    format = 'CSV'
+    compression = None
+    shard_by = None
+    max_connections = 4
     def __init__(self):
         self.columns = []
         self.name = ''
@@ -49,3 +76,8 @@ class ExportProfile(BaseProfile):
             except AttributeError:
                 pass
         return columns
+
+    def column_types(self, hierarchy, to_find = None):
+        if to_find is None:
+            to_find = self.to_find
+        return {x.name: x.type(hierarchy, to_find) for x in self.columns}
@@ -22,14 +22,36 @@ class SCTProgressBar(QtWidgets.QWidget):
         self.cancelButton.setIcon(QtWidgets.qApp.style().standardIcon(QtWidgets.QStyle.SP_DialogCancelButton))
         self.cancelButton.clicked.connect(self.cancelWorker)
         self.worker.finishedCancelling.connect(self.finishCancelling)
+
+        self.shardList = QtWidgets.QListWidget()
+        self.shardList.hide()
+        self.shardItems = {}
+        if hasattr(self.worker, 'shardProgress'):
+            self.worker.shardProgress.connect(self.updateShard)
+
         layout = QtWidgets.QVBoxLayout()
         layout.addWidget(self.label)
         pglayout.addWidget(self.progressBar)
         pglayout.addWidget(self.cancelButton)
         layout.addLayout(pglayout)
+        layout.addWidget(self.shardList)
         self.setLayout(layout)
         self.done = False
 
+    def updateShard(self, name, num_rows, status):
+        text = '{}: {} rows ({})'.format(name, num_rows, status)
+        if name not in self.shardItems:
+            self.shardItems[name] = QtWidgets.QListWidgetItem(text)
+            self.shardList.addItem(self.shardItems[name])
+            self.shardList.show()
+        else:
+            self.shardItems[name].setText(text)
+
+    def clearShards(self):
+        self.shardList.clear()
+        self.shardItems = {}
+        self.shardList.hide()
+
     def cancelWorker(self):
         if not self.done:
             self.cancelButton.setEnabled(False)
@@ -55,9 +77,14 @@ class ProgressWidget(QtWidgets.QDialog):
     def __init__(self, parent = None):
         super(ProgressWidget, self).__init__(parent)
         self.progressBars = {}
+        self.jobItems = {}
 
         self.mainLayout = QtWidgets.QVBoxLayout()
 
+        self.jobList = QtWidgets.QListWidget()
+        self.jobList.hide()
+        self.mainLayout.addWidget(self.jobList)
+
         self.setLayout(self.mainLayout)
 
         self.setWindowTitle('Progress bars')
@@ -65,12 +92,27 @@ class ProgressWidget(QtWidgets.QDialog):
     def createProgressBar(self, key, worker):
         if key in self.progressBars:
             self.progressBars[key].show()
+            self.progressBars[key].clearShards()
             self.progressBars[key].done = False
         else:
             pb = SCTProgressBar(self, worker)
             self.progressBars[key] = pb
             self.mainLayout.addWidget(pb)
 
+    def updateJob(self, job):
+        if job.state == 'queued' and job.depends:
+            waiting = [x.step for x in job.depends if x.state != 'done']
+            state = 'waiting for {}'.format(', '.join(waiting))
+        else:
+            state = job.state
+        text = '{} ({}): {}'.format(job.step, job.corpus, state)
+        if job.id not in self.jobItems:
+            self.jobItems[job.id] = QtWidgets.QListWidgetItem(text)
+            self.jobList.addItem(self.jobItems[job.id])
+            self.jobList.show()
+        else:
+            self.jobItems[job.id].setText(text)
+
     def cleanup(self):
         pb = self.sender()
         self.mainLayout.removeWidget(pb)
@@ -0,0 +1,290 @@
+import numpy as np
+
+def make_safe(data):
+    if isinstance(data,float):
+        data = str(round(data, 3))
+    elif isinstance(data,bool):
+        if data:
+            data = 'Yes'
+        else:
+            data = 'No'
+    elif isinstance(data,(list, tuple)):
+        data = ', '.join(make_safe(x) for x in data)
+    else:
+        data = str(data)
+    return data
+
+def annotation_value(annotation, column):
+    if column == 'speaker':
+        return annotation.speaker.name
+    elif column == 'discourse':
+        return annotation.discourse.name
+    return getattr(annotation, column, None)
+
+def is_numeric(value):
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+class GrowableArray(object):
+    """
+    A 1D NumPy array that can be appended to in amortized constant time
+    by doubling its capacity, so that pages can be added one at a time.
+    """
+    def __init__(self, dtype, capacity = 16):
+        self.data = np.empty(capacity, dtype = dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, values):
+        values = np.asarray(values, dtype = self.data.dtype)
+        new_size = self.size + values.shape[0]
+        if new_size > self.data.shape[0]:
+            capacity = max(new_size, 2 * self.data.shape[0])
+            data = np.empty(capacity, dtype = self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+        self.data[self.size:new_size] = values
+        self.size = new_size
+
+    @property
+    def values(self):
+        return self.data[:self.size]
+
+    def __getstate__(self):
+        return {'data': self.values.copy(), 'size': self.size}
+
+class NumericColumn(object):
+    kind = 'numeric'
+    def __init__(self):
+        self.array = GrowableArray(np.float64)
+        self.integer = True
+
+    def __len__(self):
+        return len(self.array)
+
+    def extend(self, values):
+        for v in values:
+            if v is not None and not float(v).is_integer():
+                self.integer = False
+                break
+        self.array.extend([np.nan if v is None else v for v in values])
+
+    def convert(self, v):
+        if np.isnan(v):
+            return None
+        if self.integer:
+            return int(v)
+        return float(v)
+
+    def value(self, row):
+        return self.convert(self.array.data[row])
+
+    def values(self):
+        return [self.value(i) for i in range(len(self))]
+
+    def display(self, row):
+        # Formatted on demand, since the view only asks for visible rows
+        return make_safe(self.value(row))
+
+    def sort_values(self):
+        return self.array.values
+
+class CategoricalColumn(object):
+    """
+    Dictionary-encoded column: each distinct value is stored once in
+    ``categories`` and rows only hold an integer code into it.
+    """
+    kind = 'categorical'
+    def __init__(self):
+        self.codes = GrowableArray(np.int32)
+        self.categories = []
+        self.display_strings = []
+        self._lookup = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def code(self, value):
+        if isinstance(value, list):
+            value = tuple(value)
+        try:
+            return self._lookup[value]
+        except KeyError:
+            c = len(self.categories)
+            self._lookup[value] = c
+            self.categories.append(value)
+            self.display_strings.append(make_safe(value))
+            return c
+
+    def extend(self, values):
+        self.codes.extend([self.code(v) for v in values])
+
+    def extend_codes(self, other):
+        mapping = np.array([self.code(v) for v in other.categories], dtype = np.int32)
+        if len(other):
+            self.codes.extend(mapping[other.codes.values])
+
+    def value(self, row):
+        return self.categories[self.codes.data[row]]
+
+    def values(self):
+        return [self.categories[c] for c in self.codes.values]
+
+    def display(self, row):
+        return self.display_strings[self.codes.data[row]]
+
+    def sort_value(self, row):
+        value = self.value(row)
+        if isinstance(value, tuple):
+            if len(value):
+                return value[0]
+            return None
+        return value
+
+class ColumnarResults(object):
+    """
+    Compact store for query results.
+
+    Numeric columns are kept as float arrays and everything else (labels,
+    speakers, discourses, ...) as dictionary-encoded arrays, so that the
+    annotation objects returned by polyglotdb can be dropped once the
+    store is built.
+    """
+    def __init__(self, columns):
+        self.columns = columns
+        self.data = {c: NumericColumn() for c in columns}
+        self.last_id = None
+
+    @classmethod
+    def from_annotations(cls, annotations, columns = None):
+        if columns is None:
+            if len(annotations) > 0:
+                columns = [x for x in annotations[0].properties if x not in ['id']] + ['discourse', 'speaker']
+            else:
+                columns = ['label', 'begin', 'end', 'discourse', 'speaker']
+        results = cls(columns)
+        results.add_annotations(annotations)
+        return results
+
+    def __len__(self):
+        return len(self.data[self.columns[0]])
+
+    def add_annotations(self, annotations):
+        for c in self.columns:
+            self.add_values(c, [annotation_value(a, c) for a in annotations])
+        if len(annotations):
+            self.last_id = annotations[-1].id
+
+    def add_values(self, column, values):
+        current = self.data[column]
+        if current.kind == 'numeric' and \
+                not all(v is None or is_numeric(v) for v in values):
+            current = self.to_categorical(column)
+        current.extend(values)
+
+    def to_categorical(self, column):
+        numeric = self.data[column]
+        categorical = CategoricalColumn()
+        categorical.extend(numeric.values())
+        self.data[column] = categorical
+        return categorical
+
+    def extend(self, other):
+        """
+        Append another page of results that was built with the same columns.
+        """
+        for c in self.columns:
+            current = self.data[c]
+            new = other.data[c]
+            if current.kind == 'numeric' and new.kind == 'categorical':
+                current = self.to_categorical(c)
+            if current.kind == 'numeric':
+                current.array.extend(new.array.values)
+                current.integer = current.integer and new.integer
+            elif new.kind == 'categorical':
+                current.extend_codes(new)
+            else:
+                current.extend(new.values())
+        if other.last_id is not None:
+            self.last_id = other.last_id
+
+    def value(self, row, column):
+        return self.data[column].value(row)
+
+    def display(self, row, column):
+        return self.data[column].display(row)
+
+    def sort_value(self, row, column):
+        data = self.data[column]
+        if data.kind == 'numeric':
+            return data.value(row)
+        return data.sort_value(row)
+
+def category_key(value):
+    if isinstance(value, tuple):
+        value = value[0] if len(value) else None
+    if value is None:
+        return (2, 0, '')
+    if is_numeric(value):
+        return (0, value, '')
+    return (1, 0, str(value))
+
+def sort_keys(data):
+    """
+    Return a float array that orders the rows of a column, with None
+    mapped to NaN.  Categorical columns are ranked once per category
+    rather than once per row.
+    """
+    if data.kind == 'numeric':
+        return data.sort_values()
+    categories = list(data.categories)
+    order = sorted(range(len(categories)), key = lambda x: category_key(categories[x]))
+    ranks = np.empty(len(categories), dtype = np.float64)
+    ranks[order] = np.arange(len(categories))
+    for i, c in enumerate(categories):
+        if category_key(c)[0] == 2:
+            ranks[i] = np.nan
+    return ranks[data.codes.values]
+
+def sort_index(results, column, descending = False, rows = None):
+    """
+    Compute the permutation of ``rows`` (all rows if None) that sorts
+    them on ``column``.  The sort is stable and missing values are
+    always placed last.
+    """
+    if rows is None:
+        rows = np.arange(len(results))
+    keys = sort_keys(results.data[column])[rows]
+    if descending:
+        keys = -keys
+    keys[np.isnan(keys)] = np.inf
+    return rows[np.argsort(keys, kind = 'mergesort')]
+
+def filter_index(results, text, rows = None):
+    """
+    Return the subset of ``rows`` (all rows if None), in the same order,
+    where the displayed value of any column (labels, speakers, durations,
+    ...) contains ``text``, ignoring case.
+
+    Since a row that matches a string also matches every substring of it,
+    the index returned for one filter text can be passed back in as
+    ``rows`` to narrow it for a longer text.
+    """
+    if rows is None:
+        rows = np.arange(len(results))
+    text = text.lower()
+    mask = np.zeros(len(rows), dtype = bool)
+    for c in results.columns:
+        data = results.data[c]
+        if data.kind == 'numeric':
+            # Each distinct value is only formatted once
+            values, inverse = np.unique(data.array.data[rows], return_inverse = True)
+            matches = np.array([text in make_safe(data.convert(x)).lower() for x in values], dtype = bool)
+            if matches.any():
+                mask |= matches[inverse.reshape(-1)]
+            continue
+        matches = np.array([text in x.lower() for x in data.display_strings], dtype = bool)
+        if matches.any():
+            mask |= matches[data.codes.data[rows]]
+    return rows[mask]
@@ -0,0 +1,215 @@
+import time
+
+ENRICHMENT_DEPENDENCIES = {'utterances': ['pauses'],
+                        'speech_rate': ['utterances'],
+                        'utterance_position': ['utterances'],
+                        'syllables': ['syllabics']}
+
+class Job(object):
+    """
+    One step of an enrichment pipeline.
+
+    Parameters
+    ----------
+    id : int
+        Position of the job in submission order
+    step : str
+        Name of the step, such as ``'pauses'`` or ``'speech_rate'``
+    corpus : str
+        Name of the corpus the step runs on
+    params : dict
+        Parameters of the step
+    depends : list
+        Jobs that must finish before this one starts
+    writes : set
+        Resources the step writes to, which no other running job may hold
+    """
+    def __init__(self, id, step, corpus, params, depends, writes):
+        self.id = id
+        self.step = step
+        self.corpus = corpus
+        self.params = params
+        self.depends = depends
+        self.writes = writes
+        self.state = 'queued'
+        self.error = None
+        self.begin = None
+        self.end = None
+
+    def __repr__(self):
+        return '<Job {} {} ({}): {}>'.format(self.id, self.step, self.corpus, self.state)
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    @property
+    def duration(self):
+        if self.begin is None or self.end is None:
+            return None
+        return self.end - self.begin
+
+class JobScheduler(object):
+    """
+    Orders enrichment jobs by their dependencies and decides which can run.
+
+    Jobs start in submission order once every job they depend on is done,
+    at most ``max_concurrent`` at a time.  A job does not start while a
+    running job holds any resource it writes to, so steps writing to the
+    same corpus graph run one after another.  When a job fails or is
+    cancelled, every job depending on it is cancelled.
+
+    The scheduler does not run anything itself: callers start the jobs
+    returned by ``ready`` and report back through ``finish``.
+
+    Parameters
+    ----------
+    max_concurrent : int
+        Number of jobs that may run at once
+    dependencies : dict
+        Steps that must run before each step on the same corpus, when they
+        are pending
+    """
+    def __init__(self, max_concurrent = 2, dependencies = None):
+        if dependencies is None:
+            dependencies = ENRICHMENT_DEPENDENCIES
+        self.max_concurrent = max_concurrent
+        self.dependencies = dependencies
+        self.jobs = []
+
+    def pending(self, step = None, corpus = None):
+        return [x for x in self.jobs if not x.finished
+                and (step is None or x.step == step)
+                and (corpus is None or x.corpus == corpus)]
+
+    def running(self):
+        return [x for x in self.jobs if x.state == 'running']
+
+    def add(self, step, corpus = None, params = None, depends = None, writes = None):
+        """
+        Add a job and return it.
+
+        If ``depends`` is None, the job depends on the latest pending job of
+        each step that its step requires on the same corpus.  If ``writes``
+        is None, the job writes to the graph of its corpus.
+        """
+        if depends is None:
+            depends = []
+            for required in self.dependencies.get(step, []):
+                previous = self.pending(required, corpus)
+                if previous:
+                    depends.append(previous[-1])
+        for d in depends:
+            if d not in self.jobs:
+                raise(ValueError('Job {} depends on a job that was not added.'.format(step)))
+        if writes is None:
+            writes = [('graph', corpus)]
+        job = Job(len(self.jobs), step, corpus, params or {}, list(depends), set(writes))
+        self.jobs.append(job)
+        if any(d.state in ('failed', 'cancelled') for d in depends):
+            self.cancel(job)
+        return job
+
+    def add_graph(self, steps):
+        """
+        Add a DAG of steps and return their jobs in the order added.
+
+        Each step is a dict with a ``name`` unique within the graph, a
+        ``step``, and optionally a ``corpus``, ``params``, ``writes`` and a
+        list of names of steps it runs ``after``.  Steps are added in
+        dependency order, and a ValueError is raised for unknown names or
+        cycles.
+        """
+        by_name = {}
+        for s in steps:
+            if s['name'] in by_name:
+                raise(ValueError('Duplicate step name {}.'.format(s['name'])))
+            by_name[s['name']] = s
+        for s in steps:
+            for a in s.get('after', []):
+                if a not in by_name:
+                    raise(ValueError('Step {} runs after unknown step {}.'.format(s['name'], a)))
+        added = {}
+        jobs = []
+        visiting = set()
+        def visit(s):
+            if s['name'] in added:
+                return added[s['name']]
+            if s['name'] in visiting:
+                raise(ValueError('Steps form a cycle through {}.'.format(s['name'])))
+            visiting.add(s['name'])
+            depends = [visit(by_name[a]) for a in s.get('after', [])]
+            visiting.discard(s['name'])
+            job = self.add(s['step'], s.get('corpus'), s.get('params'), depends, s.get('writes'))
+            added[s['name']] = job
+            jobs.append(job)
+            return job
+        for s in steps:
+            visit(s)
+        return jobs
+
+    def ready(self):
+        """
+        Return the queued jobs that can start now, in submission order.
+        """
+        running = self.running()
+        held = set()
+        for job in running:
+            held |= job.writes
+        capacity = self.max_concurrent - len(running)
+        ready = []
+        for job in self.jobs:
+            if capacity <= 0:
+                break
+            if job.state != 'queued':
+                continue
+            if not all(d.state == 'done' for d in job.depends):
+                continue
+            if job.writes & held:
+                continue
+            ready.append(job)
+            held |= job.writes
+            capacity -= 1
+        return ready
+
+    def start(self, job, now = None):
+        job.state = 'running'
+        job.begin = time.time() if now is None else now
+
+    def finish(self, job, state = 'done', error = None, now = None):
+        """
+        Record the end of a running job, with a state of done, failed or
+        cancelled, and cancel the jobs depending on it if it did not
+        succeed.  Returns the jobs whose state changed.
+        """
+        job.state = state
+        job.error = error
+        job.end = time.time() if now is None else now
+        changed = [job]
+        if state != 'done':
+            changed.extend(self.cancel_dependents(job))
+        return changed
+
+    def cancel(self, job):
+        """
+        Cancel a job that has not started, along with its dependents.
+        """
+        if job.state != 'queued':
+            return []
+        job.state = 'cancelled'
+        return [job] + self.cancel_dependents(job)
+
+    def cancel_dependents(self, job):
+        changed = []
+        for other in self.jobs:
+            if job in other.depends:
+                changed.extend(self.cancel(other))
+        return changed
+
+    def timings(self):
+        """
+        Return the step, corpus, state and timing of every job.
+        """
+        return [{'id': x.id, 'step': x.step, 'corpus': x.corpus, 'state': x.state,
+                'begin': x.begin, 'end': x.end, 'duration': x.duration}
+                for x in self.jobs]
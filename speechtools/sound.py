@@ -0,0 +1,199 @@
+import os
+import wave
+import hashlib
+
+import numpy as np
+
+from polyglotdb.config import BASE_DIR
+
+DECODED_DIR = os.path.join(BASE_DIR, 'decoded')
+
+DECODE_BLOCK_SIZE = 65536
+
+def sound_file_path(sound_file):
+    """
+    Return the path of the version of a sound file used for display,
+    in the same order of preference as LongSoundFile.
+    """
+    path = None
+    for attr in ['consonant_filepath', 'vowel_filepath', 'low_freq_filepath', 'filepath']:
+        path = getattr(sound_file, attr, None)
+        if path is None:
+            continue
+        path = os.path.expanduser(path)
+        if os.path.exists(path):
+            break
+    return path
+
+def decoded_path(path):
+    stat = os.stat(path)
+    key = '{}\n{}\n{}'.format(os.path.abspath(path), stat.st_size, stat.st_mtime)
+    name = hashlib.sha1(key.encode('utf8')).hexdigest()
+    return os.path.join(DECODED_DIR, name + '.wav')
+
+def decode_blocks(path, wav_path):
+    """
+    Write a compressed sound file to a WAV file a block at a time, through
+    soundfile for the formats of libsndfile and audioread (as librosa does)
+    for the others.
+    """
+    try:
+        import soundfile
+        info = soundfile.info(path)
+    except (ImportError, RuntimeError):
+        info = None
+    if info is not None:
+        with soundfile.SoundFile(wav_path, 'w', info.samplerate, info.channels,
+                                subtype = 'FLOAT', format = 'WAV') as out:
+            for block in soundfile.blocks(path, blocksize = DECODE_BLOCK_SIZE,
+                                        dtype = 'float32', always_2d = True):
+                out.write(block)
+        return
+    import audioread
+    with audioread.audio_open(path) as f:
+        out = wave.open(wav_path, 'wb')
+        try:
+            out.setnchannels(f.channels)
+            out.setsampwidth(2)
+            out.setframerate(f.samplerate)
+            for buf in f:
+                out.writeframes(buf)
+        finally:
+            out.close()
+
+def decode(path):
+    """
+    Decode a compressed sound file once to a WAV file under
+    BASE_DIR/decoded, without holding it in memory, and return its path.
+    """
+    wav_path = decoded_path(path)
+    if os.path.exists(wav_path):
+        return wav_path
+    os.makedirs(DECODED_DIR, exist_ok = True)
+    temp_path = wav_path + '.tmp'
+    try:
+        decode_blocks(path, temp_path)
+        os.replace(temp_path, wav_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return wav_path
+
+def load_signal(path):
+    """
+    Open a sound file as an array of shape (samples, channels) without
+    reading it into memory.  WAV files are memory-mapped directly and
+    other formats through a decoded cache.
+
+    Returns
+    -------
+    int
+        Sampling rate
+    array
+        Samples, in their stored type
+    float
+        Scale and
+    float
+        offset that map the samples to [-1, 1] as (x - offset) / scale
+    """
+    from scipy.io import wavfile
+    try:
+        sr, signal = wavfile.read(path, mmap = True)
+    except ValueError:
+        sr, signal = wavfile.read(decode(path), mmap = True)
+    if signal.ndim == 1:
+        signal = signal[:, None]
+    if signal.dtype.kind in 'iu':
+        info = np.iinfo(signal.dtype)
+        if signal.dtype.kind == 'u':
+            offset = (info.max + 1) / 2
+            return sr, signal, offset, offset
+        return sr, signal, max(abs(info.min), info.max), 0
+    return sr, signal, 1, 0
+
+class MappedSoundFile(object):
+    """
+    Memory-mapped sound file with the interface of LongSoundFile.
+
+    The whole file counts as cached, so the view never needs to reload a
+    window; every accessor reads only the samples it returns.
+
+    Parameters
+    ----------
+    path : str
+        Path to the sound file
+    """
+    def __init__(self, path):
+        self.path = path
+        self.sr, self.signal, self.scale, self.offset = load_signal(path)
+        self.num_channels = self.signal.shape[1]
+        self.duration = self.signal.shape[0] / self.sr
+        self.cached_begin = 0
+        self.cached_end = self.duration
+
+    def sample_range(self, begin, end, sr = None):
+        if sr is None:
+            sr = self.sr
+        if begin is None or begin < 0:
+            begin = 0
+        if end is None or end > self.duration:
+            end = self.duration
+        return int(np.floor(begin * sr)), int(np.ceil(end * sr))
+
+    def samples(self, begin, end, channel = 0):
+        """
+        Return the stored samples of a window as a view of the file,
+        without copying or scaling them.
+        """
+        start, stop = self.sample_range(begin, end)
+        return self.signal[start:stop, channel]
+
+    def padded_samples(self, start, stop, channel = 0):
+        """
+        Return samples ``start`` to ``stop`` of a channel scaled to [-1, 1],
+        with zeros for any part of the range outside the file.
+        """
+        data = np.zeros(stop - start, dtype = np.float64)
+        lo = max(start, 0)
+        hi = min(stop, self.signal.shape[0])
+        if hi > lo:
+            data[lo - start:hi - start] = (self.signal[lo:hi, channel] - self.offset) / self.scale
+        return data
+
+    def visible_signal(self, begin, end, channel = 0):
+        return (self.samples(begin, end, channel).astype(np.float64) - self.offset) / self.scale
+
+    def downsampling_factor(self, sr):
+        return max(int(self.sr // sr), 1)
+
+    def downsampled_rate(self, sr):
+        """
+        Return the actual sampling rate of ``visible_downsampled`` for a
+        target rate, which is only approximate when the target does not
+        divide the rate of the file.
+        """
+        return self.sr / self.downsampling_factor(sr)
+
+    def visible_downsampled(self, begin, end, channel, sr):
+        factor = self.downsampling_factor(sr)
+        start, stop = self.sample_range(begin, end)
+        stop = start + (stop - start) // factor * factor
+        data = self.signal[start:stop, channel].astype(np.float64)
+        data = data.reshape(-1, factor).mean(axis = 1)
+        return (data - self.offset) / self.scale
+
+    def visible_downsampled_1000(self, begin, end, channel = 0):
+        return self.visible_downsampled(begin, end, channel, 1000)
+
+    def visible_downsampled_100(self, begin, end, channel = 0):
+        return self.visible_downsampled(begin, end, channel, 100)
+
+    def visible_preemph_signal(self, begin, end, channel = 0):
+        from scipy.signal import lfilter
+        return lfilter([1., -0.95], 1, self.visible_signal(begin, end, channel))
+
+def open_sound_file(sound_file):
+    path = sound_file_path(sound_file)
+    if path is None or not os.path.exists(path):
+        return None
+    return MappedSoundFile(path)
@@ -0,0 +1,490 @@
+import os
+import time
+import shutil
+import pickle
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from polyglotdb import CorpusContext
+from polyglotdb.config import CorpusConfig
+
+from .cache import query_cache
+
+from .writers import export_formats
+
+from .pool import borrow_context, context_pool
+
+from .metadata import metadata_cache
+
+PAGE_SIZE = 500
+
+def no_call_back(*args):
+    pass
+
+def no_stop_check():
+    return False
+
+def invalidate_corpus(corpus_name):
+    """
+    Drop the cached query results, metadata and pooled contexts of a
+    corpus after its graph has been modified.
+    """
+    query_cache.invalidate(corpus_name)
+    context_pool().invalidate(corpus_name)
+    metadata_cache.invalidate(corpus_name)
+
+def profile_query(corpus_context, profile):
+    a_type = getattr(corpus_context, profile.to_find)
+    query = corpus_context.query_graph(a_type)
+    query = query.filter(*profile.for_polyglot(corpus_context))
+    return a_type, query
+
+def page_query(corpus_context, profile, cursor = None, page_size = PAGE_SIZE):
+    """
+    Build the query for one page of a profile's results.
+
+    Pages are fetched by keyset rather than by SKIP, ordering on the
+    annotation id and starting after the last id of the previous page,
+    so each page costs the same regardless of how deep it is.
+    """
+    a_type, query = profile_query(corpus_context, profile)
+    if cursor is not None:
+        query = query.filter(a_type.id > cursor)
+    query = query.order_by(a_type.id)
+    query = query.limit(page_size)
+    return a_type, query
+
+def import_corpus(name, directory, call_back = no_call_back, stop_check = no_stop_check,
+                graph_host = 'localhost', graph_port = 7474):
+    """
+    Reset a corpus and load it from a directory, guessing the format of
+    its files.  Returns the files that could not be parsed.
+    """
+    reset = True
+    config = CorpusConfig(name, graph_host = graph_host, graph_port = graph_port)
+    from polyglotdb.io import (inspect_buckeye, inspect_textgrid, inspect_timit,
+                            inspect_labbcat, inspect_mfa, inspect_fave,
+                            guess_textgrid_format)
+    with CorpusContext(config) as c:
+        if name == 'buckeye':
+            parser = inspect_buckeye(directory)
+        elif name == 'timit':
+            parser = inspect_timit(directory)
+        else:
+            form = guess_textgrid_format(directory)
+            if form == 'labbcat':
+                parser = inspect_labbcat(directory)
+            elif form == 'mfa':
+                parser = inspect_mfa(directory)
+            elif form == 'fave':
+                parser = inspect_fave(directory)
+            else:
+                parser = inspect_textgrid(directory)
+
+        parser.call_back = call_back
+        parser.stop_check = stop_check
+        parser.call_back('Resetting corpus...')
+        if reset:
+            c.reset(call_back = call_back, stop_check = stop_check)
+        could_not_parse = c.load(parser, directory)
+    return could_not_parse
+
+def analyze_acoustics(config, acoustics, call_back = no_call_back, stop_check = no_stop_check):
+    from polyglotdb.acoustics.analysis import acoustic_analysis
+    with CorpusContext(config) as c:
+        acoustic_analysis(c,
+                        stop_check = stop_check,
+                        call_back = call_back,
+                        acoustics = acoustics)
+    return True
+
+def encode_pauses(config, pause_words, call_back = no_call_back, stop_check = no_stop_check):
+    with CorpusContext(config) as c:
+        c.encode_pauses(pause_words,
+                        stop_check = stop_check,
+                        call_back = call_back)
+        if stop_check():
+            call_back('Resetting pauses...')
+            call_back(0, 0)
+            c.reset_pauses()
+            return False
+    return True
+
+def encode_utterances(config, min_pause_length, min_utterance_length,
+                    call_back = no_call_back, stop_check = no_stop_check):
+    with CorpusContext(config) as c:
+        c.encode_utterances(min_pause_length, min_utterance_length,
+                        stop_check = stop_check,
+                        call_back = call_back)
+        if stop_check():
+            call_back('Resetting utterances...')
+            call_back(0, 0)
+            c.reset_utterances()
+            return False
+    return True
+
+def encode_speech_rate(config, to_count, call_back = no_call_back, stop_check = no_stop_check):
+    with CorpusContext(config) as c:
+        c.encode_speech_rate(to_count, stop_check = stop_check,
+                        call_back = call_back)
+        if stop_check():
+            call_back('Resetting speech rate...')
+            call_back(0, 0)
+            c.reset_speech_rate()
+            return False
+    return True
+
+def encode_utterance_position(config, call_back = no_call_back, stop_check = no_stop_check):
+    with CorpusContext(config) as c:
+        c.encode_utterance_position(stop_check = stop_check,
+                        call_back = call_back)
+        if stop_check():
+            call_back('Resetting utterance positions...')
+            call_back(0, 0)
+            c.reset_utterance_position()
+            return False
+    return True
+
+def encode_syllabics(config, segments, call_back = no_call_back, stop_check = no_stop_check):
+    call_back('Encoding syllabics...')
+    call_back(0, 0)
+    with CorpusContext(config) as c:
+        c.reset_class('syllabic')
+        c.encode_class(segments, 'syllabic')
+        if stop_check():
+            call_back('Resetting syllabics...')
+            call_back(0, 0)
+            c.reset_class('syllabic')
+            return False
+    return True
+
+def encode_syllables(config, algorithm, call_back = no_call_back, stop_check = no_stop_check):
+    call_back('Encoding syllables...')
+    call_back(0, 0)
+    with CorpusContext(config) as c:
+        c.encode_syllables(algorithm = algorithm, call_back = call_back, stop_check = stop_check)
+        if stop_check():
+            call_back('Resetting syllables...')
+            call_back(0, 0)
+            c.reset_syllables()
+            return False
+    return True
+
+def encode_phone_subset(config, label, segments, call_back = no_call_back, stop_check = no_stop_check):
+    call_back('Resetting {}s...'.format(label))
+    call_back(0, 0)
+    with CorpusContext(config) as c:
+        c.reset_class(label)
+        c.encode_class(segments, label)
+        if stop_check():
+            call_back('Resetting {}s...'.format(label))
+            call_back(0, 0)
+            c.reset_class(label)
+            return False
+    return True
+
+def enrich_lexicon(config, path, case_sensitive = False, call_back = no_call_back,
+                    stop_check = no_stop_check):
+    call_back('Enriching lexicon...')
+    call_back(0, 0)
+    from polyglotdb.io.enrichment import enrich_lexicon_from_csv
+    with CorpusContext(config) as c:
+        enrich_lexicon_from_csv(c, path)
+        if stop_check():
+            call_back('Resetting lexicon...')
+            call_back(0, 0)
+            c.reset_lexicon()
+            return False
+    return True
+
+def enrich_features(config, path, call_back = no_call_back, stop_check = no_stop_check):
+    call_back('Enriching phonological inventory...')
+    call_back(0, 0)
+    from polyglotdb.io.enrichment import enrich_features_from_csv
+    with CorpusContext(config) as c:
+        enrich_features_from_csv(c, path)
+        if stop_check():
+            call_back('Resetting phonological inventory...')
+            call_back(0, 0)
+            c.reset_lexicon()
+            return False
+    return True
+
+def enrich_speakers(config, path, call_back = no_call_back, stop_check = no_stop_check):
+    call_back('Enriching speakers...')
+    call_back(0,0)
+    from polyglotdb.io.enrichment import enrich_speakers_from_csv
+    with CorpusContext(config) as c:
+        enrich_speakers_from_csv(c, path)
+    return True
+
+def encode_hierarchical_property(config, type, higher, lower, name, subset = None,
+                                call_back = no_call_back, stop_check = no_stop_check):
+    call_back('Encoding {}...'.format(name))
+    call_back(0, 0)
+    with CorpusContext(config) as c:
+        if type == 'count':
+            c.encode_count(higher, lower, name, subset = subset)
+        elif type == 'position':
+            c.encode_position(higher, lower, name, subset = subset)
+        elif type == 'rate':
+            c.encode_rate(higher, lower, name, subset = subset)
+        if stop_check():
+            return False
+    return True
+
+# Method of the corpus context computing each measure, and the type of
+# annotation the measure is encoded on
+RELATIVIZED_MEASURES = {'word_median': ('word_median', 'word'),
+                        'all_word_median': ('all_word_median', 'word'),
+                        'word_mean_duration': ('word_mean_duration', 'word'),
+                        'word_std_dev': ('word_std_dev', 'word'),
+                        'baseline_duration': ('baseline_duration', 'word'),
+                        'phone_mean': ('phone_mean_duration', 'phone'),
+                        'phone_median': ('phone_median', 'phone'),
+                        'phone_std_dev': ('phone_std_dev', 'phone'),
+                        'phone_mean_duration_with_speaker': ('phone_mean_duration_with_speaker', 'speaker'),
+                        'word_mean_by_speaker': ('word_mean_duration_with_speaker', 'speaker'),
+                        'all_phone_median': ('all_phone_median', 'phone'),
+                        'syllable_mean': ('syllable_mean_duration', 'syllable'),
+                        'syllable_median': ('syllable_median', 'syllable'),
+                        'syllable_std_dev': ('syllable_std_dev', 'syllable'),
+                        'mean_speech_rate': ('average_speech_rate', 'speaker')}
+
+def encode_relativized_measure(config, measure, call_back = no_call_back, stop_check = no_stop_check):
+    if measure not in RELATIVIZED_MEASURES:
+        raise(ValueError('Unknown measure {}.'.format(measure)))
+    call_back('Encoding {}...'.format(measure))
+    call_back(0, 0)
+    method, data_type = RELATIVIZED_MEASURES[measure]
+    with CorpusContext(config) as c:
+        res = getattr(c, method)()
+        c.encode_measure(res, data_type)
+        if stop_check():
+            return False
+    return True
+
+EXPORT_PAGE_SIZE = 5000
+
+CURSOR_COLUMN = 'sct_cursor'
+
+def export_page_query(corpus_context, profile, export_profile, cursor = None,
+                        page_size = EXPORT_PAGE_SIZE, shard = None):
+    """
+    Build the query for one chunk of an export.  The annotation id is
+    returned as an extra column so that the next chunk can start after it.
+    If ``shard`` is given as a tuple of 'discourse' or 'speaker' and a
+    name, only annotations from that discourse or speaker are exported.
+    """
+    a_type, query = page_query(corpus_context, profile, cursor, page_size)
+    if shard is not None:
+        shard_by, name = shard
+        query = query.filter(getattr(a_type, shard_by).name == name)
+    columns = export_profile.for_polyglot(corpus_context, to_find = profile.to_find)
+    columns.append(a_type.id.column_name(CURSOR_COLUMN))
+    query = query.columns(*columns)
+    return a_type, query
+
+def export_chunks(corpus_context, profile, export_profile, stop_check,
+                    page_size = EXPORT_PAGE_SIZE, shard = None):
+    """
+    Generate the rows of an export a chunk at a time, as tuples of the
+    column names and a list of rows.
+    """
+    cursor = None
+    while True:
+        a_type, query = export_page_query(corpus_context, profile, export_profile,
+                                        cursor, page_size, shard)
+        query.stop_check = stop_check
+        results = [x for x in query.all()]
+        if stop_check() or not results:
+            return
+        header = [k for k in results[0].keys() if k != CURSOR_COLUMN]
+        yield header, [[r[k] for k in header] for r in results]
+        cursor = results[-1][CURSOR_COLUMN]
+        if len(results) < page_size:
+            return
+
+def export_temporary_path(path):
+    """
+    Return a hidden path next to ``path`` for an export to be written to
+    before it is renamed into place, so that a cancelled or failed export
+    never leaves a truncated file at ``path``.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, '.{}.{}.part'.format(name, uuid.uuid4().hex[:8]))
+
+def finish_export(temp_path, path, completed):
+    """
+    Move a finished export into place, or remove an incomplete one.
+    """
+    if completed:
+        os.replace(temp_path, path)
+    elif os.path.exists(temp_path):
+        os.remove(temp_path)
+
+def export_writer(hierarchy, profile, export_profile, path, header):
+    types = export_profile.column_types(hierarchy, profile.to_find)
+    writer_class = export_formats[export_profile.format]
+    writer = writer_class(path, header,
+                        types = [types.get(k, None) for k in header],
+                        compression = export_profile.compression)
+    writer.open()
+    return writer
+
+def export_query(config, profile, export_profile, path, call_back = no_call_back,
+                stop_check = no_stop_check, page_size = EXPORT_PAGE_SIZE, shard_progress = None):
+    """
+    Export the results of a query profile to a file.
+
+    If the export profile shards by discourse or speaker, ``shard_progress``
+    is called with the name, number of rows and status of each shard.
+    Returns False if the export was cancelled, in which case nothing is
+    written to ``path``.
+    """
+    if export_profile.shard_by is None:
+        return export_whole(config, profile, export_profile, path, call_back, stop_check, page_size)
+    return export_sharded(config, profile, export_profile, path, call_back, stop_check,
+                        page_size, shard_progress)
+
+def export_whole(config, profile, export_profile, path, call_back, stop_check, page_size):
+    """
+    Export a query over one connection.  The file is written to a temporary
+    path and only moved to ``path`` once the export is complete.  Returns
+    False if it was cancelled.
+    """
+    temp_path = export_temporary_path(path)
+    writer = None
+    completed = False
+    begin = time.time()
+    try:
+        with borrow_context(config) as c:
+            for header, rows in export_chunks(c, profile, export_profile, stop_check, page_size):
+                if writer is None:
+                    writer = export_writer(c.hierarchy, profile, export_profile, temp_path, header)
+                writer.write_rows(rows)
+                elapsed = time.time() - begin
+                call_back('Exported {} rows ({} rows/sec)'.format(writer.num_rows,
+                                                int(writer.num_rows / max(elapsed, 0.001))))
+            if stop_check():
+                return False
+            if writer is None:
+                writer = export_writer(c.hierarchy, profile, export_profile, temp_path,
+                                        [x.name for x in export_profile.columns])
+        w, writer = writer, None
+        w.close()
+        completed = True
+    finally:
+        if writer is not None:
+            writer.close()
+        finish_export(temp_path, path, completed)
+    return True
+
+def export_shard(config, profile, export_profile, shard, part_path, stop_check,
+                page_size, shard_progress):
+    """
+    Export the rows of one discourse or speaker to a part file of
+    pickled chunks, using its own connection.
+    """
+    num_rows = 0
+    shard_progress(shard[1], num_rows, 'running')
+    with borrow_context(config) as c, open(part_path, 'wb') as f:
+        for chunk in export_chunks(c, profile, export_profile, stop_check, page_size, shard):
+            pickle.dump(chunk, f, protocol = pickle.HIGHEST_PROTOCOL)
+            num_rows += len(chunk[1])
+            shard_progress(shard[1], num_rows, 'running')
+    if stop_check():
+        shard_progress(shard[1], num_rows, 'cancelled')
+        return False
+    shard_progress(shard[1], num_rows, 'done')
+    return True
+
+def export_sharded(config, profile, export_profile, path, call_back, stop_check,
+                    page_size, shard_progress = None):
+    """
+    Split the export into one query per discourse or speaker, run them
+    over a bounded number of connections and merge the part files in
+    order once all of them are finished.  The merged file is moved to
+    ``path`` once it is complete.  If the export is cancelled, nothing is
+    merged and False is returned.
+    """
+    if shard_progress is None:
+        shard_progress = no_call_back
+    shard_by = export_profile.shard_by
+    failed = []
+    def shard_stop_check():
+        return bool(failed) or stop_check()
+
+    with borrow_context(config) as c:
+        if shard_by == 'speaker':
+            names = sorted(c.speakers)
+        else:
+            names = sorted(c.discourses)
+        hierarchy = c.hierarchy
+    call_back('Exporting {} {}s...'.format(len(names), shard_by))
+    call_back(0, len(names))
+
+    part_directory = tempfile.mkdtemp(prefix = 'sct_export')
+    parts = [os.path.join(part_directory, '{}.part'.format(i)) for i in range(len(names))]
+    completed = [False for x in names]
+    try:
+        with ThreadPoolExecutor(max_workers = export_profile.max_connections) as executor:
+            futures = {executor.submit(export_shard, config, profile, export_profile, (shard_by, n),
+                                        parts[i], shard_stop_check, page_size, shard_progress): i
+                        for i, n in enumerate(names)}
+            for j, future in enumerate(as_completed(futures)):
+                try:
+                    completed[futures[future]] = future.result()
+                except Exception:
+                    # Stop the remaining shards before reporting the error
+                    failed.append(True)
+                    raise
+                call_back(j + 1)
+        if stop_check() or not all(completed):
+            return False
+        call_back('Merging {} part files...'.format(len(parts)))
+        temp_path = export_temporary_path(path)
+        writer = None
+        merged = False
+        try:
+            for part in parts:
+                with open(part, 'rb') as f:
+                    while True:
+                        try:
+                            header, rows = pickle.load(f)
+                        except EOFError:
+                            break
+                        if writer is None:
+                            writer = export_writer(hierarchy, profile, export_profile,
+                                                    temp_path, header)
+                        writer.write_rows(rows)
+            if writer is None:
+                writer = export_writer(hierarchy, profile, export_profile, temp_path,
+                                        [x.name for x in export_profile.columns])
+            w, writer = writer, None
+            w.close()
+            merged = True
+        finally:
+            if writer is not None:
+                writer.close()
+            finish_export(temp_path, path, merged)
+    finally:
+        shutil.rmtree(part_directory, ignore_errors = True)
+    return True
+
+# Tasks that modify the corpus graph, by the name of their step
+ENRICHMENT_TASKS = {'import': import_corpus,
+                    'acoustic': analyze_acoustics,
+                    'pauses': encode_pauses,
+                    'utterances': encode_utterances,
+                    'speech_rate': encode_speech_rate,
+                    'utterance_position': encode_utterance_position,
+                    'syllabics': encode_syllabics,
+                    'syllables': encode_syllables,
+                    'subset': encode_phone_subset,
+                    'lexicon': enrich_lexicon,
+                    'features': enrich_features,
+                    'speakers': enrich_speakers,
+                    'hierarchical': encode_hierarchical_property,
+                    'relativized': encode_relativized_measure}
@@ -4,6 +4,8 @@ from PyQt5 import QtGui, QtCore, QtWidgets
 
 class ResultsView(QtWidgets.QTableView):
     viewRequested = QtCore.pyqtSignal(str, float, float)
+    lookaheadRequested = QtCore.pyqtSignal(object)
+    lookahead = 5
     def __init__(self, parent = None):
         super(ResultsView, self).__init__(parent)
         self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
@@ -47,15 +49,28 @@ class ResultsView(QtWidgets.QTableView):
     def markAnnotated(self, value):
         selected = self.selectionModel().selectedRows()
         for s in selected:
-            index = self.model().index(s.row(),0)
-            index = self.model().mapToSource(index)
-            self.model().sourceModel().markRowAsAnnotated(index.row(), value)
+            self.model().markRowAsAnnotated(self.model().sourceRow(s.row()), value)
 
     def requestView(self, index):
-        index = self.model().mapToSource(index)
-        times = self.model().sourceModel().times(index)
-        discourse = self.model().sourceModel().discourse(index)
+        times = self.model().times(index)
+        discourse = self.model().discourse(index)
         self.viewRequested.emit(discourse, *times)
+        self.requestLookahead(index)
+
+    def requestLookahead(self, index):
+        """
+        Ask for the following results, and the previous one, to be prepared
+        for viewing, nearest first.
+        """
+        rows = [index.row() + i for i in range(1, self.lookahead + 1)]
+        rows.insert(1, index.row() - 1)
+        targets = []
+        for r in rows:
+            if r < 0 or r >= self.model().rowCount():
+                continue
+            i = self.model().index(r, 0)
+            targets.append((self.model().discourse(i), *self.model().times(i)))
+        self.lookaheadRequested.emit(targets)
 
     def showMenu(self, pos):
         menu = QtWidgets.QMenu()
@@ -72,7 +87,7 @@ class ResultsView(QtWidgets.QTableView):
         else:
             current = 0
 
-        if current + 1 == self.model().sourceModel().rowCount():
+        if current + 1 == self.model().rowCount():
             return
         index = self.model().index(current + 1,0)
         self.selectionModel().select(index,
@@ -28,10 +28,57 @@ class DetailedMessageBox(QtWidgets.QMessageBox):
             details_box.setFixedHeight(details_box.sizeHint().height())
         return result
 
+class LazyWidget(QtWidgets.QWidget):
+    """
+    Placeholder that constructs its contents the first time it is shown,
+    or when ``widget`` is first called.
+
+    Parameters
+    ----------
+    factory : callable
+        Returns the widget to show in place of the placeholder
+    """
+    built = QtCore.pyqtSignal(object)
+    def __init__(self, factory, parent = None):
+        super(LazyWidget, self).__init__(parent)
+        self.factory = factory
+        self.contents = None
+        layout = QtWidgets.QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+    def isBuilt(self):
+        return self.contents is not None
+
+    def widget(self):
+        if self.contents is None:
+            self.contents = self.factory()
+            self.layout().addWidget(self.contents)
+            self.built.emit(self.contents)
+        return self.contents
+
+    def forward(self, name):
+        """
+        Return a slot calling a method of the contents, constructing them
+        if needed, so that signals can be connected before they exist.
+        """
+        def slot(*args):
+            return getattr(self.widget(), name)(*args)
+        return slot
+
+    def showEvent(self, event):
+        self.widget()
+        super(LazyWidget, self).showEvent(event)
+
 class CollapsibleWidgetPair(QtWidgets.QSplitter):
     def __init__(self, orientation, widgetOne, widgetTwo, collapsible = 1, parent = None):
         super(CollapsibleWidgetPair, self).__init__(orientation, parent)
         self.collapsible = collapsible
+        # Panes given as factories are constructed when first shown
+        if not isinstance(widgetOne, QtWidgets.QWidget):
+            widgetOne = LazyWidget(widgetOne)
+        if not isinstance(widgetTwo, QtWidgets.QWidget):
+            widgetTwo = LazyWidget(widgetTwo)
         self.addWidget(widgetOne)
         self.addWidget(widgetTwo)
         self.setCollapsible(0, False)
@@ -180,6 +227,15 @@ class CollapsibleTabWidget(QtWidgets.QTabWidget):
         self.collapseButton.clicked.connect(self.collapseAll)
         self.setCornerWidget(self.collapseButton)
 
+    def addLazyTab(self, factory, label):
+        """
+        Add a tab whose contents are constructed when it is first shown,
+        and return its LazyWidget.
+        """
+        widget = LazyWidget(factory)
+        self.addTab(widget, label)
+        return widget
+
     def ensureVisible(self):
         self.collapseButton.setText('Collapse')
         self.currentWidget().show()
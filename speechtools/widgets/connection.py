@@ -9,6 +9,10 @@ from polyglotdb.utils import get_corpora_list
 
 from polyglotdb import CorpusContext
 
+from ..pool import context_pool
+
+from ..metadata import metadata_cache
+
 from ..workers import AudioFinderWorker, AudioCheckerWorker
 
 class CorporaList(QtWidgets.QGroupBox):
@@ -249,10 +253,13 @@ class ConnectWidget(QtWidgets.QWidget):
         try:
             corpora = get_corpora_list(config)
             self.corporaList.add(corpora)
-            if config.corpus_name and config.corpus_name in corpora:
+            # Cached metadata is revalidated in the background once connected
+            if (config.corpus_name and config.corpus_name in corpora
+                    and metadata_cache.load(config) is None):
                 with CorpusContext(config) as c:
                     c.hierarchy = c.generate_hierarchy()
                     c.save_variables()
+                context_pool().invalidate(config.corpus_name)
             self.corporaList.select(current_corpus)
         except (ConnectionError, AuthorizationError, NetworkAddressError) as e:
             self.configChanged.emit(None)
@@ -275,6 +282,8 @@ class ConnectWidget(QtWidgets.QWidget):
                 pass
             c.hierarchy = h
             c.save_variables()
+        context_pool().invalidate(config.corpus_name)
+        metadata_cache.invalidate(config.corpus_name)
 
     def changeConfig(self, name):
         host = self.hostEdit.text()
@@ -3,7 +3,7 @@ from collections import OrderedDict
 
 from PyQt5 import QtGui, QtCore, QtWidgets
 
-from polyglotdb import CorpusContext
+from ..metadata import metadata_cache
 
 from .base import RadioSelectWidget
 
@@ -280,8 +280,7 @@ class AnnotationTypeSelect(QtWidgets.QComboBox):
 class EncodeHierarchicalPropertiesDialog(BaseDialog):
     def __init__(self, config, parent):
         super(EncodeHierarchicalPropertiesDialog, self).__init__(parent)
-        with CorpusContext(config) as c:
-            hierarchy = c.hierarchy
+        hierarchy = metadata_cache.get(config, 'hierarchy')
         layout = QtWidgets.QFormLayout()
 
         self.higherSelect = AnnotationTypeSelect(hierarchy)
@@ -352,9 +351,9 @@ class EncodeRelativizedMeasuresDialog(BaseDialog):
         self.optionWidget.addItem("Word")
         self.optionWidget.addItem("Phone")
         self.optionWidget.addItem("Speaker")
-        with CorpusContext(config) as c:
-            if c.hierarchy.has_type_subset(c.phone_name, 'syllabic'): 
-                self.optionWidget.addItem("Syllable")
+        hierarchy = metadata_cache.get(config, 'hierarchy')
+        if hierarchy.has_type_subset(metadata_cache.get(config, 'phone_name'), 'syllabic'):
+            self.optionWidget.addItem("Syllable")
 
         self.optionWidget.currentTextChanged.connect(self.change_view)
         layout.addWidget(self.optionWidget)
@@ -1,7 +1,7 @@
 
 from PyQt5 import QtGui, QtCore, QtWidgets
 
-from polyglotdb import CorpusContext
+from ..metadata import metadata_cache
 
 class PhoneSubsetSelectWidget(QtWidgets.QWidget):
     def __init__(self, config, parent = None):
@@ -9,12 +9,12 @@ class PhoneSubsetSelectWidget(QtWidgets.QWidget):
 
         layout = QtWidgets.QHBoxLayout()
         self.subsetSelect = QtWidgets.QComboBox()
-        with CorpusContext(config) as c:
-            try:
-                for s in c.hierarchy.subset_types[c.phone_name]:
-                    self.subsetSelect.addItem(s)
-            except KeyError:
-                pass
+        hierarchy = metadata_cache.get(config, 'hierarchy')
+        try:
+            for s in hierarchy.subset_types[metadata_cache.get(config, 'phone_name')]:
+                self.subsetSelect.addItem(s)
+        except KeyError:
+            pass
 
         layout.addWidget(self.subsetSelect)
 
@@ -32,9 +32,8 @@ class PhoneSelectWidget(QtWidgets.QWidget):
         self.selectWidget = QtWidgets.QListWidget()
         self.selectWidget.setSelectionMode(QtWidgets.QAbstractItemView.MultiSelection)
 
-        with CorpusContext(config) as c:
-            for p in c.lexicon.phones():
-                self.selectWidget.addItem(p)
+        for p in metadata_cache.get(config, 'phones'):
+            self.selectWidget.addItem(p)
         layout.addWidget(self.selectWidget)
         self.setLayout(layout)
 
@@ -1,17 +1,17 @@
 
+import collections
+
 from PyQt5 import QtGui, QtCore, QtWidgets
 
 from polyglotdb.config import BASE_DIR, CorpusConfig
 
-from ..plot import SCTSummaryWidget
-
-from ..workers import (DiscourseQueryWorker)
+from ..workers import (DiscourseQueryWorker, LookaheadWorker)
 
-from .base import DataListWidget, CollapsibleWidgetPair, DetailedMessageBox, CollapsibleTabWidget
+from .base import DetailedMessageBox, CollapsibleTabWidget
 
 from .selectable_audio import SelectableAudioWidget
 
-from polyglotdb import CorpusContext
+from ..metadata import metadata_cache
 
 from polyglotdb.exceptions import GraphQueryError
 
@@ -46,9 +46,8 @@ class DiscourseWidget(QtWidgets.QWidget):
         if self.config is None or self.config.corpus_name == '':
             return
         try:
-            with CorpusContext(self.config) as c:
-                for d in sorted(c.discourses):
-                    self.discourseList.addItem(d)
+            for d in metadata_cache.get(self.config, 'discourses'):
+                self.discourseList.addItem(d)
         except GraphQueryError:
             self.discourseList.clear()
 
@@ -56,28 +55,13 @@ class ViewWidget(CollapsibleTabWidget):
     
     changingDiscourse = QtCore.pyqtSignal()
     connectionIssues = QtCore.pyqtSignal()
+    lookaheadFailed = QtCore.pyqtSignal(object)
     def __init__(self, parent = None):
         super(ViewWidget, self).__init__(parent)
    
         self.discourseWidget = SelectableAudioWidget()
 
-        self.summaryWidget = SCTSummaryWidget(self)
-
-        self.dataTabs = QtWidgets.QTabWidget()
-
-        self.phoneList = DataListWidget(self.summaryWidget, 'p')
-        self.phoneList.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
-
-        self.wordList = DataListWidget(self.summaryWidget, 'w')
-        self.wordList.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
-
-        self.dataTabs.addTab(self.phoneList, 'Phones')
-        self.dataTabs.addTab(self.wordList, 'Words')
-
-        summaryTab = CollapsibleWidgetPair(QtCore.Qt.Horizontal, self.summaryWidget.native, self.dataTabs)
-
         self.addTab(self.discourseWidget, 'Discourse')
-        #self.addTab(summaryTab, 'Summary')
 
         self.worker = DiscourseQueryWorker()
         self.worker.dataReady.connect(self.discourseWidget.updateDiscourseModel)
@@ -86,6 +70,17 @@ class ViewWidget(CollapsibleTabWidget):
         self.worker.errorEncountered.connect(self.showError)
         self.worker.connectionIssues.connect(self.connectionIssues.emit)
 
+        # Discourses of the next query results, prepared in the background
+        # so that stepping through results does not wait on the database
+        self.prepared = collections.OrderedDict()
+        self.maxPrepared = 8
+        self.lookaheadWorker = LookaheadWorker()
+        self.lookaheadWorker.discourseReady.connect(self.addPrepared)
+        # Preparing upcoming results is speculative, so its errors go to
+        # the status bar rather than an error dialog
+        self.lookaheadWorker.errorEncountered.connect(self.lookaheadFailed.emit)
+        self.lookaheadWorker.connectionIssues.connect(self.connectionIssues.emit)
+
 
     def showError(self, e):
         reply = DetailedMessageBox()
@@ -100,6 +95,11 @@ class ViewWidget(CollapsibleTabWidget):
                 begin = 0
             if end is None:
                 end = 30
+            prepared = self.prepared.pop((discourse, begin, end), None)
+            if prepared is not None:
+                discourse_model, lease, audio = prepared
+                self.discourseWidget.updateDiscourseModel((discourse_model, begin, end, lease), audio)
+                return
             kwargs['config'] = self.config
             kwargs['discourse'] = discourse
             kwargs['begin'] = begin
@@ -108,14 +108,44 @@ class ViewWidget(CollapsibleTabWidget):
             self.worker.setParams(kwargs)
             self.worker.start()
 
+    def prepareDiscourses(self, targets):
+        if self.config is None:
+            return
+        targets = [x for x in targets if x not in self.prepared]
+        self.lookaheadWorker.setTargets(self.config, targets)
+
+    def addPrepared(self, data):
+        target, discourse_model, lease, audio = data
+        if self.lookaheadWorker.config is not self.config:
+            lease.release()
+            return
+        if target in self.prepared:
+            self.prepared.pop(target)[1].release()
+        self.prepared[target] = (discourse_model, lease, audio)
+        while len(self.prepared) > self.maxPrepared:
+            self.prepared.popitem(last = False)[1][1].release()
+        if audio is not None:
+            discourse, begin, end = target
+            end = min(end, discourse_model.max_time)
+            self.discourseWidget.spectrumWidget.prefetch_tiles(audio, self.discourseWidget.channel,
+                                                                begin, end)
+
+    def clearPrepared(self):
+        # Prepared models hold on to the context they were loaded with
+        for discourse_model, lease, audio in self.prepared.values():
+            lease.release()
+        self.prepared.clear()
+
     def updateConfig(self, config):
         self.config = config
         self.changingDiscourse.emit()
+        self.clearPrepared()
+        self.lookaheadWorker.setTargets(config, [])
         self.discourseWidget.config = config
         if self.config is None:
             return
         if self.config.corpus_name:
-            with CorpusContext(self.config) as c:
-                if c.hierarchy != self.discourseWidget.hierarchy:
-                    self.discourseWidget.updateHierachy(c.hierarchy)
+            hierarchy = metadata_cache.get(self.config, 'hierarchy')
+            if hierarchy != self.discourseWidget.hierarchy:
+                self.discourseWidget.updateHierachy(hierarchy)
 
@@ -1,7 +1,7 @@
 import sys
 from PyQt5 import QtGui, QtCore, QtWidgets
 
-from polyglotdb import CorpusContext
+from ...metadata import metadata_cache
 
 from polyglotdb.graph.func import Sum, Count
 
@@ -89,8 +89,7 @@ class AttributeWidget(QtWidgets.QWidget):
 
     def __init__(self, config, to_find, alignment = False):
         self.config = config
-        with CorpusContext(self.config) as c:
-            self.hierarchy = c.hierarchy
+        self.hierarchy = metadata_cache.get(self.config, 'hierarchy')
         self.to_find = to_find
         self.alignment = alignment
         super(AttributeWidget, self).__init__()
@@ -209,8 +208,7 @@ class AttributeWidget(QtWidgets.QWidget):
 class ValueWidget(QtWidgets.QWidget):
     def __init__(self, config, to_find):
         self.config = config
-        with CorpusContext(self.config) as c:
-            self.hierarchy = c.hierarchy
+        self.hierarchy = metadata_cache.get(self.config, 'hierarchy')
         self.to_find = to_find
         self.levels = None
         super(ValueWidget, self).__init__()
@@ -263,19 +261,13 @@ class ValueWidget(QtWidgets.QWidget):
         elif new_type == str:
 
             if self.hierarchy.has_type_property(annotation, label):
-                with CorpusContext(self.config) as c:
-                    if label == 'label':
-                        self.levels = c.lexicon.list_labels(annotation)
-                    else:
-                        self.levels = c.lexicon.get_property_levels(label, annotation)
+                self.levels = metadata_cache.labels(self.config, annotation, label)
                 boolean = self.updateValueWidget()
             elif annotation == 'speaker':
-                with CorpusContext(self.config) as c:
-                    self.levels = c.speakers
+                self.levels = metadata_cache.get(self.config, 'speakers')
                 boolean = self.updateValueWidget()
             elif annotation == 'discourse':
-                with CorpusContext(self.config) as c:
-                    self.levels = c.discourses
+                self.levels = metadata_cache.get(self.config, 'discourses')
                 boolean = self.updateValueWidget()
             else:
                 self.levels = []
@@ -395,8 +387,7 @@ class FilterWidget(QtWidgets.QWidget):
         #add in slot to tell which type to find
 
         self.config = config
-        with CorpusContext(self.config) as c:
-            self.hierarchy = c.hierarchy
+        self.hierarchy = metadata_cache.get(self.config, 'hierarchy')
         self.to_find = to_find
         super(FilterWidget, self).__init__()
 
@@ -1077,8 +1068,7 @@ class BasicQuery(QtWidgets.QWidget):
 
     def updateConfig(self, config):
         self.config = config
-        with CorpusContext(config) as c:
-            self.hierarchy = c.hierarchy
+        self.hierarchy = metadata_cache.get(config, 'hierarchy')
         self.filterWidget.setConfig(config)
         self.toFindWidget.clear()
 
@@ -4,10 +4,12 @@ import collections
 
 from PyQt5 import QtGui, QtCore, QtWidgets
 
-from polyglotdb import CorpusContext
+from ...metadata import metadata_cache
 
 from ...profiles import available_export_profiles, ExportProfile, Column
 
+from ...writers import export_formats
+
 from .basic import AttributeSelect as QueryAttributeSelect, SpeakerAttributeSelect, DiscourseAttributeSelect
 
 import collections
@@ -653,8 +655,7 @@ class ExportProfileDialog(QtWidgets.QDialog):
             index += 1
         self.nameWidget.setText(new_default_template.format(index))
 
-        with CorpusContext(config) as c:
-            hierarchy = c.hierarchy
+        hierarchy = metadata_cache.get(config, 'hierarchy')
 
         if to_find is not None:
             self.toFindWidget = QtWidgets.QLabel(to_find)
@@ -680,6 +681,31 @@ class ExportProfileDialog(QtWidgets.QDialog):
         layout.addRow(self.columnWidget)
         self.BasicColumnBox.columnToAdd.connect(self.columnWidget.fillInColumn)
         self.columnWidget.checkboxToUncheck.connect(self.BasicColumnBox.uncheck)
+
+        self.formatWidget = QtWidgets.QComboBox()
+        for f in export_formats.keys():
+            self.formatWidget.addItem(f)
+        self.compressionWidget = QtWidgets.QComboBox()
+        self.formatWidget.currentIndexChanged.connect(self.updateCompressions)
+        self.updateCompressions()
+
+        self.shardWidget = QtWidgets.QComboBox()
+        self.shardWidget.addItem('None')
+        self.shardWidget.addItem('discourse')
+        self.shardWidget.addItem('speaker')
+        self.connectionsWidget = QtWidgets.QSpinBox()
+        self.connectionsWidget.setRange(1, 32)
+        self.connectionsWidget.setValue(ExportProfile.max_connections)
+
+        formatBox = QtWidgets.QGroupBox('Output')
+        formatLayout = QtWidgets.QFormLayout()
+        formatLayout.addRow('Format', self.formatWidget)
+        formatLayout.addRow('Compression', self.compressionWidget)
+        formatLayout.addRow('Run in parallel by', self.shardWidget)
+        formatLayout.addRow('Parallel connections', self.connectionsWidget)
+        formatBox.setLayout(formatLayout)
+        layout.addRow(formatBox)
+
         mainlayout.addLayout(layout)
 
         aclayout = QtWidgets.QHBoxLayout()
@@ -712,6 +738,28 @@ class ExportProfileDialog(QtWidgets.QDialog):
         to_find = self.toFindWidget.currentText()
         self.columnWidget.setToFind(to_find)
 
+    def updateCompressions(self):
+        self.compressionWidget.clear()
+        for c in export_formats[self.formatWidget.currentText()].compressions:
+            if c is None:
+                c = 'None'
+            self.compressionWidget.addItem(c)
+
+    def format(self):
+        return self.formatWidget.currentText()
+
+    def compression(self):
+        compression = self.compressionWidget.currentText()
+        if compression == 'None':
+            return None
+        return compression
+
+    def shardBy(self):
+        shard_by = self.shardWidget.currentText()
+        if shard_by == 'None':
+            return None
+        return shard_by
+
     def profile(self):
         profile = ExportProfile()
         profile.name = self.nameWidget.text()
@@ -720,6 +768,10 @@ class ExportProfileDialog(QtWidgets.QDialog):
         except AttributeError:
             profile.to_find = self.toFindWidget.text()
         profile.columns = self.columnWidget.columns()
+        profile.format = self.format()
+        profile.compression = self.compression()
+        profile.shard_by = self.shardBy()
+        profile.max_connections = self.connectionsWidget.value()
         return profile
 
     def validate(self):
@@ -753,3 +805,13 @@ class ExportProfileDialog(QtWidgets.QDialog):
             to_find = profile.to_find
         #self.toFindWidget.setText(to_find)
         self.columnWidget.setColumns(profile.columns)
+        self.formatWidget.setCurrentIndex(self.formatWidget.findText(profile.format))
+        compression = profile.compression
+        if compression is None:
+            compression = 'None'
+        self.compressionWidget.setCurrentIndex(self.compressionWidget.findText(compression))
+        shard_by = profile.shard_by
+        if shard_by is None:
+            shard_by = 'None'
+        self.shardWidget.setCurrentIndex(self.shardWidget.findText(shard_by))
+        self.connectionsWidget.setValue(profile.max_connections)
@@ -7,12 +7,14 @@ from polyglotdb.graph.func import Sum, Count
 
 from ..base import DetailedMessageBox, CollapsibleTabWidget
 
-from ...models import QueryResultsModel, ProxyModel
+from ...models import QueryResultsModel
 
 from ...views import ResultsView
 
 from ...workers import (QueryWorker, ExportQueryWorker)
 
+from ...writers import file_filter
+
 from .graphical import GraphicalQuery
 
 from .basic import BasicQuery
@@ -226,7 +228,8 @@ class QueryForm(QtWidgets.QWidget):
             self.exportWidget.readyExport()
             return
         export_profile = dialog.profile()
-        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export data", filter = "CSV (*.txt  *.csv)")
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export data",
+                                                filter = file_filter(export_profile.format))
 
         if not path:
             self.exportWidget.readyExport()
@@ -259,24 +262,25 @@ class QueryResults(QtWidgets.QWidget):
 
         self.query = results[0]
 
-        self.resultsModel = QueryResultsModel(results[1])
+        self.resultsModel = QueryResultsModel(results[1], fetch_params = results[2])
 
         self.tableWidget = ResultsView()
+        self.tableWidget.setModel(self.resultsModel)
 
-        self.proxyModel = ProxyModel()
-        self.proxyModel.setSourceModel(self.resultsModel)
-        self.proxyModel.setSortRole( QueryResultsModel.SortRole )
-        self.proxyModel.setDynamicSortFilter(False)
-        self.tableWidget.setModel(self.proxyModel)
+        self.filterEdit = QtWidgets.QLineEdit()
+        self.filterEdit.setPlaceholderText('Filter results')
+        self.filterEdit.textChanged.connect(self.resultsModel.setFilterText)
 
         layout = QtWidgets.QVBoxLayout()
 
+        layout.addWidget(self.filterEdit)
         layout.addWidget(self.tableWidget)
 
         self.setLayout(layout)
 
 class QueryWidget(CollapsibleTabWidget):
     viewRequested = QtCore.pyqtSignal(str, float, float)
+    lookaheadRequested = QtCore.pyqtSignal(object)
     needsHelp = QtCore.pyqtSignal(object)
     exportHelpBroadcast = QtCore.pyqtSignal(object)
     def __init__(self):
@@ -310,6 +314,7 @@ class QueryWidget(CollapsibleTabWidget):
         self.currentIndex += 1
         widget = QueryResults(results)
         widget.tableWidget.viewRequested.connect(self.viewRequested.emit)
+        widget.tableWidget.lookaheadRequested.connect(self.lookaheadRequested.emit)
         self.addTab(widget, name)
 
     def markAnnotated(self, value):
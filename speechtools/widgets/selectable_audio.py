@@ -1,6 +1,6 @@
 import numpy as np
-import librosa
 import time
+import contextlib
 
 from PyQt5 import QtGui, QtCore, QtWidgets, QtMultimedia
 
@@ -12,9 +12,11 @@ from .annotation import SubannotationDialog, NoteDialog
 
 from .structure import HierarchyWidget
 
-from ..plot import AnnotationWidget, SpectralWidget
+from ..workers import AnnotationWindowWorker, AudioCacheWorker, EnvelopeWorker
 
-from ..workers import PrecedingCacheWorker, FollowingCacheWorker, AudioCacheWorker
+from ..intervals import AnnotationIndex
+
+from ..prefetch import Prefetcher, split_window
 
 class SelectableAudioWidget(QtWidgets.QWidget):
     discourseHelpBroadcast = QtCore.pyqtSignal()
@@ -26,6 +28,8 @@ class SelectableAudioWidget(QtWidgets.QWidget):
     def __init__(self, parent = None):
         super(SelectableAudioWidget, self).__init__(parent)
         self.discourse_model = None
+        self.discourseContext = None
+        self.annotationIndex = AnnotationIndex()
         self.hierarchy = None
         self.config = None
 
@@ -46,6 +50,9 @@ class SelectableAudioWidget(QtWidgets.QWidget):
 
         self.setFocusPolicy(QtCore.Qt.StrongFocus)
 
+        # The plotting stack is only loaded once a discourse view is made
+        from ..plot import AnnotationWidget, SpectralWidget
+
         self.audioWidget = AnnotationWidget()
         self.audioWidget.events.mouse_press.connect(self.on_mouse_press)
         self.audioWidget.events.mouse_double_click.connect(self.on_mouse_double_click)
@@ -91,18 +98,41 @@ class SelectableAudioWidget(QtWidgets.QWidget):
         self.view_end = None
         self.audio = None
         self.cache_window = 5
+        self.prefetcher = Prefetcher(min_window = self.cache_window)
 
-        self.precedingCacheWorker = PrecedingCacheWorker()
-        self.precedingCacheWorker.dataReady.connect(self.addPreceding)
-        self.precedingCacheWorker.errorEncountered.connect(self.showError)
-        self.followingCacheWorker = FollowingCacheWorker()
-        self.followingCacheWorker.dataReady.connect(self.addFollowing)
-        self.followingCacheWorker.errorEncountered.connect(self.showError)
+        self.annotationWindowWorker = AnnotationWindowWorker()
+        self.annotationWindowWorker.windowReady.connect(self.addWindow)
+        self.annotationWindowWorker.errorEncountered.connect(self.showError)
 
         self.audioCacheWorker = AudioCacheWorker()
         self.audioCacheWorker.dataReady.connect(self.updateAudio)
         self.audioCacheWorker.errorEncountered.connect(self.showError)
 
+        self.envelope = None
+        self.envelopeWorker = EnvelopeWorker()
+        self.envelopeWorker.dataReady.connect(self.updateEnvelope)
+        self.envelopeWorker.errorEncountered.connect(self.showError)
+
+        # Panning and zooming only mark the view as changed.  The waveform and
+        # annotations are redrawn at most once per screen refresh, and the
+        # spectrogram, formants and pitch once the view stops moving
+        self.viewDirty = False
+        self.frameTimer = QtCore.QTimer(self)
+        self.frameTimer.setSingleShot(True)
+        self.frameTimer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.frameTimer.setInterval(self.frameInterval())
+        self.frameTimer.timeout.connect(self.drawFrame)
+        self.settleTimer = QtCore.QTimer(self)
+        self.settleTimer.setSingleShot(True)
+        self.settleTimer.setInterval(150)
+        self.settleTimer.timeout.connect(self.drawSettled)
+
+    def frameInterval(self):
+        screen = QtGui.QGuiApplication.primaryScreen()
+        if screen is None or screen.refreshRate() <= 0:
+            return 16
+        return max(int(1000 / screen.refreshRate()), 1)
+
     def showError(self, e):
         reply = DetailedMessageBox()
         reply.setDetailedText(str(e))
@@ -115,53 +145,81 @@ class SelectableAudioWidget(QtWidgets.QWidget):
             self.m_audioOutput.setMedia(QtMultimedia.QMediaContent(p))
             self.spectrumWidget.update_sampling_rate(self.audio.sr)
             self.hierarchyWidget.setNumChannels(self.audio.num_channels)
+            if self.envelope is None or self.envelope.sound_path != self.audio.path:
+                self.envelope = None
+                self.envelopeWorker.request(self.audio.path)
+
+    def updateEnvelope(self, envelope):
+        if envelope is None or self.audio is None or envelope.sound_path != self.audio.path:
+            return
+        self.envelope = envelope
+        if self.discourse_model is not None:
+            self.drawWaveform()
 
     def cachePreceding(self):
         if self.audio is not None:
             if self.audio.cached_begin != 0 and self.view_begin < self.audio.cached_begin + self.cache_window:
                 self.audioCacheWorker.setParams({'sound_file':self.discourse_model.sound_file, 'begin': self.view_begin, 'end': self.view_end})
                 self.audioCacheWorker.start()
-        if not self.precedingCacheWorker.finished:
+        if self.discourse_model.cached_to_begin:
             return
-        if not self.discourse_model.cached_to_begin and self.view_begin < self.discourse_model.cached_begin + self.cache_window:
-            print('beginning!')
-            kwargs = {'config': self.config,
-                        'begin': self.discourse_model.cached_begin - 2 * self.cache_window,
-                        'end': self.discourse_model.cached_begin,
-                        'discourse': self.discourse_model.name}
-            self.precedingCacheWorker.setParams(kwargs)
-            self.precedingCacheWorker.start()
-
+        fetch = self.prefetcher.preceding_range(self.view_begin, self.view_end,
+                                                self.discourse_model.cached_begin)
+        if fetch is not None:
+            self.annotationWindowWorker.request(*fetch)
 
     def cacheFollowing(self):
         if self.audio is not None:
             if self.audio.cached_end != self.audio.duration and self.view_end > self.audio.cached_end - self.cache_window:
                 self.audioCacheWorker.setParams({'sound_file':self.discourse_model.sound_file, 'begin': self.view_begin, 'end': self.view_end})
                 self.audioCacheWorker.start()
-        if not self.followingCacheWorker.finished:
+        if self.discourse_model.cached_to_end:
             return
-        if not self.discourse_model.cached_to_end and self.view_end > self.discourse_model.cached_end - self.cache_window:
-            end = self.discourse_model.cached_end + 2 * self.cache_window
-            if self.view_end > end:
-                end = self.view_end + 2 * self.cache_window
-            kwargs = {'config': self.config,
-                        'begin': self.discourse_model.cached_end,
-                        'end': end,
-                        'discourse': self.discourse_model.name}
-            self.followingCacheWorker.setParams(kwargs)
-            self.followingCacheWorker.start()
-
-    def addPreceding(self, results):
-        if self.discourse_model is None:
+        fetch = self.prefetcher.following_range(self.view_begin, self.view_end,
+                                                self.discourse_model.cached_end)
+        if fetch is not None:
+            self.annotationWindowWorker.request(*fetch)
+
+    def addWindow(self, data):
+        discourse, begin, end, results = data
+        if self.discourse_model is None or self.discourse_model.name != discourse:
             return
-        self.discourse_model.add_preceding(results)
-        self.updateVisible()
-
-    def addFollowing(self, results):
-        if self.discourse_model is None:
+        preceding, following, cached_begin, cached_end = split_window(self.discourse_model.cache,
+                                                            self.discourse_model.cached_begin,
+                                                            self.discourse_model.cached_end,
+                                                            begin, end, results)
+        if preceding:
+            self.discourse_model.add_preceding(preceding)
+        if following:
+            self.discourse_model.add_following(following)
+        # Record the whole window as cached, even where it had no annotations
+        self.discourse_model.cached_begin = cached_begin
+        self.discourse_model.cached_end = cached_end
+        self.evictAnnotations()
+        self.annotationIndex.rebuild()
+        self.scheduleUpdate()
+
+    def evictAnnotations(self):
+        """
+        Drop the cached annotations farthest from the view once the cache is
+        over the prefetcher's budget, along with any queued windows that no
+        longer reach the cache.
+        """
+        cache = self.discourse_model.cache
+        lower_types = []
+        if self.hierarchy is not None:
+            lower_types = self.hierarchy.highest_to_lowest[1:]
+        lo, hi = self.prefetcher.evict(cache, self.view_begin, self.view_end, lower_types)
+        if lo >= hi or (lo == 0 and hi == len(cache)):
             return
-        self.discourse_model.add_following(results)
-        self.updateVisible()
+        self.discourse_model.cache = cache[lo:hi]
+        if lo > 0:
+            self.discourse_model.cached_begin = self.discourse_model.cache[0].begin
+        if hi < len(cache):
+            self.discourse_model.cached_end = self.discourse_model.cache[-1].end
+        self.discourse_model.fully_cached = False
+        self.annotationWindowWorker.discard(self.discourse_model.cached_begin,
+                                            self.discourse_model.cached_end)
 
     def updateChannel(self, channel):
         self.channel = channel
@@ -202,6 +260,7 @@ class SelectableAudioWidget(QtWidgets.QWidget):
 
                     self.selected_annotation = None
                     self.selectionChanged.emit(None)
+                    self.annotationIndex.rebuild()
                     self.updateVisible()
         elif event.key() == QtCore.Qt.Key_Return:
             if self.selected_annotation is not None:
@@ -211,7 +270,8 @@ class SelectableAudioWidget(QtWidgets.QWidget):
                     else:
                         annotated_value = True
                     self.selected_annotation.update_properties(checked = annotated_value)
-                    self.selected_annotation.save()
+                    with self.contextLock():
+                        self.selected_annotation.save()
                     self.markedAsAnnotated.emit(annotated_value)
                     self.selectionChanged.emit(self.selected_annotation)
         elif event.key() == QtCore.Qt.Key_Tab:
@@ -275,7 +335,9 @@ class SelectableAudioWidget(QtWidgets.QWidget):
                 return
 
             self.selected_annotation.update_properties(label = new)
-            self.selected_annotation.save()
+            with self.contextLock():
+                self.selected_annotation.save()
+            self.annotationIndex.rebuild()
             self.selectionChanged.emit(self.selected_annotation)
             self.updateVisible()
         elif self.selected_annotation is not None:
@@ -291,13 +353,15 @@ class SelectableAudioWidget(QtWidgets.QWidget):
                 self.selected_annotation.add_subannotation(type,
                         begin = self.selected_annotation.begin,
                         end = self.selected_annotation.end)
-                self.selected_annotation.save()
+                with self.contextLock():
+                    self.selected_annotation.save()
+                self.annotationIndex.rebuild()
                 self.updateVisible()
         else:
             print(event.key())
 
     def find_annotation(self, key, time):
-        return self.discourse_model.find_annotation(key, time, channel = self.channel)
+        return self.annotationIndex.find_annotation(key, time, channel = self.channel)
 
     def get_acoustics(self, time):
         acoustics = self.discourse_model.get_acoustics(time)
@@ -443,7 +507,9 @@ class SelectableAudioWidget(QtWidgets.QWidget):
                 annotation._annotation.delete_subannotation(annotation)
                 update = True
             if update:
-                annotation.save()
+                with self.contextLock():
+                    annotation.save()
+                self.annotationIndex.rebuild()
                 self.updateVisible()
                 self.selectionChanged.emit(annotation)
             menu.deleteLater()
@@ -525,7 +591,7 @@ class SelectableAudioWidget(QtWidgets.QWidget):
             min_time = 0
         self.view_begin = min_time
         self.view_end = max_time
-        self.updateVisible()
+        self.scheduleUpdate()
 
     def pan(self, time_delta):
         if self.discourse_model is None:
@@ -547,11 +613,13 @@ class SelectableAudioWidget(QtWidgets.QWidget):
             max_time = self.view_end + new_delta
         self.view_begin = min_time
         self.view_end = max_time
-        self.updateVisible()
+        self.scheduleUpdate()
 
     def updateVisible(self):
         if self.discourse_model is None:
             return
+        self.viewDirty = False
+        self.prefetcher.observe(self.view_begin, self.view_end)
         self.cacheFollowing()
         self.cachePreceding()
         self.audioWidget.update_time_bounds(self.view_begin, self.view_end)
@@ -560,49 +628,46 @@ class SelectableAudioWidget(QtWidgets.QWidget):
         self.drawFormants()
         self.drawPitch()
 
+    def scheduleUpdate(self):
+        self.viewDirty = True
+        if not self.frameTimer.isActive():
+            self.frameTimer.start()
+        self.settleTimer.start()
+
+    def drawFrame(self):
+        if not self.viewDirty or self.discourse_model is None:
+            return
+        self.viewDirty = False
+        self.prefetcher.observe(self.view_begin, self.view_end)
+        self.cacheFollowing()
+        self.cachePreceding()
+        self.audioWidget.update_time_bounds(self.view_begin, self.view_end)
+        self.drawWaveform()
+        self.drawAnnotations()
+
+    def drawSettled(self):
+        if self.discourse_model is None:
+            return
+        self.drawFrame()
+        self.drawSpectrogram()
+        self.drawFormants()
+        self.drawPitch()
+
     def save_selected_boundary(self):
         key, ind = self.selected_boundary
-        actual_index = int(ind / 6)
-        index = 0
-        selected_annotation = None
-        for a in self.annotations:
-            if a.end < self.view_begin:
-                continue
-            if isinstance(key, tuple):
-                elements = getattr(a, key[0])
-                for e in elements:
-                    if e.end < self.view_begin:
-                        continue
-                    subs = getattr(e, key[1])
-                    for s in subs:
-                        if index == actual_index:
-                            selected_annotation = s
-                            break
-                        index += 1
-                    if selected_annotation is not None:
-                        break
-            elif key != a._type:
-                elements = getattr(a, key)
-                for e in elements:
-                    if index == actual_index:
-                        selected_annotation = e
-                        break
-                    index += 1
-            elif index == actual_index:
-                selected_annotation = a
-            if selected_annotation is not None:
-                break
-        mod = ind % 6
+        selected_annotation, is_begin = self.audioWidget.get_boundary_element(key, ind)
         if self.selected_time > self.view_end:
             self.selected_time = self.view_end
         elif self.selected_time < self.view_begin:
             self.selected_time = self.view_begin
-        if mod == 0:
+        if is_begin:
             selected_annotation.update_properties(begin = self.selected_time)
         else:
             selected_annotation.update_properties(end = self.selected_time)
         self.selectionChanged.emit(selected_annotation)
-        selected_annotation.save()
+        with self.contextLock():
+            selected_annotation.save()
+        self.annotationIndex.rebuild()
 
     def updateHierachy(self, hierarchy):
         self.hierarchy = hierarchy
@@ -610,10 +675,19 @@ class SelectableAudioWidget(QtWidgets.QWidget):
         self.audioWidget.update_hierarchy(self.hierarchy)
 
     def drawSignal(self):
+        self.drawWaveform()
+        self.drawSpectrogram()
+
+    def drawWaveform(self):
         if self.audio is None:
             self.audioWidget.update_signal(None)
-            self.spectrumWidget.update_signal(None)
-        else:
+            return
+        data = None
+        if self.envelope is not None:
+            # Use the envelope level with about one block per pixel column
+            data = self.envelope.visible(self.view_begin, self.view_end,
+                                        self.channel, self.audioQtWidget.width())
+        if data is None:
             if self.view_end - self.view_begin < 15:
                 sig = self.audio.visible_signal(self.view_begin, self.view_end, self.channel)
                 sr = self.audio.sr
@@ -623,23 +697,55 @@ class SelectableAudioWidget(QtWidgets.QWidget):
             else:
                 sig = self.audio.visible_downsampled_100(self.view_begin, self.view_end, self.channel)
                 sr = 100
-            preemph_signal  = self.audio.visible_preemph_signal(self.view_begin, self.view_end, self.channel)
+            if sr != self.audio.sr and hasattr(self.audio, 'downsampled_rate'):
+                # Downsampling averages whole numbers of samples, so the
+                # rate is only close to the target
+                sr = self.audio.downsampled_rate(sr)
 
             t = np.arange(sig.shape[0]) / (sr) + self.view_begin
 
             data = np.array((t, sig)).T
-            begin = time.time()
-            self.audioWidget.update_signal(data)
-            begin = time.time()
-            self.spectrumWidget.update_sampling_rate(self.audio.sr)
+        self.audioWidget.update_signal(data)
+        self.updatePlayTime(self.view_begin)
+
+    def drawSpectrogram(self):
+        if self.audio is None:
+            self.spectrumWidget.update_signal(None)
+            return
+        self.spectrumWidget.update_sampling_rate(self.audio.sr)
+        if hasattr(self.audio, 'padded_samples'):
+            self.spectrumWidget.update_tiled_signal(self.audio, self.channel,
+                                                    self.view_begin, self.view_end)
+        else:
+            preemph_signal = self.audio.visible_preemph_signal(self.view_begin, self.view_end, self.channel)
             self.spectrumWidget.update_signal(preemph_signal)
-            self.updatePlayTime(self.view_begin)
 
-    def updateDiscourseModel(self, discourse_model):
-        discourse_model, begin, end = discourse_model
+    def contextLock(self):
+        """
+        Lock of the context the discourse model was loaded with, which the
+        annotation window worker also queries with.
+        """
+        if self.discourseContext is None:
+            return contextlib.nullcontext()
+        return self.discourseContext.lock
+
+    def releaseContext(self):
+        if self.discourseContext is not None:
+            self.discourseContext.release()
+            self.discourseContext = None
+
+    def updateDiscourseModel(self, discourse_model, audio = None):
+        discourse_model, begin, end, lease = discourse_model
+        self.releaseContext()
         self.discourse_model = discourse_model
+        self.discourseContext = lease
+        self.annotationIndex = AnnotationIndex(discourse_model)
+        self.prefetcher.reset()
+        self.annotationWindowWorker.setDiscourse(lease, discourse_model.name)
         self.audio = None
-        if discourse_model.sound_file is not None:
+        if audio is not None:
+            self.updateAudio(audio)
+        elif discourse_model.sound_file is not None:
             self.audioCacheWorker.setParams({'sound_file':self.discourse_model.sound_file, 'begin': begin, 'end': end})
             self.audioCacheWorker.start()
         if begin is None:
@@ -651,15 +757,16 @@ class SelectableAudioWidget(QtWidgets.QWidget):
         self.updateVisible()
 
     def drawAnnotations(self):
-        annotations = self.discourse_model.annotations(begin = self.view_begin, end = self.view_end, channel = self.channel)
-        self.audioWidget.update_annotations(annotations)
+        self.audioWidget.update_annotations(self.annotationIndex, self.channel)
 
     def drawPitch(self):
-        pitch = self.discourse_model.pitch_from_begin(begin = self.view_begin, end = self.view_end, channel = self.channel)
+        with self.contextLock():
+            pitch = self.discourse_model.pitch_from_begin(begin = self.view_begin, end = self.view_end, channel = self.channel)
         self.spectrumWidget.update_pitch(pitch)
 
     def drawFormants(self):
-        formants = self.discourse_model.formants_from_begin(begin = self.view_begin, end = self.view_end, channel = self.channel)
+        with self.contextLock():
+            formants = self.discourse_model.formants_from_begin(begin = self.view_begin, end = self.view_end, channel = self.channel)
         self.spectrumWidget.update_formants(formants)
 
     def changeView(self, begin, end):
@@ -669,7 +776,10 @@ class SelectableAudioWidget(QtWidgets.QWidget):
         self.selectionChanged.emit(None)
 
     def clearDiscourse(self):
+        self.annotationWindowWorker.setDiscourse(None, None)
+        self.releaseContext()
         self.discourse_model = None
+        self.annotationIndex = AnnotationIndex()
 
         self.min_selected_time = None
         self.max_selected_time = None
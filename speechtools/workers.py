@@ -1,5 +1,7 @@
 
+import os
 import sys
+import threading
 import traceback
 import time
 import numpy as np
@@ -10,17 +12,36 @@ from polyglotdb.exceptions import ConnectionError, NetworkAddressError, Temporar
 from polyglotdb.graph.func import Sum
 
 from polyglotdb import CorpusContext
-from polyglotdb.config import CorpusConfig
 
-from polyglotdb.io import (inspect_buckeye, inspect_textgrid, inspect_timit,
-                        inspect_labbcat, inspect_mfa, inspect_fave,
-                        guess_textgrid_format)
-from polyglotdb.io.enrichment import enrich_lexicon_from_csv, enrich_features_from_csv, enrich_speakers_from_csv
+from .results import ColumnarResults, sort_index, filter_index
 
-from polyglotdb.utils import update_sound_files, gp_language_stops, gp_speakers
+from .cache import query_cache
 
-from polyglotdb.acoustics.analysis import acoustic_analysis
-from polyglotdb.graph.discourse import LongSoundFile
+from .envelope import EnvelopePyramid
+
+from .sound import open_sound_file
+
+from .prefetch import RangeQueue
+
+from .pool import borrow_context, lease_context, context_pool
+
+from .metadata import metadata_cache, change_marker
+
+from .tasks import (PAGE_SIZE, page_query, invalidate_corpus, import_corpus, export_query,
+                    analyze_acoustics, encode_pauses, encode_utterances, encode_speech_rate,
+                    encode_utterance_position, encode_syllabics, encode_syllables,
+                    encode_phone_subset, enrich_lexicon, enrich_features, enrich_speakers,
+                    encode_hierarchical_property, encode_relativized_measure)
+
+from .scheduler import JobScheduler
+
+def thread_finished(worker):
+    """
+    Return the QThread.finished signal of a worker, which FunctionWorker
+    shadows with a flag of the same name.  It is emitted once ``run`` has
+    returned, so slots connected to it can start the worker again.
+    """
+    return QtCore.QThread.finished.__get__(worker, type(worker))
 
 class FunctionWorker(QtCore.QThread):
     updateProgress = QtCore.pyqtSignal(object)
@@ -61,6 +82,139 @@ class FunctionWorker(QtCore.QThread):
                 self.updateMaximum.emit(args[1])
             self.updateProgress.emit(progress)
 
+class WorkerRegistry(object):
+    """
+    Creates workers the first time they are used.
+
+    Workers are registered under a name along with the slots to connect
+    to their signals, and a worker's thread object is only constructed,
+    and its signals connected, when it is first looked up.
+    """
+    def __init__(self):
+        self.factories = {}
+        self.workers = {}
+
+    def register(self, name, factory, **connections):
+        """
+        Register a worker class or factory, with keyword arguments mapping
+        signal names to a slot or a list of slots.  ``finished`` is the
+        QThread signal, emitted once the worker's thread has finished.
+        """
+        self.factories[name] = (factory, connections)
+
+    def get(self, name):
+        try:
+            return self.workers[name]
+        except KeyError:
+            pass
+        factory, connections = self.factories[name]
+        worker = factory()
+        for signal, slots in connections.items():
+            if not isinstance(slots, (list, tuple)):
+                slots = [slots]
+            if signal == 'finished':
+                bound = thread_finished(worker)
+            else:
+                bound = getattr(worker, signal)
+            for slot in slots:
+                bound.connect(slot)
+        self.workers[name] = worker
+        return worker
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __contains__(self, name):
+        return name in self.workers
+
+    def stop(self, name):
+        """
+        Stop a worker if it has been created.
+        """
+        if name in self.workers:
+            self.workers[name].stop()
+
+    def stop_all(self):
+        for worker in self.workers.values():
+            worker.stop()
+
+class JobQueue(QtCore.QObject):
+    """
+    Runs enrichment jobs on the workers of a registry, in the order and
+    with the concurrency decided by a JobScheduler.
+
+    Each step runs on the registered worker of the same name.  The outcome
+    of a job is taken from the worker's dataReady, errorEncountered or
+    finishedCancelling signal, but the job is only finished, and the next
+    jobs started, once the worker's thread has finished, since a thread
+    that is still running cannot be started again.
+    """
+    jobChanged = QtCore.pyqtSignal(object)
+    jobStarted = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, workers, max_concurrent = 2):
+        super(JobQueue, self).__init__()
+        self.workers = workers
+        self.scheduler = JobScheduler(max_concurrent)
+        self.running = {}
+        self.outcomes = {}
+
+    def submit(self, step, kwargs, writes = None, depends = None):
+        """
+        Queue a step with its worker parameters, writing by default to the
+        graph of the corpus in ``kwargs['config']``.
+        """
+        if 'config' in kwargs:
+            corpus = kwargs['config'].corpus_name
+        else:
+            corpus = kwargs.get('name')
+        if writes is None:
+            writes = [('graph', corpus)]
+        # One worker runs each step, so jobs of a step never overlap
+        writes = list(writes) + [('step', step)]
+        job = self.scheduler.add(step, corpus, kwargs, depends, writes)
+        self.jobChanged.emit(job)
+        self.dispatch()
+        return job
+
+    def dispatch(self):
+        for job in self.scheduler.ready():
+            worker = self.workers[job.step]
+            if job.step not in self.running:
+                worker.dataReady.connect(lambda x, step = job.step: self.setOutcome(step, 'done'))
+                worker.errorEncountered.connect(lambda e, step = job.step: self.setOutcome(step, 'failed', e))
+                worker.finishedCancelling.connect(lambda step = job.step: self.setOutcome(step, 'cancelled'))
+                thread_finished(worker).connect(lambda step = job.step: self.finishJob(step))
+            self.running[job.step] = job
+            self.outcomes.pop(job.step, None)
+            self.scheduler.start(job)
+            worker.setParams(job.params)
+            self.jobChanged.emit(job)
+            self.jobStarted.emit(job, worker)
+            worker.start()
+
+    def setOutcome(self, step, state, error = None):
+        self.outcomes[step] = (state, error)
+
+    def finishJob(self, step):
+        job = self.running.get(step)
+        if job is None or job.state != 'running':
+            return
+        state, error = self.outcomes.pop(step, ('failed', 'The worker stopped without a result.'))
+        for changed in self.scheduler.finish(job, state, error):
+            self.jobChanged.emit(changed)
+        self.dispatch()
+
+    def cancel(self, job):
+        """
+        Cancel a job, stopping its worker if it is running.
+        """
+        if job.state == 'running':
+            self.workers.stop(job.step)
+        else:
+            for changed in self.scheduler.cancel(job):
+                self.jobChanged.emit(changed)
+
 class QueryWorker(FunctionWorker):
     connectionIssues = QtCore.pyqtSignal()
     def run(self):
@@ -95,6 +249,7 @@ class QueryWorker(FunctionWorker):
             self.errorEncountered.emit(e)
             return
         if self.stopped:
+            self.discardResults(results)
             time.sleep(0.1)
             self.finished = True
             self.finishedCancelling.emit()
@@ -104,99 +259,231 @@ class QueryWorker(FunctionWorker):
         
         self.finished = True
         
+    def discardResults(self, results):
+        """
+        Free what the results of a cancelled query hold on to.
+        """
+        pass
+
     def run_query(self):
         profile = self.kwargs['profile']
         config = self.kwargs['config']
-        with CorpusContext(config) as c:
-            a_type = getattr(c, profile.to_find)
-            query = c.query_graph(a_type)
+        page_size = self.kwargs.get('page_size', PAGE_SIZE)
+        with borrow_context(config) as c:
+            a_type, query = page_query(c, profile, page_size = page_size)
             query.call_back = self.kwargs['call_back']
             query.stop_check = self.kwargs['stop_check']
-            query = query.filter(*profile.for_polyglot(c))
             query = query.preload(getattr(a_type, 'speaker'), getattr(a_type,'discourse'))
             print(query.cypher())
 
-            results = query.all()
-            if results is not None:
-                print(len(results))
+            results = query_cache.get(c, query)
+            if results is None:
+                results = ColumnarResults.from_annotations([x for x in query.all()])
+                if not self.stopped:
+                    query_cache.put(c, query, results)
         self.actionCompleted.emit('query')
-        return query, results
+        fetch_params = {'config': config, 'profile': profile, 'page_size': page_size}
+        return query, results, fetch_params
+
+class QueryPageWorker(QueryWorker):
+    def run_query(self):
+        profile = self.kwargs['profile']
+        config = self.kwargs['config']
+        cursor = self.kwargs['cursor']
+        page_size = self.kwargs['page_size']
+        with borrow_context(config) as c:
+            a_type, query = page_query(c, profile, cursor, page_size)
+            query.stop_check = self.kwargs['stop_check']
+            query = query.preload(getattr(a_type, 'speaker'), getattr(a_type,'discourse'))
+            results = query_cache.get(c, query)
+            if results is None:
+                results = ColumnarResults.from_annotations([x for x in query.all()],
+                                                        columns = self.kwargs['columns'])
+                if not self.stopped:
+                    query_cache.put(c, query, results)
+        return results
 
 
-class ImportCorpusWorker(QueryWorker):
+class ResultsIndexWorker(QueryWorker):
+    def run_query(self):
+        results = self.kwargs['results']
+        rows = self.kwargs['rows']
+        if rows is None:
+            rows = np.arange(self.kwargs['num_rows'])
+        if self.kwargs['filter']:
+            rows = filter_index(results, self.kwargs['filter'], rows)
+        if self.kwargs['sort'] is not None:
+            column, descending = self.kwargs['sort']
+            rows = sort_index(results, column, descending, rows)
+        return self.kwargs['generation'], rows
+
+class EnrichmentWorker(QueryWorker):
+    """
+    Base class for workers that modify the corpus graph.  Cached query
+    results, metadata and pooled contexts for the corpus are invalidated
+    once the task has run, whether or not it completed, and before any
+    signal is emitted so that slots querying the corpus see the changes.
+    """
+    def corpus_name(self):
+        return self.kwargs['config'].corpus_name
+
+    def run_task(self, task, action):
+        """
+        Run a task from ``speechtools.tasks`` with the worker's parameters.
+        """
+        try:
+            result = task(**self.kwargs)
+        finally:
+            invalidate_corpus(self.corpus_name())
+        self.actionCompleted.emit(action)
+        return result
+
+class ImportCorpusWorker(EnrichmentWorker):
+    def corpus_name(self):
+        return self.kwargs['name']
 
     def run_query(self):
         time.sleep(0.1)
-        name = self.kwargs['name']
-        directory = self.kwargs['directory']
-        reset = True
-        config = CorpusConfig(name, graph_host = 'localhost', graph_port = 7474)
-        with CorpusContext(config) as c:
-            if name == 'buckeye':
-                parser = inspect_buckeye(directory)
-            elif name == 'timit':
-                parser = inspect_timit(directory)
-            else:
-                form = guess_textgrid_format(directory)
-                if form == 'labbcat':
-                    parser = inspect_labbcat(directory)
-                elif form == 'mfa':
-                    parser = inspect_mfa(directory)
-                elif form == 'fave':
-                    parser = inspect_fave(directory)
-                else:
-                    parser = inspect_textgrid(directory)
-
-            parser.call_back = self.kwargs['call_back']
-            parser.stop_check = self.kwargs['stop_check']
-            parser.call_back('Resetting corpus...')
-            if reset:
-                c.reset(call_back = self.kwargs['call_back'], stop_check = self.kwargs['stop_check'])
-            could_not_parse = c.load(parser, directory)
-            self.actionCompleted.emit('importing corpus') 
-        return could_not_parse
+        return self.run_task(import_corpus, 'importing corpus')
 
 class ExportQueryWorker(QueryWorker):
+    shardProgress = QtCore.pyqtSignal(str, object, str)
     def run_query(self):
-        profile = self.kwargs['profile']
-        export_profile = self.kwargs['export_profile']
-        config = self.kwargs['config']
-        export_path = self.kwargs['path']
+        if not export_query(shard_progress = self.shardProgress.emit, **self.kwargs):
+            return False
+        self.actionCompleted.emit('exporting')
+        return True
 
+class MetadataWorker(QueryWorker):
+    """
+    Revalidates the cached metadata of a corpus against the server.
+
+    If the change marker of the corpus differs from the cached one, the
+    hierarchy is regenerated and the metadata collected again.  Returns
+    the config, whether the cached metadata changed and the ``generation``
+    the request was made with, so that stale results can be ignored.
+    """
+    def run_query(self):
+        config = self.kwargs['config']
+        generation = self.kwargs.get('generation')
+        entry = metadata_cache.load(config)
         with CorpusContext(config) as c:
-            a_type = getattr(c, profile.to_find)
-            query = c.query_graph(a_type)
-            query.call_back = self.kwargs['call_back']
-            query.stop_check = self.kwargs['stop_check']
-            filters = profile.for_polyglot(c)
-            query = query.filter(*filters)
-            columns = export_profile.for_polyglot(c, to_find = profile.to_find)
-            query = query.columns(*columns)
-            print(query.cypher())
-            try:
-                results = query.to_csv(export_path)
-            except PermissionError:
-                raise(PGError('The file you specified could not be written to. Please ensure you have proper permissions and programs that lock the file (i.e., Excel) do not have it open.'))
-            self.actionCompleted.emit('exporting') 
-        return True
+            marker = change_marker(c)
+            if entry is not None and marker is not None and entry['marker'] == marker:
+                return config, False, generation
+            c.hierarchy = c.generate_hierarchy()
+            c.save_variables()
+            entry = metadata_cache.collect(c, marker)
+        metadata_cache.store(config, entry)
+        context_pool().invalidate(config.corpus_name)
+        return config, True, generation
+
+def inspect_discourse(config, discourse, begin, end):
+    """
+    Inspect a discourse over a context leased from the shared pool, which
+    the discourse model and its annotations keep using.  Returns the model
+    and the lease, to be released once the discourse is replaced.
+    """
+    lease = lease_context(config)
+    try:
+        model = lease.context.inspect_discourse(discourse, begin, end)
+    except Exception:
+        lease.discard()
+        raise
+    return model, lease
 
 class DiscourseQueryWorker(QueryWorker):
+    def discardResults(self, results):
+        if results is not None:
+            results[3].release()
+
     def run_query(self):
         begin = self.kwargs['begin']
         end = self.kwargs['end']
         config = self.kwargs['config']
         discourse = self.kwargs['discourse']
-        with CorpusContext(config) as c:
-            discourse = c.inspect_discourse(discourse, begin, end)
-        return discourse, begin, end
+        discourse, lease = inspect_discourse(config, discourse, begin, end)
+        return discourse, begin, end, lease
+
+class LookaheadWorker(QueryWorker):
+    """
+    Prepares the discourses of upcoming query results in the background.
+
+    Each target is a tuple of a discourse name, begin and end, and is
+    inspected along with its sound file and waveform envelope, and
+    ``discourseReady`` is emitted with the target, discourse model, its
+    context lease and memory-mapped audio (or None).  Setting new targets replaces those not
+    yet started, and a thread that stops because the targets or
+    configuration changed is restarted once it has finished, without
+    blocking the caller.
+    """
+    discourseReady = QtCore.pyqtSignal(object)
+    def __init__(self):
+        super(LookaheadWorker, self).__init__()
+        self.lock = threading.Lock()
+        self.targets = []
+        self.active = False
+        self.config = None
+        thread_finished(self).connect(self.restart)
+
+    def setTargets(self, config, targets):
+        with self.lock:
+            self.config = config
+            self.targets = list(targets)
+            if not self.targets or self.active:
+                return
+            # A thread that has just run out of targets is restarted when
+            # it finishes
+            if self.isRunning():
+                return
+            self.active = True
+        self.setParams({})
+        self.start()
+
+    def restart(self):
+        with self.lock:
+            if self.active or not self.targets:
+                return
+            self.active = True
+        self.setParams({})
+        self.start()
+
+    def run_query(self):
+        try:
+            with self.lock:
+                config = self.config
+            while True:
+                with self.lock:
+                    if self.stopped or not self.targets or self.config is not config:
+                        self.active = False
+                        return None
+                    target = self.targets.pop(0)
+                discourse, begin, end = target
+                model, lease = inspect_discourse(config, discourse, begin, end)
+                try:
+                    audio = None
+                    if model.sound_file is not None:
+                        audio = open_sound_file(model.sound_file)
+                    if audio is not None:
+                        EnvelopePyramid.load_or_build(audio.path, stop_check = self.stopCheck)
+                except Exception:
+                    lease.release()
+                    raise
+                self.discourseReady.emit((target, model, lease, audio))
+        except Exception:
+            with self.lock:
+                self.active = False
+            raise
 
 class AudioFinderWorker(QueryWorker):
     def run_query(self):
         config = self.kwargs['config']
         directory = self.kwargs['directory']
+        from polyglotdb.utils import update_sound_files
         with CorpusContext(config) as c:
             update_sound_files(c, directory)
             all_found = c.has_all_sound_files()
+        context_pool().invalidate(config.corpus_name)
         return all_found
 
 class AudioCheckerWorker(QueryWorker):
@@ -206,344 +493,174 @@ class AudioCheckerWorker(QueryWorker):
             all_found = c.has_all_sound_files()
         return all_found
 
-class AcousticAnalysisWorker(QueryWorker):
+class AcousticAnalysisWorker(EnrichmentWorker):
     def run_query(self):
-        config = self.kwargs['config']
-        acoustics = self.kwargs['acoustics']
-        with CorpusContext(config) as c:
-            acoustic_analysis(c,
-                            stop_check = self.kwargs['stop_check'],
-                            call_back = self.kwargs['call_back'],
-                            acoustics = acoustics)
-            self.actionCompleted.emit('analysing acousics')         
-        return True
+        return self.run_task(analyze_acoustics, 'analysing acousics')
 
-class PauseEncodingWorker(QueryWorker):
+class PauseEncodingWorker(EnrichmentWorker):
     def run_query(self):
-        config = self.kwargs['config']
-        pause_words = self.kwargs['pause_words']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        with CorpusContext(config) as c:
-            c.encode_pauses(pause_words,
-                            stop_check = stop_check,
-                            call_back = call_back)
-            self.actionCompleted.emit('encoding pauses') 
-            if stop_check():
-                call_back('Resetting pauses...')
-                call_back(0, 0)
-                c.reset_pauses()
-                return False
-        return True
+        return self.run_task(encode_pauses, 'encoding pauses')
 
-class UtteranceEncodingWorker(QueryWorker):
+class UtteranceEncodingWorker(EnrichmentWorker):
     def run_query(self):
-        config = self.kwargs['config']
-        min_pause_length = self.kwargs['min_pause_length']
-        min_utterance_length = self.kwargs['min_utterance_length']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        with CorpusContext(config) as c:
-            c.encode_utterances(min_pause_length, min_utterance_length,
-                            stop_check = stop_check,
-                            call_back = call_back)
-            self.actionCompleted.emit('encoding utterances') 
-            if stop_check():
-                call_back('Resetting utterances...')
-                call_back(0, 0)
-                c.reset_utterances()
-                return False
-        return True
+        return self.run_task(encode_utterances, 'encoding utterances')
 
-class SpeechRateWorker(QueryWorker):
+class SpeechRateWorker(EnrichmentWorker):
     def run_query(self):
-        config = self.kwargs['config']
-        to_count = self.kwargs['to_count']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        with CorpusContext(config) as c:
-            c.encode_speech_rate(to_count, stop_check = stop_check,
-                            call_back = call_back)
-            self.actionCompleted.emit('encoding speech rate') 
-            if stop_check():
-                call_back('Resetting speech rate...')
-                call_back(0, 0)
-                c.reset_speech_rate()
-                return False
-        return True
-
-class UtterancePositionWorker(QueryWorker):
-    def run_query(self):
-        config = self.kwargs['config']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        with CorpusContext(config) as c:
-            c.encode_utterance_position(stop_check = stop_check,
-                            call_back = call_back)
-            self.actionCompleted.emit('encoding utterance position')            
-            if stop_check():
-                call_back('Resetting utterance positions...')
-                call_back(0, 0)
-                c.reset_utterance_position()
-                return False
-        return True
+        return self.run_task(encode_speech_rate, 'encoding speech rate')
 
-class SyllabicEncodingWorker(QueryWorker):
+class UtterancePositionWorker(EnrichmentWorker):
     def run_query(self):
-        config = self.kwargs['config']
-        segments = self.kwargs['segments']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        call_back('Encoding syllabics...')
-        call_back(0, 0)
-        with CorpusContext(config) as c:
-            c.reset_class('syllabic')
-            c.encode_class(segments, 'syllabic')
-            self.actionCompleted.emit('encoding syllabics')
-            if stop_check():
-                call_back('Resetting syllabics...')
-                call_back(0, 0)
-                c.reset_class('syllabic')
-                return False
-        return True
+        return self.run_task(encode_utterance_position, 'encoding utterance position')
 
-class SyllableEncodingWorker(QueryWorker):
+class SyllabicEncodingWorker(EnrichmentWorker):
     def run_query(self):
-        config = self.kwargs['config']
-        algorithm = self.kwargs['algorithm']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        call_back('Encoding syllables...')
-        call_back(0, 0)
-        with CorpusContext(config) as c:
-            c.encode_syllables(algorithm = algorithm, call_back = call_back, stop_check = stop_check)
-            self.actionCompleted.emit('encoding syllables')
-
-            if stop_check():
-                call_back('Resetting syllables...')
-                call_back(0, 0)
-                c.reset_syllables()
-                return False
-        return True
+        return self.run_task(encode_syllabics, 'encoding syllabics')
 
-class PhoneSubsetEncodingWorker(QueryWorker):
+class SyllableEncodingWorker(EnrichmentWorker):
     def run_query(self):
-        config = self.kwargs['config']
-        segments = self.kwargs['segments']
-        label = self.kwargs['label']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        call_back('Resetting {}s...'.format(label))
-        call_back(0, 0)
-        with CorpusContext(config) as c:
-            c.reset_class(label)
-            c.encode_class(segments, label)
-            self.actionCompleted.emit('encoding '+ self.kwargs['label'].replace('_',' '))
-            if stop_check():
-                call_back('Resetting {}s...'.format(label))
-                call_back(0, 0)
-                c.reset_class(label)
-                return False
-        return True
+        return self.run_task(encode_syllables, 'encoding syllables')
 
-class LexiconEnrichmentWorker(QueryWorker):
+class PhoneSubsetEncodingWorker(EnrichmentWorker):
     def run_query(self):
-        print("in the lexical worker")
-        config = self.kwargs['config']
-        case_sensitive = self.kwargs['case_sensitive']
-        path = self.kwargs['path']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        call_back('Enriching lexicon...')
-        call_back(0, 0)
-        with CorpusContext(config) as c:
-            enrich_lexicon_from_csv(c, path)
-            self.actionCompleted.emit('enriching lexicon')
-            if stop_check():
-                call_back('Resetting lexicon...')
-                call_back(0, 0)
-                c.reset_lexicon()
-                
-                print("emitted {}".format(actionCompleted))
-                return False
-        return True
+        return self.run_task(encode_phone_subset, 'encoding '+ self.kwargs['label'].replace('_',' '))
 
-class FeatureEnrichmentWorker(QueryWorker):
+class LexiconEnrichmentWorker(EnrichmentWorker):
     def run_query(self):
-        config = self.kwargs['config']
-        path = self.kwargs['path']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        call_back('Enriching phonological inventory...')
-        call_back(0, 0)
-        with CorpusContext(config) as c:
-            enrich_features_from_csv(c, path)
-            self.actionCompleted.emit('enriching phonological inventory')
-            if stop_check():
-                call_back('Resetting phonological inventory...')
-                call_back(0, 0)
-                c.reset_lexicon()
-                return False
-        return True
-
+        return self.run_task(enrich_lexicon, 'enriching lexicon')
 
-class SpeakerEnrichmentWorker(QueryWorker):
+class FeatureEnrichmentWorker(EnrichmentWorker):
     def run_query(self):
-        config = self.kwargs['config']
-        path = self.kwargs['path']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        call_back('Enriching speakers...')
-        call_back(0,0)
-        with CorpusContext(config) as c:
-            enrich_speakers_from_csv(c, path)
-            self.actionCompleted.emit('enriching speakers')
-            
-        return True
+        return self.run_task(enrich_features, 'enriching phonological inventory')
 
-class HierarchicalPropertiesWorker(QueryWorker):
+class SpeakerEnrichmentWorker(EnrichmentWorker):
     def run_query(self):
-        config = self.kwargs['config']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        call_back('Encoding {}...'.format(self.kwargs['name']))
-        call_back(0, 0)
-        with CorpusContext(config) as c:
-            if self.kwargs['type'] == 'count':
-                c.encode_count(self.kwargs['higher'], self.kwargs['lower'],
-                            self.kwargs['name'], subset = self.kwargs['subset'])
-            elif self.kwargs['type'] == 'position':
-                c.encode_position(self.kwargs['higher'], self.kwargs['lower'],
-                            self.kwargs['name'], subset = self.kwargs['subset'])
-            elif self.kwargs['type'] == 'rate':
-                c.encode_rate(self.kwargs['higher'], self.kwargs['lower'],
-                            self.kwargs['name'], subset = self.kwargs['subset'])
-            self.actionCompleted.emit('encoding '+ self.kwargs['name'].replace('_',' '))
-            if stop_check():
-                return False
-        return True
+        return self.run_task(enrich_speakers, 'enriching speakers')
 
-class RelativizedMeasuresWorker(QueryWorker):
+class HierarchicalPropertiesWorker(EnrichmentWorker):
     def run_query(self):
-        res  = ""
-        data_type = 'word'
-        config = self.kwargs['config']
-        stop_check = self.kwargs['stop_check']
-        call_back = self.kwargs['call_back']
-        call_back('Encoding {}...'.format(self.kwargs['measure']))
-        call_back(0, 0)
-        with CorpusContext(config) as c:
-            string = "!"
-            if self.kwargs['measure'] == 'word_median':
-                res = c.word_median()
-            elif self.kwargs['measure'] == 'all_word_median':
-                res = c.all_word_median()
-            elif self.kwargs['measure'] == 'word_mean_duration':
-                res = c.word_mean_duration()
-            elif self.kwargs['measure'] == 'word_std_dev':
-                res = c.word_std_dev()
-            elif self.kwargs['measure'] == 'baseline_duration':
-                res = c.baseline_duration()
-            elif self.kwargs['measure'] == 'phone_mean':
-                data_type = 'phone'
-                res = c.phone_mean_duration()
-            elif self.kwargs['measure'] == 'phone_median':
-                data_type = 'phone'
-                res = c.phone_median()
-            elif self.kwargs['measure'] == 'phone_std_dev':
-                data_type = 'phone'
-                res = c.phone_std_dev()
-            elif self.kwargs['measure'] == 'all_word_median':
-                res = c.all_word_median()
-            elif self.kwargs['measure'] == 'phone_mean_duration_with_speaker':
-                data_type = 'speaker'
-                res = c.phone_mean_duration_with_speaker()
-            elif self.kwargs['measure'] == 'word_mean_by_speaker':
-                data_type = 'speaker'
-                res = c.word_mean_duration_with_speaker()
-            elif self.kwargs['measure'] == 'all_phone_median':
-                data_type = 'phone'
-                res = c.all_phone_median()
-            elif self.kwargs['measure'] == 'syllable_mean':
-                data_type = 'syllable'
-                res = c.syllable_mean_duration()
-            elif self.kwargs['measure'] == 'syllable_median':
-                data_type = 'syllable'
-                res = c.syllable_median()
-            elif self.kwargs['measure'] == 'syllable_std_dev':
-                data_type = 'syllable'
-                res = c.syllable_std_dev()
-            elif self.kwargs['measure'] == 'mean_speech_rate':
-                data_type = 'speaker'
-                res = c.average_speech_rate()
-
-            else:
-                print("error")
-            c.encode_measure(res, data_type)
-            self.actionCompleted.emit('encoding '+ self.kwargs['measure'].replace('_',' '))
-            if stop_check():
-                return False
-        return True
-
+        return self.run_task(encode_hierarchical_property, 'encoding '+ self.kwargs['name'].replace('_',' '))
 
-
-
-class PrecedingCacheWorker(QueryWorker):
+class RelativizedMeasuresWorker(EnrichmentWorker):
     def run_query(self):
-        print('starting to cache preceding')
-        config = self.kwargs['config']
-        discourse = self.kwargs['discourse']
-        begin = self.kwargs['begin']
-        end = self.kwargs['end']
-        with CorpusContext(config) as c:
-            h_type = c.hierarchy.highest
-            highest = getattr(c, h_type)
-            q = c.query_graph(highest)
-            q = q.filter(highest.discourse.name == discourse)
-            q = q.filter(highest.begin < end)
-            q = q.filter(highest.end > begin)
-            preloads = []
-            if h_type in c.hierarchy.subannotations:
-                for s in c.hierarchy.subannotations[h_type]:
-                    preloads.append(getattr(highest, s))
-            for t in c.hierarchy.get_lower_types(h_type):
-                preloads.append(getattr(highest, t))
-            preloads.append(highest.speaker)
-            preloads.append(highest.discourse)
-            q = q.preload(*preloads)
-            q = q.order_by(highest.begin)
-            results = [x for x in q.all()]
-        print('finished query')
-        return results
+        return self.run_task(encode_relativized_measure, 'encoding '+ self.kwargs['measure'].replace('_',' '))
+
+
+
+def window_query(corpus_context, discourse, begin, end):
+    h_type = corpus_context.hierarchy.highest
+    highest = getattr(corpus_context, h_type)
+    q = corpus_context.query_graph(highest)
+    q = q.filter(highest.discourse.name == discourse)
+    q = q.filter(highest.begin < end)
+    q = q.filter(highest.end > begin)
+    preloads = []
+    if h_type in corpus_context.hierarchy.subannotations:
+        for s in corpus_context.hierarchy.subannotations[h_type]:
+            preloads.append(getattr(highest, s))
+    for t in corpus_context.hierarchy.get_lower_types(h_type):
+        preloads.append(getattr(highest, t))
+    preloads.append(highest.speaker)
+    preloads.append(highest.discourse)
+    q = q.preload(*preloads)
+    q = q.order_by(highest.begin)
+    return [x for x in q.all()]
+
+class AnnotationWindowWorker(QueryWorker):
+    """
+    Fetches windows of a discourse's highest level annotations, with the
+    lower types preloaded, for both directions of the discourse browser.
+
+    Windows are requested with ``request`` and queued in a RangeQueue, so
+    overlapping requests are merged and ranges already queued or being
+    fetched are skipped.  The thread fetches every queued window over the
+    context leased for the discourse model, which the annotations keep,
+    emitting ``windowReady`` with the discourse, range and
+    annotations of each, and exits once the queue is empty.  Windows
+    requested while it exits start it again once it has finished, without
+    blocking the caller.
+    """
+    windowReady = QtCore.pyqtSignal(object)
+    def __init__(self):
+        super(AnnotationWindowWorker, self).__init__()
+        self.lock = threading.Lock()
+        self.queue = RangeQueue()
+        self.active = False
+        self.lease = None
+        self.discourse = None
+        self.generation = 0
+        thread_finished(self).connect(self.restart)
+
+    def setDiscourse(self, lease, discourse):
+        """
+        Switch to another discourse and the lease of its context, dropping
+        queued windows.  Windows of the previous discourse still being
+        fetched are not emitted.
+        """
+        with self.lock:
+            self.lease = lease
+            self.discourse = discourse
+            self.queue.clear()
+            self.generation += 1
+
+    def request(self, begin, end):
+        with self.lock:
+            if self.discourse is None or not self.queue.add(begin, end):
+                return
+            if self.active:
+                return
+            # A thread that has just emptied the queue is restarted when it
+            # finishes
+            if self.isRunning():
+                return
+            self.active = True
+        self.setParams({})
+        self.start()
+
+    def restart(self):
+        with self.lock:
+            if self.active or self.discourse is None or not len(self.queue):
+                return
+            self.active = True
+        self.setParams({})
+        self.start()
+
+    def discard(self, begin, end):
+        with self.lock:
+            self.queue.discard_outside(begin, end)
 
-class FollowingCacheWorker(QueryWorker):
     def run_query(self):
-        print('starting to cache following')
-        config = self.kwargs['config']
-        discourse = self.kwargs['discourse']
-        begin = self.kwargs['begin']
-        end = self.kwargs['end']
-        with CorpusContext(config) as c:
-            h_type = c.hierarchy.highest
-            highest = getattr(c, h_type)
-            q = c.query_graph(highest)
-            q = q.filter(highest.discourse.name == discourse)
-            q = q.filter(highest.begin < end)
-            q = q.filter(highest.end > begin)
-            preloads = []
-            if h_type in c.hierarchy.subannotations:
-                for s in c.hierarchy.subannotations[h_type]:
-                    preloads.append(getattr(highest, s))
-            for t in c.hierarchy.get_lower_types(h_type):
-                preloads.append(getattr(highest, t))
-            preloads.append(highest.speaker)
-            preloads.append(highest.discourse)
-            q = q.preload(*preloads)
-            q = q.order_by(highest.begin)
-            print('getting results')
-            results = [x for x in q.all()]
-        print('finished query')
-        return results
+        try:
+            while True:
+                with self.lock:
+                    if self.stopped or not len(self.queue):
+                        self.active = False
+                        return None
+                    generation = self.generation
+                    lease = self.lease
+                    discourse = self.discourse
+                while True:
+                    with self.lock:
+                        if self.stopped or self.generation != generation or not len(self.queue):
+                            break
+                        begin, end = self.queue.pop()
+                    try:
+                        with lease.lock:
+                            # Released once the discourse was replaced
+                            if lease.context is None:
+                                results = None
+                            else:
+                                results = window_query(lease.context, discourse, begin, end)
+                    finally:
+                        with self.lock:
+                            self.queue.done()
+                            current = self.generation == generation
+                    if current and results is not None:
+                        self.windowReady.emit((discourse, begin, end, results))
+        except Exception:
+            with self.lock:
+                self.active = False
+            raise
 
 class AudioCacheWorker(QueryWorker):
     def run_query(self):
@@ -551,6 +668,45 @@ class AudioCacheWorker(QueryWorker):
         sound_file = self.kwargs['sound_file']
         begin = self.kwargs['begin']
         end = self.kwargs['end']
-        f = LongSoundFile(sound_file, begin, end)
+        f = open_sound_file(sound_file)
+        if f is None:
+            from polyglotdb.graph.discourse import LongSoundFile
+            f = LongSoundFile(sound_file, begin, end)
         print('finished audio caching')
         return f
+
+class EnvelopeWorker(QueryWorker):
+    """
+    Builds the envelope pyramid of the latest requested sound file.
+
+    A file requested while the pyramid of another is being built is
+    remembered, and the worker is restarted for it once it has finished.
+    """
+    def __init__(self):
+        super(EnvelopeWorker, self).__init__()
+        self.lock = threading.Lock()
+        self.path = None
+        self.building = None
+        thread_finished(self).connect(self.restart)
+
+    def request(self, path):
+        with self.lock:
+            self.path = path
+            if self.isRunning():
+                return
+        self.restart()
+
+    def restart(self):
+        with self.lock:
+            path, built = self.path, self.building
+            self.building = None
+            if path is None or path == built:
+                return
+            self.building = path
+        self.setParams({'path': path})
+        self.start()
+
+    def run_query(self):
+        return EnvelopePyramid.load_or_build(self.kwargs['path'],
+                                        call_back = self.kwargs['call_back'],
+                                        stop_check = self.kwargs['stop_check'])
@@ -0,0 +1,305 @@
+import os
+import csv
+import gzip
+import pickle
+import tempfile
+import collections
+
+from polyglotdb.exceptions import PGError
+
+def permission_error():
+    return PGError('The file you specified could not be written to. Please ensure you have proper permissions and programs that lock the file (i.e., Excel) do not have it open.')
+
+def missing_dependency(format, package):
+    return PGError('Exporting to {} requires the \'{}\' package, please install it or choose another format.'.format(format, package))
+
+def stringify(value):
+    if isinstance(value, (list, tuple)):
+        return ', '.join(stringify(x) for x in value)
+    return str(value)
+
+def infer_type(values):
+    """
+    Guess the type of a column whose type is not in the hierarchy from
+    the non-missing values of the first chunk written.
+
+    Numbers are always inferred as floats, since a column whose first
+    chunk only holds whole numbers may hold fractions later on.  Later
+    values that do not fit the inferred type raise a PGError.
+    """
+    values = [x for x in values if x is not None]
+    if not values:
+        return str
+    if all(isinstance(x, bool) for x in values):
+        return bool
+    if all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in values):
+        return float
+    return str
+
+def type_error(column, value, t):
+    return PGError('The column \'{}\' holds the value {!r}, which is not {}. Please check the '
+                    'values of this property or export to CSV.'.format(column, value,
+                    {str: 'a string', int: 'an integer', float: 'a number', bool: 'true or false'}[t]))
+
+def coerce(value, t, column = None):
+    """
+    Convert a value to the type of its column, raising a PGError rather
+    than writing a value that does not fit as missing.
+    """
+    if value is None:
+        return None
+    if t is str:
+        return stringify(value)
+    if t is bool:
+        if isinstance(value, bool):
+            return value
+    elif isinstance(value, bool):
+        pass
+    elif t is int and isinstance(value, float) and not value.is_integer():
+        pass
+    else:
+        try:
+            return t(value)
+        except (TypeError, ValueError):
+            pass
+    raise(type_error(column, value, t))
+
+class ResultsWriter(object):
+    """
+    Base class for writers that receive exported rows a chunk at a time.
+
+    Writers are used as context managers, and closing a writer always
+    leaves a readable file containing every chunk written so far.
+
+    Parameters
+    ----------
+    path : str
+        Path to write to
+    columns : list of str
+        Column names
+    types : list, optional
+        Python type of each column (``str``, ``int``, ``float`` or ``bool``),
+        or None for columns whose type should be inferred
+    compression : str, optional
+        One of the writer's ``compressions``
+    """
+    name = ''
+    extensions = []
+    compressions = [None]
+    def __init__(self, path, columns, types = None, compression = None):
+        self.path = path
+        self.columns = columns
+        if types is None:
+            types = [None for x in columns]
+        self.types = list(types)
+        if compression not in self.compressions:
+            raise(PGError('{} export does not support {} compression.'.format(self.name, compression)))
+        self.compression = compression
+        self.num_rows = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        raise(NotImplementedError)
+
+    def write_rows(self, rows):
+        """
+        Write a chunk of rows, each a sequence of values in the same order
+        as ``columns``.
+        """
+        raise(NotImplementedError)
+
+    def close(self):
+        raise(NotImplementedError)
+
+    def resolve_types(self, rows):
+        for i, t in enumerate(self.types):
+            if t is None:
+                self.types[i] = infer_type([r[i] for r in rows])
+
+    def typed_columns(self, rows):
+        self.resolve_types(rows)
+        return [[coerce(r[i], t, self.columns[i]) for r in rows] for i, t in enumerate(self.types)]
+
+class CsvResultsWriter(ResultsWriter):
+    name = 'CSV'
+    extensions = ['.csv', '.txt']
+    compressions = [None, 'gzip']
+    buffer_size = 1024 * 1024
+    def open(self):
+        try:
+            if self.compression == 'gzip':
+                self.file = gzip.open(self.path, 'wt', newline = '', encoding = 'utf8')
+            else:
+                self.file = open(self.path, 'w', newline = '', encoding = 'utf8',
+                                buffering = self.buffer_size)
+        except PermissionError:
+            raise(permission_error())
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+        self.num_rows += len(rows)
+
+    def close(self):
+        self.file.close()
+
+class ArrowResultsWriter(ResultsWriter):
+    """
+    Base class for the formats written through pyarrow.  The schema is
+    fixed when the first chunk is written.
+    """
+    def open(self):
+        try:
+            import pyarrow
+        except ImportError:
+            raise(missing_dependency(self.name, 'pyarrow'))
+        self.pyarrow = pyarrow
+        self.writer = None
+        try:
+            open(self.path, 'wb').close()
+        except PermissionError:
+            raise(permission_error())
+
+    def schema(self):
+        pa = self.pyarrow
+        arrow_types = {str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_()}
+        return pa.schema([(c, arrow_types[t]) for c, t in zip(self.columns, self.types)])
+
+    def create_writer(self, schema):
+        raise(NotImplementedError)
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        data = self.typed_columns(rows)
+        if self.writer is None:
+            self.arrow_schema = self.schema()
+            self.writer = self.create_writer(self.arrow_schema)
+        schema = self.arrow_schema
+        arrays = [self.pyarrow.array(x, type = schema.field(i).type) for i, x in enumerate(data)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(arrays, schema = schema))
+        self.num_rows += len(rows)
+
+    def close(self):
+        if self.writer is None:
+            self.resolve_types([])
+            self.writer = self.create_writer(self.schema())
+        self.writer.close()
+
+class ParquetResultsWriter(ArrowResultsWriter):
+    name = 'Parquet'
+    extensions = ['.parquet']
+    compressions = [None, 'snappy', 'gzip', 'zstd']
+    def create_writer(self, schema):
+        import pyarrow.parquet
+        compression = self.compression
+        if compression is None:
+            compression = 'none'
+        return pyarrow.parquet.ParquetWriter(self.path, schema, compression = compression)
+
+class FeatherResultsWriter(ArrowResultsWriter):
+    name = 'Feather'
+    extensions = ['.feather']
+    compressions = [None, 'lz4', 'zstd']
+    def create_writer(self, schema):
+        pa = self.pyarrow
+        options = pa.ipc.IpcWriteOptions(compression = self.compression)
+        return pa.ipc.new_file(self.path, schema, options = options)
+
+class Hdf5ResultsWriter(ResultsWriter):
+    """
+    String columns are fixed width in HDF5 tables, so chunks are kept in a
+    temporary file next to the export and written to the store on close,
+    once the longest value of each column is known.
+    """
+    name = 'HDF5'
+    extensions = ['.h5', '.hdf5']
+    compressions = [None, 'zlib', 'blosc']
+    key = 'results'
+    def open(self):
+        try:
+            import pandas
+            import tables
+        except ImportError:
+            raise(missing_dependency(self.name, 'tables'))
+        self.pandas = pandas
+        try:
+            open(self.path, 'wb').close()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            self.chunks = tempfile.TemporaryFile(dir = directory, suffix = '.chunks')
+        except PermissionError:
+            raise(permission_error())
+        self.widths = {}
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        data = self.typed_columns(rows)
+        for c, t, values in zip(self.columns, self.types, data):
+            if t is not str:
+                continue
+            # Widths are in bytes of the encoded strings
+            lengths = [len(x.encode('utf8')) for x in values if x is not None]
+            if lengths:
+                self.widths[c] = max(self.widths.get(c, 1), max(lengths))
+        pickle.dump(data, self.chunks, protocol = pickle.HIGHEST_PROTOCOL)
+        self.num_rows += len(rows)
+
+    def frame(self, data, offset = 0):
+        columns = collections.OrderedDict()
+        for c, t, values in zip(self.columns, self.types, data):
+            if t is str:
+                columns[c] = self.pandas.Series(['' if x is None else x for x in values], dtype = object)
+            else:
+                # HDF5 tables have no missing value for integers or booleans,
+                # and every chunk must have the same column types
+                columns[c] = self.pandas.Series([float('nan') if x is None else float(x) for x in values],
+                                                dtype = 'float64')
+        frame = self.pandas.DataFrame(columns)
+        # Number rows across chunks rather than from zero in each
+        frame.index += offset
+        return frame
+
+    def close(self):
+        self.resolve_types([])
+        kwargs = {}
+        if self.compression is not None:
+            kwargs['complib'] = self.compression
+            kwargs['complevel'] = 5
+        min_itemsize = {c: self.widths.get(c, 1) for c, t in zip(self.columns, self.types) if t is str}
+        try:
+            with self.pandas.HDFStore(self.path, mode = 'w', **kwargs) as store:
+                self.chunks.seek(0)
+                written = 0
+                while True:
+                    try:
+                        data = pickle.load(self.chunks)
+                    except EOFError:
+                        break
+                    frame = self.frame(data, written)
+                    store.append(self.key, frame, format = 'table', index = False,
+                                min_itemsize = min_itemsize)
+                    written += len(frame)
+                if not written:
+                    store.put(self.key, self.frame([[] for c in self.columns]), format = 'table')
+        finally:
+            self.chunks.close()
+
+export_formats = collections.OrderedDict((w.name, w) for w in [CsvResultsWriter,
+                                                            ParquetResultsWriter,
+                                                            FeatherResultsWriter,
+                                                            Hdf5ResultsWriter])
+
+def file_filter(format):
+    """
+    Return the file dialog filter string for an export format.
+    """
+    writer = export_formats[format]
+    return '{} ({})'.format(writer.name, ' '.join('*' + x for x in writer.extensions))
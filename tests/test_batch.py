@@ -0,0 +1,73 @@
+import io
+import json
+import threading
+
+from speechtools import batch
+from speechtools.batch import pipeline_steps, run_pipeline, run_pipeline_file, ProgressPrinter
+
+pipeline = {'graph_host': 'localhost', 'graph_port': 7474, 'max_concurrent': 2,
+            'corpora': [{'name': 'a', 'import': '/data/a',
+                        'enrichments': [{'step': 'pauses', 'pause_words': ['uh']},
+                                        {'step': 'utterances', 'min_pause_length': 0.15,
+                                        'min_utterance_length': 0}],
+                        'exports': [{'query_profile': 'q', 'export_profile': 'e', 'path': 'a1.csv'},
+                                    {'query_profile': 'q', 'export_profile': 'e', 'path': 'a2.csv'}]},
+                        {'name': 'b',
+                        'enrichments': [{'step': 'pauses', 'pause_words': ['um']}]}]}
+
+def test_pipeline_steps():
+    steps = pipeline_steps(pipeline)
+    assert [x['name'] for x in steps] == ['a:import', 'a:0:pauses', 'a:1:utterances',
+                                        'a:export:0', 'a:export:1', 'b:0:pauses']
+    assert steps[1]['after'] == ['a:import']
+    assert steps[1]['params'] == {'pause_words': ['uh']}
+    assert steps[3]['after'] == steps[4]['after'] == ['a:1:utterances']
+    assert steps[5]['after'] == []
+
+def test_run_pipeline(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+    def run_job(job, connection, call_back, stop_check):
+        assert connection == {'graph_host': 'localhost', 'graph_port': 7474}
+        call_back(0, 2)
+        call_back(2)
+        with lock:
+            calls.append((job.corpus, job.step))
+        if job.corpus == 'b':
+            raise(ValueError('failed'))
+        return True
+    monkeypatch.setattr(batch, 'run_job', run_job)
+
+    out = io.StringIO()
+    report = run_pipeline(pipeline, out)
+    assert not report['succeeded']
+    states = {(x['corpus'], x['step']): x['state'] for x in report['jobs']}
+    assert states[('a', 'export')] == 'done'
+    assert states[('b', 'pauses')] == 'failed'
+    a_calls = [x[1] for x in calls if x[0] == 'a']
+    assert a_calls[:3] == ['import', 'pauses', 'utterances']
+    assert '[a import] running' in out.getvalue()
+    assert '[b pauses] failed' in out.getvalue()
+    assert all(x['duration'] is not None for x in report['jobs'])
+
+def test_run_pipeline_file(tmpdir, monkeypatch):
+    monkeypatch.setattr(batch, 'run_job', lambda *args: True)
+    path = tmpdir.join('pipeline.json')
+    path.write(json.dumps(pipeline))
+    timings = tmpdir.join('timings.json')
+    assert run_pipeline_file(str(path), str(timings), out = io.StringIO()) == 0
+    report = json.loads(timings.read())
+    assert report['succeeded']
+    assert len(report['jobs']) == 6
+
+def test_progress_printer():
+    out = io.StringIO()
+    printer = ProgressPrinter('a pauses', out)
+    printer('Encoding...')
+    printer(0, 100)
+    for i in range(1, 101):
+        printer(i)
+    lines = out.getvalue().splitlines()
+    assert lines[0] == '[a pauses] Encoding...'
+    assert lines[-1] == '[a pauses] 100/100 (100%)'
+    assert len(lines) == 12
@@ -0,0 +1,74 @@
+import os
+
+from speechtools.cache import QueryCache
+
+class Context(object):
+    def __init__(self, corpus_name = 'test', hierarchy = 'hierarchy'):
+        self.corpus_name = corpus_name
+        self.hierarchy = hierarchy
+
+class Query(object):
+    def __init__(self, cypher, params = None):
+        self._cypher = cypher
+        self.params = params or {}
+
+    def cypher(self):
+        return self._cypher
+
+    def cypher_params(self):
+        return self.params
+
+def test_versioning(tmpdir):
+    directory = os.path.join(str(tmpdir), 'cache')
+    cache = QueryCache(directory)
+    # The directory is only created once something is stored
+    assert not os.path.exists(directory)
+    c = Context()
+    query = Query('MATCH (n) RETURN n', {'label': 'a'})
+    assert cache.get(c, query) is None
+
+    cache.put(c, query, [1, 2])
+    assert cache.get(c, query) == [1, 2]
+    assert cache.get(c, Query('MATCH (n) RETURN n', {'label': 'b'})) is None
+    assert cache.get(Context(hierarchy = 'changed'), query) is None
+    assert cache.get(Context('other'), query) is None
+
+    other = Context('other')
+    cache.put(other, query, [3])
+    cache.invalidate('test')
+    assert cache.version('test') == 1
+    assert cache.get(c, query) is None
+    assert cache.get(other, query) == [3]
+
+    # Entries stored after the invalidation are found again
+    cache.put(c, query, [4])
+    assert QueryCache(directory).get(c, query) == [4]
+
+def test_eviction(tmpdir):
+    cache = QueryCache(str(tmpdir))
+    c = Context()
+    queries = [Query(str(i)) for i in range(3)]
+    for q in queries[:2]:
+        cache.put(c, q, 'x' * 100)
+    size = max(x[1] for x in cache.entries())
+    cache.max_size = 2 * size
+    for i, q in enumerate(queries[:2]):
+        os.utime(cache.path(cache.key(c, q)), (1000 + i, 1000 + i))
+    # Reading an entry marks it as recently used
+    assert cache.get(c, queries[0]) is not None
+
+    cache.put(c, queries[2], 'x' * 100)
+    assert cache.get(c, queries[1]) is None
+    assert cache.get(c, queries[0]) is not None
+    assert cache.get(c, queries[2]) is not None
+
+def test_stale_entries(tmpdir):
+    cache = QueryCache(str(tmpdir))
+    c = Context()
+    for i, data in enumerate([b'cnot_a_module\nResults\n.', b'cos\nnot_a_function\n.', b'\x80\x04']):
+        query = Query(str(i))
+        path = cache.path(cache.key(c, query))
+        with open(path, 'wb') as f:
+            f.write(data)
+        assert cache.get(c, query) is None
+        assert not os.path.exists(path)
@@ -0,0 +1,26 @@
+
+import numpy as np
+import pytest
+
+from scipy.io import wavfile
+
+from speechtools.envelope import EnvelopePyramid
+
+def test_envelope_pyramid(tmpdir):
+    path = str(tmpdir.join('test.wav'))
+    signal = (np.random.randn(16000 * 3 + 7, 2) * 3000).astype(np.int16)
+    wavfile.write(path, 16000, signal)
+
+    envelope = EnvelopePyramid.load_or_build(path)
+    assert envelope.block_sizes[:3] == [16, 32, 64]
+    assert envelope.lengths[-1] == 1
+
+    data = envelope.visible(0, 3, 1, 800)
+    assert data.shape[1] == 2
+    assert 800 <= data.shape[0] / 2 <= 1600
+    assert np.isclose(data[:, 1].max(), signal[:, 1].max() / 32768)
+    assert np.isclose(data[:, 1].min(), signal[:, 1].min() / 32768)
+
+    assert envelope.visible(0, 0.1, 0, 800) is None
+
+    assert EnvelopePyramid.load(path) is not None
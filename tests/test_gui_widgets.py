@@ -3,7 +3,8 @@ import pytest
 
 from speechtools.widgets.annotation import SubannotationDialog, NoteDialog
 from speechtools.widgets.audio import MediaPlayer
-from speechtools.widgets.base import CollapsibleWidgetPair, DataListWidget, DetailedMessageBox
+from speechtools.widgets.base import (CollapsibleWidgetPair, CollapsibleTabWidget, DataListWidget,
+                                    DetailedMessageBox)
 from speechtools.widgets.connection import ConnectWidget, CorporaList
 from speechtools.widgets.details import DetailsWidget
 from speechtools.widgets.help import HelpWidget
@@ -56,5 +57,13 @@ def test_hierarchy(qtbot):
     w = HierarchyWidget()
     qtbot.addWidget(w)
 
-
-
+def test_lazy_tab(qtbot):
+    w = CollapsibleTabWidget()
+    qtbot.addWidget(w)
+    w.addTab(DetailsWidget(), 'Details')
+    help_tab = w.addLazyTab(HelpWidget, 'Help')
+    w.show()
+    assert not help_tab.isBuilt()
+    w.setCurrentIndex(1)
+    assert help_tab.isBuilt()
+    assert isinstance(help_tab.widget(), HelpWidget)
@@ -0,0 +1,32 @@
+import threading
+
+from speechtools import workers
+from speechtools.workers import EnvelopeWorker
+
+class Envelope(object):
+    def __init__(self, sound_path):
+        self.sound_path = sound_path
+
+def test_envelope_switch_while_building(qtbot, monkeypatch):
+    release = threading.Event()
+    built = []
+    class EnvelopePyramid(object):
+        @staticmethod
+        def load_or_build(path, call_back = None, stop_check = None):
+            if path == 'first.wav':
+                release.wait(5)
+            built.append(path)
+            return Envelope(path)
+    monkeypatch.setattr(workers, 'EnvelopePyramid', EnvelopePyramid)
+
+    worker = EnvelopeWorker()
+    ready = []
+    worker.dataReady.connect(ready.append)
+    worker.request('first.wav')
+    qtbot.waitUntil(worker.isRunning)
+    # The second file is requested while the first is still being built
+    worker.request('second.wav')
+    release.set()
+    qtbot.waitUntil(lambda: any(x.sound_path == 'second.wav' for x in ready))
+    qtbot.waitUntil(lambda: not worker.isRunning())
+    assert built == ['first.wav', 'second.wav']
@@ -0,0 +1,32 @@
+import sys
+
+from speechtools.importtime import ImportTimer
+
+def test_import_timer(tmpdir, monkeypatch):
+    package = tmpdir.mkdir('timed_package')
+    package.join('__init__.py').write('from . import child\n')
+    package.join('child.py').write('import time\ntime.sleep(0.01)\n')
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    timer = ImportTimer()
+    timer.install()
+    try:
+        import timed_package
+    finally:
+        timer.uninstall()
+    assert timer not in sys.meta_path
+    assert timed_package.child.__name__ == 'timed_package.child'
+
+    records = {x[0]: x for x in timer.records}
+    name, own, cumulative, depth = records['timed_package']
+    assert depth == 0
+    assert records['timed_package.child'][3] == 1
+    assert cumulative >= records['timed_package.child'][2] >= 0.01
+    assert own < records['timed_package.child'][2]
+
+    path = str(tmpdir.join('import_times.log'))
+    timer.write_report(path, 'test')
+    with open(path) as f:
+        text = f.read()
+    assert '== test ==' in text
+    assert 'timed_package.child' in text
@@ -0,0 +1,64 @@
+
+import pytest
+
+from speechtools.intervals import IntervalIndex, AnnotationIndex
+
+class Annotation(object):
+    def __init__(self, type, begin, end, channel = 0, **kwargs):
+        self._type = type
+        self.begin = begin
+        self.end = end
+        self.channel = channel
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+class Discourse(object):
+    def __init__(self, cache):
+        self.cache = cache
+
+def test_interval_index():
+    items = ['c', 'a', 'b', 'long']
+    index = IntervalIndex(items, [2, 0, 1, 0], [3, 1, 2, 10])
+    assert index.overlapping(1, 2) == ['long', 'b']
+    assert index.overlapping(0.5, 1.5) == ['a', 'long', 'b']
+    assert index.overlapping(11, 12) == []
+    assert index.containing(2.5) == 'long'
+    assert index.containing(11) is None
+
+    empty = IntervalIndex([], [], [])
+    assert empty.overlapping(0, 1) == []
+    assert empty.containing(0) is None
+
+def test_annotation_index():
+    phones = [Annotation('phone', 0, 0.5), Annotation('phone', 0.5, 1)]
+    words = [Annotation('word', 0, 1, phone = phones),
+            Annotation('word', 1, 2, phone = []),
+            Annotation('word', 0, 2, channel = 1, phone = [])]
+    index = AnnotationIndex(Discourse(words))
+    assert index.annotations(0.5, 1.5) == words[:2]
+    assert index.annotations(0.5, 1.5, channel = 1) == words[2:]
+    assert index.find_annotation('word', 1.5) is words[1]
+    assert index.find_annotation('phone', 0.75) is phones[1]
+    assert ('phone', 0) in index.indexes
+
+    words.append(Annotation('word', 2, 3, phone = []))
+    index.rebuild()
+    assert ('phone', 0) in index.indexes
+    assert index.find_annotation('word', 2.5) is words[-1]
+
+def test_annotation_array():
+    phones = [Annotation('phone', 0.5, 1, label = 'b',
+                        burst = [Annotation('burst', 0.5, 0.6, label = None),
+                                Annotation('burst', 0.6, 0.7, label = 'x')]),
+            Annotation('phone', 0, 0.5, label = None, burst = [])]
+    words = [Annotation('word', 0, 1, label = 'ab', phone = phones)]
+    index = AnnotationIndex(Discourse(words))
+    array = index.array('phone', 0)
+    assert list(array['begin']) == [0, 0.5]
+    assert list(array['label']) == ['', 'b']
+    assert list(array['slots']) == [1, 1]
+    array = index.array(('phone', 'burst'), 0)
+    assert list(array['label']) == ['', 'x']
+    assert list(array['slot']) == [0, 1]
+    assert list(array['slots']) == [2, 2]
+    assert index.array('word', 0) is index.array(None, 0)
@@ -0,0 +1,44 @@
+import contextlib
+
+from speechtools import metadata
+from speechtools.metadata import MetadataCache
+
+from .test_pool import Config
+
+class Context(object):
+    corpus_name = 'test'
+    hierarchy = 'hierarchy'
+    phone_name = 'phone'
+    word_name = 'word'
+    discourses = ['b', 'a']
+    speakers = ['s']
+
+def test_metadata_cache(tmpdir, monkeypatch):
+    borrowed = []
+    @contextlib.contextmanager
+    def borrow_context(config):
+        borrowed.append(config)
+        yield Context()
+    monkeypatch.setattr(metadata, 'borrow_context', borrow_context)
+
+    config = Config('test')
+    cache = MetadataCache(str(tmpdir))
+    assert cache.load(config) is None
+    assert cache.get(config, 'discourses') == ['a', 'b']
+    assert cache.get(config, 'discourses') == ['a', 'b']
+    assert len(borrowed) == 1
+
+    # Entries persist across instances
+    cache = MetadataCache(str(tmpdir))
+    assert cache.get(config, 'discourses') == ['a', 'b']
+    assert len(borrowed) == 1
+    assert cache.load(config)['marker'] is None
+
+    cache.store(config, {'marker': (10, 0), 'values': {'hierarchy': 'new'}})
+    assert cache.get(config, 'hierarchy') == 'new'
+    assert MetadataCache(str(tmpdir)).load(config)['marker'] == (10, 0)
+    assert MetadataCache(str(tmpdir)).load(Config('test', graph_port = 1)) is None
+
+    cache.invalidate('test')
+    assert cache.load(config) is None
+    assert MetadataCache(str(tmpdir)).load(config) is None
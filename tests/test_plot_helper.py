@@ -0,0 +1,91 @@
+import numpy as np
+
+from speechtools.intervals import AnnotationIndex
+from speechtools.plot.helper import (generate_boundaries, index_boundaries, nearest_boundary,
+                                    highlight_segment, LRUCache)
+
+from .test_intervals import Annotation, Discourse
+
+class Hierarchy(object):
+    highest_to_lowest = ['word', 'phone']
+    lowest = 'phone'
+    subannotations = {'phone': ['burst']}
+
+    def keys(self):
+        return self.highest_to_lowest
+
+def test_generate_boundaries():
+    bursts = [Annotation('burst', 0.1, 0.2, label = 'x')]
+    phones = [Annotation('phone', 0, 0.5, label = 'a', burst = bursts),
+            Annotation('phone', 0.5, 1, label = 'b', burst = []),
+            Annotation('phone', 1, 1.5, label = 'c', burst = [])]
+    words = [Annotation('word', 0, 1, label = 'ab', phone = phones[:2]),
+            Annotation('word', 1, 1.5, label = 'c', phone = phones[2:])]
+    index = AnnotationIndex(Discourse(words))
+    lines, texts, elements = generate_boundaries(index, Hierarchy(), 0.25, 0.75)
+
+    assert texts['word'][0] == ['ab']
+    assert np.allclose(lines['word'], [[0, 0.5], [0, 1], [1, 0.5], [1, 1]])
+    assert texts['phone'][0] == ['a', 'b']
+    assert np.allclose(texts['phone'][1], [[0.25, 0.25], [0.75, 0.25]])
+    assert lines['phone'].shape == (8, 2)
+
+    assert texts['phone', 'burst'][0] == []
+
+    # Subannotation labels whose midpoint is outside the window are centred in it
+    lines, texts, elements = generate_boundaries(index, Hierarchy(), 0.18, 0.78)
+    assert np.allclose(texts['phone', 'burst'][1], [[0.48, -0.5]])
+    assert np.allclose(lines['phone', 'burst'][:, 1], [-1, 0, -1, -1, -1, 0])
+    assert index.index('phone', 0).items[elements['phone'][1]] is phones[1]
+
+def test_generate_boundaries_culls_labels():
+    phones = [Annotation('phone', 0, 0.01, label = 'a', burst = []),
+            Annotation('phone', 0.01, 0.5, label = 'b', burst = []),
+            Annotation('phone', 0.5, 1, label = 'c', burst = [])]
+    words = [Annotation('word', 0, 1, label = 'abc', phone = phones)]
+    index = AnnotationIndex(Discourse(words))
+    lines, texts, elements = generate_boundaries(index, Hierarchy(), 0, 0.7, min_label_width = 0.05)
+    assert lines['phone'].shape == (12, 2)
+    assert texts['phone'][0] == ['b']
+    assert texts['word'][0] == ['abc']
+
+def test_nearest_boundary():
+    # Two adjacent phones, boundaries at 0, 0.5 (drawn twice) and 1, with
+    # a horizontal segment that is not a boundary
+    lines = np.array([[0.5, 0], [0.5, 1], [1, 0], [1, 1],
+                    [0, 0], [0, 1], [0.5, 0], [0.5, 1],
+                    [0, 0.5], [1, 0.5]])
+    times, indices = index_boundaries(lines)
+    assert np.allclose(times, [0, 0.5, 0.5, 1])
+    assert list(indices) == [4, 0, 6, 2]
+
+    assert nearest_boundary(times, indices, 0.48, 0.05) == 0
+    assert nearest_boundary(times, indices, 0.97, 0.05) == 2
+    assert nearest_boundary(times, indices, -0.01, 0.05) == 4
+    assert nearest_boundary(times, indices, 0.25, 0.05) == -1
+    assert nearest_boundary(*index_boundaries(None), 0.5, 1) == -1
+
+def test_highlight_segment():
+    colors = np.zeros((6, 4))
+    highlighted, changed = highlight_segment(colors, -1, 2, 0, 1)
+    assert highlighted == 2
+    assert changed == [(2, 4)]
+    assert colors[:, 0].tolist() == [0, 0, 1, 1, 0, 0]
+
+    highlighted, changed = highlight_segment(colors, highlighted, 4, 0, 1)
+    assert changed == [(2, 4), (4, 6)]
+    assert colors[:, 0].tolist() == [0, 0, 0, 0, 1, 1]
+
+    highlighted, changed = highlight_segment(colors, highlighted, -1, 0, 1)
+    assert highlighted == -1
+    assert colors.sum() == 0
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache['a'] == 1
+    cache['c'] = 3
+    assert len(cache) == 2
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
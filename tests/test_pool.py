@@ -0,0 +1,120 @@
+import pytest
+
+from speechtools.pool import ContextPool, ContextLease
+
+class Config(object):
+    def __init__(self, corpus_name, graph_host = 'localhost', graph_port = 7474):
+        self.corpus_name = corpus_name
+        self.graph_host = graph_host
+        self.graph_port = graph_port
+
+class Context(object):
+    def __init__(self, config):
+        self.config = config
+        self.entered = False
+        self.closed = False
+        self.healthy = True
+
+    def __enter__(self):
+        self.entered = True
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.closed = True
+
+def check(context):
+    if not context.healthy:
+        raise(ValueError('connection lost'))
+
+def make_pool(**kwargs):
+    return ContextPool(factory = Context, check = check, **kwargs)
+
+def test_reuse():
+    pool = make_pool()
+    config = Config('test')
+    with pool.borrow(config) as c:
+        assert c.entered
+        with pool.borrow(config) as c2:
+            assert c2 is not c
+    with pool.borrow(Config('test')) as c3:
+        assert c3 is c or c3 is c2
+        assert not c3.closed
+    with pool.borrow(Config('test', graph_port = 7475)) as c4:
+        assert c4 is not c and c4 is not c2
+
+def test_error_closes():
+    pool = make_pool()
+    config = Config('test')
+    with pytest.raises(ValueError):
+        with pool.borrow(config) as c:
+            raise(ValueError())
+    assert c.closed
+    with pool.borrow(config) as c2:
+        assert c2 is not c
+
+def test_health_check():
+    pool = make_pool(check_after = -1)
+    config = Config('test')
+    with pool.borrow(config) as c:
+        pass
+    c.healthy = False
+    with pool.borrow(config) as c2:
+        assert c2 is not c
+    assert c.closed
+
+def test_idle_timeout():
+    pool = make_pool(idle_timeout = -1)
+    config = Config('test')
+    with pool.borrow(config) as c:
+        pass
+    with pool.borrow(config) as c2:
+        assert c2 is not c
+    assert c.closed
+
+def test_invalidate():
+    pool = make_pool()
+    config = Config('test')
+    other = Config('other')
+    with pool.borrow(other) as o:
+        pass
+    with pool.borrow(config) as c:
+        pass
+    with pool.borrow(config) as c2:
+        assert c2 is c
+        pool.invalidate('test')
+    assert c.closed
+    assert not o.closed
+    with pool.borrow(other) as o2:
+        assert o2 is o
+
+def test_lease():
+    pool = make_pool()
+    config = Config('test')
+    lease = ContextLease(pool, config)
+    c = lease.context
+    # A leased context is not lent to anyone else until it is released
+    with pool.borrow(config) as c2:
+        assert c2 is not c
+    pool.invalidate('other')
+    assert not c.closed
+    lease.release()
+    lease.release()
+    assert lease.context is None
+    with pool.borrow(config) as c3:
+        assert c3 is c or c3 is c2
+        assert not c3.closed
+
+def test_lease_invalidated():
+    pool = make_pool()
+    config = Config('test')
+    lease = ContextLease(pool, config)
+    c = lease.context
+    pool.invalidate('test')
+    # Still usable until the lease ends, then closed rather than reused
+    assert not c.closed
+    lease.release()
+    assert c.closed
+    lease = ContextLease(pool, config)
+    assert lease.context is not c
+    lease.discard()
+    assert lease.context is None
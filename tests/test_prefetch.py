@@ -0,0 +1,70 @@
+from speechtools.prefetch import Prefetcher, RangeQueue, split_window
+
+from .test_intervals import Annotation
+
+def test_window_grows_with_velocity():
+    prefetcher = Prefetcher(min_window = 5, max_window = 60, lookahead = 2)
+    prefetcher.observe(0, 2, now = 0)
+    assert prefetcher.window(1) == 5
+    for i in range(1, 10):
+        prefetcher.observe(i * 0.5, i * 0.5 + 2, now = i * 0.05)
+    assert prefetcher.velocity > 5
+    assert prefetcher.window(1) > 15
+    assert prefetcher.window(-1) == 5
+
+    # Stopping resets the velocity
+    prefetcher.observe(10, 12, now = 10)
+    assert prefetcher.window(1) == 5
+
+def test_ranges():
+    prefetcher = Prefetcher(min_window = 5)
+    prefetcher.observe(10, 12, now = 0)
+    assert prefetcher.preceding_range(10, 12, 0) is None
+    assert prefetcher.preceding_range(10, 12, 8) == (-2, 8)
+    assert prefetcher.following_range(10, 12, 30) is None
+    assert prefetcher.following_range(10, 12, 15) == (15, 25)
+
+def test_evict():
+    annotations = [Annotation('word', i, i + 1, phone = [1, 2]) for i in range(100)]
+    prefetcher = Prefetcher(min_window = 5, max_annotations = 60)
+    prefetcher.observe(30, 32, now = 0)
+    lo, hi = prefetcher.evict(annotations, 30, 32, ['phone'])
+    assert (hi - lo) * 3 <= 60
+    assert lo <= 25 and hi >= 37
+    assert annotations[lo].begin > 0
+
+    prefetcher.max_annotations = 1
+    lo, hi = prefetcher.evict(annotations, 30, 32, ['phone'])
+    assert (lo, hi) == (24, 38)
+
+def test_range_queue():
+    queue = RangeQueue()
+    assert queue.add(10, 20)
+    assert not queue.add(12, 15)
+    assert queue.add(15, 25)
+    assert queue.pending == [(10, 25)]
+    assert queue.pop() == (10, 25)
+    assert not queue.add(10, 20)
+    assert queue.add(0, 30)
+    assert queue.pending == [(0, 10), (25, 30)]
+    queue.done()
+    queue.discard_outside(26, 40)
+    assert queue.pending == [(25, 30)]
+
+def test_split_window():
+    cache = [Annotation('word', 10, 11, id = 'b'), Annotation('word', 11, 12, id = 'c')]
+    results = [Annotation('word', 9, 10, id = 'a'), Annotation('word', 10, 11, id = 'b')]
+    preceding, following, begin, end = split_window(cache, 10, 12, 5, 10, results)
+    assert [x.id for x in preceding] == ['a']
+    assert following == []
+    assert (begin, end) == (5, 12)
+
+    results = [Annotation('word', 11, 12, id = 'c'), Annotation('word', 12, 13, id = 'd')]
+    preceding, following, begin, end = split_window(cache, 10, 12, 11, 20, results)
+    assert [x.id for x in following] == ['d']
+    assert (begin, end) == (10, 20)
+
+    # Windows that do not reach the cache are dropped
+    preceding, following, begin, end = split_window(cache, 10, 12, 20, 30, results)
+    assert preceding == [] and following == []
+    assert (begin, end) == (10, 12)
@@ -0,0 +1,62 @@
+
+import pytest
+
+from speechtools.results import ColumnarResults, sort_index, filter_index
+
+def test_columnar_results():
+    results = ColumnarResults(['label', 'begin'])
+    results.add_values('label', ['aa', 'b', 'aa'])
+    results.add_values('begin', [0, 1.5, None])
+    assert len(results) == 3
+    assert results.data['label'].kind == 'categorical'
+    assert results.data['label'].categories == ['aa', 'b']
+    assert results.value(1, 'begin') == 1.5
+    assert results.value(2, 'begin') is None
+    assert results.display(0, 'begin') == '0.0'
+
+    page = ColumnarResults(['label', 'begin'])
+    page.add_values('label', ['c', 'b'])
+    page.add_values('begin', [3, 4])
+    results.extend(page)
+    assert len(results) == 5
+    assert results.value(4, 'label') == 'b'
+    assert results.data['label'].categories == ['aa', 'b', 'c']
+    assert results.value(3, 'begin') == 3.0
+
+def test_sort_and_filter_index():
+    results = ColumnarResults(['label', 'begin'])
+    results.add_values('label', ['ba', 'ab', 'b', None])
+    results.add_values('begin', [2, None, 0.5, 1])
+
+    assert list(sort_index(results, 'begin')) == [2, 3, 0, 1]
+    assert list(sort_index(results, 'begin', descending = True)) == [0, 3, 2, 1]
+    assert list(sort_index(results, 'label')) == [1, 2, 0, 3]
+
+    rows = sort_index(results, 'begin')
+    rows = filter_index(results, 'b', rows)
+    assert list(rows) == [2, 0, 1]
+    assert list(filter_index(results, 'ba', rows)) == [0]
+
+def test_numeric_display():
+    results = ColumnarResults(['count'])
+    results.add_values('count', [1, 2])
+    assert results.display(0, 'count') == '1'
+    page = ColumnarResults(['count'])
+    page.add_values('count', [2.5])
+    results.extend(page)
+    assert results.display(0, 'count') == '1.0'
+    assert results.display(2, 'count') == '2.5'
+
+def test_filter_numeric_columns():
+    results = ColumnarResults(['label', 'duration', 'count'])
+    results.add_values('label', ['a', 'b', 'c', 'd'])
+    results.add_values('duration', [0.1234, 1.5, None, 0.25])
+    results.add_values('count', [12, 3, 12, 7])
+    # Matched against the displayed strings, so rounded to three places
+    assert list(filter_index(results, '0.123')) == [0]
+    assert list(filter_index(results, '0.1234')) == []
+    assert list(filter_index(results, '12')) == [0, 2]
+    assert list(filter_index(results, '.5')) == [1]
+    rows = filter_index(results, '2')
+    assert list(rows) == [0, 2, 3]
+    assert list(filter_index(results, '25', rows)) == [3]
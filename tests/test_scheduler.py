@@ -0,0 +1,78 @@
+import pytest
+
+from speechtools.scheduler import JobScheduler
+
+def run_ready(scheduler):
+    jobs = scheduler.ready()
+    for job in jobs:
+        scheduler.start(job)
+    return jobs
+
+def test_dependencies():
+    scheduler = JobScheduler(max_concurrent = 4)
+    pauses = scheduler.add('pauses', 'corpus')
+    utterances = scheduler.add('utterances', 'corpus')
+    speech_rate = scheduler.add('speech_rate', 'corpus')
+    other = scheduler.add('lexicon', 'other')
+    assert utterances.depends == [pauses]
+    assert speech_rate.depends == [utterances]
+    assert other.depends == []
+
+    assert run_ready(scheduler) == [pauses, other]
+    assert scheduler.ready() == []
+    scheduler.finish(pauses)
+    assert run_ready(scheduler) == [utterances]
+    scheduler.finish(utterances)
+    assert run_ready(scheduler) == [speech_rate]
+
+def test_conflicting_writes_and_limit():
+    scheduler = JobScheduler(max_concurrent = 2)
+    lexicon = scheduler.add('lexicon', 'corpus', writes = [('graph', 'corpus'), ('step', 'lexicon')])
+    features = scheduler.add('features', 'corpus')
+    acoustics = scheduler.add('acoustic', 'corpus', writes = [('acoustics', 'corpus')])
+    other = scheduler.add('lexicon', 'other', writes = [('graph', 'other'), ('step', 'lexicon')])
+    last = scheduler.add('speakers', 'third')
+
+    # Features waits for the graph of the corpus, and the second lexicon
+    # job for the lexicon worker
+    assert run_ready(scheduler) == [lexicon, acoustics]
+    scheduler.finish(acoustics)
+    assert run_ready(scheduler) == [last]
+    scheduler.finish(lexicon)
+    assert run_ready(scheduler) == [features]
+    scheduler.finish(last)
+    assert run_ready(scheduler) == [other]
+
+def test_same_step_across_corpora():
+    scheduler = JobScheduler(max_concurrent = 4)
+    first = scheduler.add('pauses', 'a')
+    second = scheduler.add('pauses', 'b')
+    exports = [scheduler.add('export', 'a', writes = [('file', x)]) for x in ['1.csv', '2.csv']]
+    assert run_ready(scheduler) == [first, second] + exports
+
+def test_failure_cancels_dependents():
+    scheduler = JobScheduler()
+    pauses = scheduler.add('pauses', 'corpus')
+    utterances = scheduler.add('utterances', 'corpus')
+    speech_rate = scheduler.add('speech_rate', 'corpus')
+    position = scheduler.add('utterance_position', 'corpus')
+    run_ready(scheduler)
+    changed = scheduler.finish(pauses, 'failed', 'error')
+    assert set(changed) == {pauses, utterances, speech_rate, position}
+    assert speech_rate.state == 'cancelled'
+    assert scheduler.ready() == []
+    assert scheduler.pending() == []
+
+def test_graph():
+    scheduler = JobScheduler()
+    jobs = scheduler.add_graph([{'name': 'rate', 'step': 'speech_rate', 'after': ['utts']},
+                                {'name': 'utts', 'step': 'utterances', 'after': ['pauses']},
+                                {'name': 'pauses', 'step': 'pauses'}])
+    assert [x.step for x in jobs] == ['pauses', 'utterances', 'speech_rate']
+    assert jobs[2].depends == [jobs[1]]
+
+    with pytest.raises(ValueError):
+        scheduler.add_graph([{'name': 'a', 'step': 'pauses', 'after': ['b']},
+                            {'name': 'b', 'step': 'utterances', 'after': ['a']}])
+    with pytest.raises(ValueError):
+        scheduler.add_graph([{'name': 'a', 'step': 'pauses', 'after': ['c']}])
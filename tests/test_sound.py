@@ -0,0 +1,53 @@
+
+import numpy as np
+import pytest
+
+from scipy.io import wavfile
+
+from speechtools.sound import MappedSoundFile
+
+def test_mapped_sound_file(tmpdir):
+    path = str(tmpdir.join('test.wav'))
+    signal = (np.random.randn(16000 * 2, 2) * 3000).astype(np.int16)
+    wavfile.write(path, 16000, signal)
+
+    sound = MappedSoundFile(path)
+    assert sound.sr == 16000
+    assert sound.num_channels == 2
+    assert sound.duration == 2
+    assert sound.cached_begin == 0 and sound.cached_end == 2
+
+    samples = sound.samples(0.5, 1, channel = 1)
+    assert samples.shape[0] == 8000
+    assert np.shares_memory(samples, sound.signal)
+    assert np.array_equal(samples, signal[8000:16000, 1])
+
+    visible = sound.visible_signal(0.5, 1, 1)
+    assert np.allclose(visible, signal[8000:16000, 1] / 32768)
+    assert sound.visible_downsampled_1000(0, 1).shape[0] == 1000
+    assert sound.visible_preemph_signal(0, 1).shape[0] == 16000
+
+def test_downsampled_rate(tmpdir):
+    path = str(tmpdir.join('test.wav'))
+    wavfile.write(path, 44100, np.zeros(44100 * 2, dtype = np.int16))
+    sound = MappedSoundFile(path)
+    # 44100 is not a multiple of 1000, so every 44 samples are averaged
+    assert sound.downsampled_rate(1000) == 44100 / 44
+    data = sound.visible_downsampled_1000(0, 2)
+    assert data.shape[0] == 88200 // 44
+    assert np.isclose(data.shape[0] / sound.downsampled_rate(1000), 2, atol = 1e-3)
+
+def test_decode(tmpdir, monkeypatch):
+    soundfile = pytest.importorskip('soundfile')
+    from speechtools import sound
+    monkeypatch.setattr(sound, 'DECODED_DIR', str(tmpdir.join('decoded')))
+    path = str(tmpdir.join('test.flac'))
+    signal = np.random.RandomState(0).uniform(-0.5, 0.5, (16000, 2))
+    soundfile.write(path, signal, 16000)
+
+    wav_path = sound.decode(path)
+    assert wav_path.endswith('.wav')
+    assert sound.decode(path) == wav_path
+    mapped = MappedSoundFile(path)
+    assert mapped.sr == 16000 and mapped.num_channels == 2
+    assert np.allclose(mapped.visible_signal(0, 1, 1), signal[:, 1], atol = 1e-4)
@@ -0,0 +1,87 @@
+import contextlib
+
+from speechtools import tasks
+from speechtools.tasks import export_query
+
+class Column(object):
+    def __init__(self, name):
+        self.name = name
+
+class ExportProfile(object):
+    format = 'CSV'
+    compression = None
+    shard_by = None
+    max_connections = 2
+    columns = [Column('label'), Column('begin')]
+
+    def column_types(self, hierarchy, to_find):
+        return {}
+
+class Profile(object):
+    to_find = 'word'
+
+class Context(object):
+    hierarchy = None
+    speakers = ['s1', 's2']
+    discourses = ['d1', 'd2']
+
+def patch(monkeypatch, chunks):
+    @contextlib.contextmanager
+    def borrow_context(config):
+        yield Context()
+    def export_chunks(c, profile, export_profile, stop_check, page_size = None, shard = None):
+        for chunk in chunks(shard):
+            if stop_check():
+                return
+            yield chunk
+    monkeypatch.setattr(tasks, 'borrow_context', borrow_context)
+    monkeypatch.setattr(tasks, 'export_chunks', export_chunks)
+
+def export(tmpdir, stop_check):
+    path = tmpdir.join('out.csv')
+    result = export_query(None, Profile(), ExportProfile(), str(path), stop_check = stop_check)
+    return result, path
+
+def test_export_whole(tmpdir, monkeypatch):
+    patch(monkeypatch, lambda shard: [(['label', 'begin'], [['a', 0]]),
+                                        (['label', 'begin'], [['b', 1]])])
+    result, path = export(tmpdir, lambda: False)
+    assert result is True
+    assert path.read().splitlines() == ['label,begin', 'a,0', 'b,1']
+    assert tmpdir.listdir() == [path]
+
+def test_export_whole_cancelled(tmpdir, monkeypatch):
+    stopped = []
+    def chunks(shard):
+        yield ['label', 'begin'], [['a', 0]]
+        stopped.append(True)
+        yield ['label', 'begin'], [['b', 1]]
+    patch(monkeypatch, chunks)
+    result, path = export(tmpdir, lambda: bool(stopped))
+    assert result is False
+    # Neither the target nor the partial file is left behind
+    assert tmpdir.listdir() == []
+
+def shard_chunks(shard):
+    return [(['label', 'begin'], [[shard[1], 0]])]
+
+def test_export_sharded(tmpdir, monkeypatch):
+    patch(monkeypatch, shard_chunks)
+    monkeypatch.setattr(ExportProfile, 'shard_by', 'speaker')
+    result, path = export(tmpdir, lambda: False)
+    assert result is True
+    assert path.read().splitlines() == ['label,begin', 's1,0', 's2,0']
+    assert tmpdir.listdir() == [path]
+
+def test_export_sharded_cancelled(tmpdir, monkeypatch):
+    exported = []
+    def chunks(shard):
+        exported.append(shard)
+        return shard_chunks(shard)
+    patch(monkeypatch, chunks)
+    monkeypatch.setattr(ExportProfile, 'shard_by', 'speaker')
+    monkeypatch.setattr(ExportProfile, 'max_connections', 1)
+    # Cancelled once the first shard has finished
+    result, path = export(tmpdir, lambda: len(exported) > 1)
+    assert result is False
+    assert tmpdir.listdir() == []
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from speechtools.plot.tiles import compute_tile, TILE_COLUMNS
+from speechtools.plot.helper import spectrogram_window, scale_spectrum
+
+class Sound(object):
+    path = 'test.wav'
+    sr = 16000
+    def __init__(self, signal):
+        self.signal = signal
+
+    def padded_samples(self, start, stop, channel = 0):
+        data = np.zeros(stop - start)
+        lo = max(start, 0)
+        hi = min(stop, len(self.signal))
+        data[lo - start:hi - start] = self.signal[lo:hi]
+        return data
+
+def pre_emphasize(signal):
+    return np.append(signal[0], signal[1:] - 0.95 * signal[:-1])
+
+def reference_spectrogram(signal, n_fft, hop, win_len, window, color_scale):
+    """
+    Centred STFT of the whole signal, with the window and scaling of
+    SCTSpectrogramVisual._do_spec.
+    """
+    w = np.zeros(n_fft)
+    left = (n_fft - win_len) // 2
+    w[left:left + win_len] = spectrogram_window(win_len, window)
+    padded = np.pad(signal, n_fft // 2, mode = 'constant')
+    frames = np.array([padded[i:i + n_fft] for i in range(0, len(signal) + 1, hop)])
+    return scale_spectrum(np.abs(np.fft.rfft(frames * w, axis = 1)).T, color_scale)
+
+@pytest.mark.parametrize('window', ['gaussian', 'hann', 'hamming'])
+@pytest.mark.parametrize('color_scale', ['log', 'linear'])
+def test_tile_matches_spectrogram(window, color_scale):
+    n_fft, win_len, hop = 256, 200, 4
+    signal = np.random.RandomState(0).uniform(-1, 1, 3 * TILE_COLUMNS * hop)
+    tile = compute_tile(Sound(signal), ('test.wav', 0, n_fft, win_len, window,
+                                        color_scale, hop, 1))
+    expected = reference_spectrogram(pre_emphasize(signal), n_fft, hop, win_len, window, color_scale)
+    assert tile.shape == (n_fft // 2 + 1, TILE_COLUMNS)
+    assert np.allclose(tile, expected[:, TILE_COLUMNS:2 * TILE_COLUMNS], rtol = 1e-4, atol = 1e-4)
+
+def test_tile_matches_librosa():
+    stft = pytest.importorskip('librosa.core.spectrum').stft
+    n_fft, win_len, hop = 256, 200, 4
+    signal = np.random.RandomState(0).uniform(-1, 1, 3 * TILE_COLUMNS * hop)
+    tile = compute_tile(Sound(signal), ('test.wav', 0, n_fft, win_len, 'gaussian', 'log', hop, 1))
+    # As computed by _do_spec, whose reflected edges differ from tiles
+    data = stft(pre_emphasize(signal), n_fft = n_fft, hop_length = hop, center = True, win_length = win_len,
+                window = spectrogram_window(win_len, 'gaussian'))
+    expected = scale_spectrum(np.abs(data), 'log')
+    assert np.allclose(tile, expected[:, TILE_COLUMNS:2 * TILE_COLUMNS], rtol = 1e-4, atol = 1e-3)
+
+def test_windows():
+    assert not np.allclose(spectrogram_window(200, 'gaussian'), 1)
+    assert np.allclose(spectrogram_window(4, 'hann'), [0, 0.5, 1, 0.5])
+    assert np.allclose(scale_spectrum(np.array([1., 10.]), 'log'), [0, 20])
+    assert np.allclose(scale_spectrum(np.array([1., 10.]), 'linear'), [1, 10])
@@ -0,0 +1,108 @@
+import csv
+
+import pytest
+
+from polyglotdb.exceptions import PGError
+
+from speechtools.writers import export_formats, infer_type, coerce
+
+columns = ['label', 'duration', 'count', 'stressed']
+types = [str, None, int, None]
+chunks = [[['á', 1, 1, True], ['b', 2, None, False]],
+        [['a much longer label than any in the first chunk' * 3, 2.5, 3, None]]]
+
+def write(format, path, **kwargs):
+    writer = export_formats[format](path, columns, types = types, **kwargs)
+    with writer:
+        for chunk in chunks:
+            writer.write_rows(chunk)
+    assert writer.num_rows == 3
+    return writer
+
+def check_frame(frame):
+    assert list(frame.columns) == columns
+    assert list(frame['label'])[:2] == ['á', 'b']
+    assert list(frame['label'])[2] == chunks[1][0][0]
+    # Whole numbers in the first chunk do not truncate later fractions
+    assert list(frame['duration']) == [1.0, 2.0, 2.5]
+    assert frame['count'][0] == 1 and frame['count'][2] == 3
+
+def test_infer_type():
+    assert infer_type([1, 2, None]) is float
+    assert infer_type([1.5, 2]) is float
+    assert infer_type([True, None]) is bool
+    assert infer_type(['a', 1]) is str
+    assert infer_type([None]) is str
+
+def test_csv(tmpdir):
+    path = str(tmpdir.join('out.csv'))
+    write('CSV', path)
+    with open(path, newline = '', encoding = 'utf8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == columns
+    assert rows[1] == ['á', '1', '1', 'True']
+    assert rows[3][:2] == [chunks[1][0][0], '2.5']
+
+@pytest.mark.parametrize('format', ['Parquet', 'Feather'])
+def test_arrow(tmpdir, format):
+    pytest.importorskip('pyarrow')
+    path = str(tmpdir.join('out'))
+    write(format, path)
+    if format == 'Parquet':
+        import pyarrow.parquet
+        table = pyarrow.parquet.read_table(path)
+    else:
+        import pyarrow.feather
+        table = pyarrow.feather.read_table(path)
+    frame = table.to_pandas()
+    check_frame(frame)
+    assert list(frame['stressed'][:2]) == [True, False]
+    assert frame['stressed'][2] is None
+
+def test_hdf5(tmpdir):
+    pandas = pytest.importorskip('pandas')
+    pytest.importorskip('tables')
+    path = str(tmpdir.join('out.h5'))
+    write('HDF5', path, compression = 'zlib')
+    frame = pandas.read_hdf(path, 'results')
+    check_frame(frame)
+    assert list(frame['stressed'][:2]) == [1.0, 0.0]
+    # Only the export itself is left in the directory
+    assert tmpdir.listdir() == [tmpdir.join('out.h5')]
+
+@pytest.mark.parametrize('format', ['Parquet', 'Feather', 'HDF5'])
+def test_empty(tmpdir, format):
+    pytest.importorskip('pyarrow')
+    pytest.importorskip('tables')
+    path = str(tmpdir.join('out'))
+    writer = export_formats[format](path, columns, types = types)
+    with writer:
+        pass
+    assert writer.num_rows == 0
+    assert tmpdir.join('out').check()
+
+def test_coerce():
+    assert coerce(2, float, 'duration') == 2.0
+    assert coerce(3.0, int, 'count') == 3
+    assert coerce(None, bool, 'stressed') is None
+    for value, t in [('n/a', float), (2.5, int), ('yes', bool), (1, bool), (True, float)]:
+        with pytest.raises(PGError) as e:
+            coerce(value, t, 'column')
+        assert 'column' in str(e.value) and repr(value) in str(e.value)
+
+@pytest.mark.parametrize('format', ['Parquet', 'Feather', 'HDF5'])
+@pytest.mark.parametrize('i, value', [(1, 'n/a'), (2, 2.5), (3, 'yes')])
+def test_type_change_after_first_chunk(tmpdir, format, i, value):
+    pytest.importorskip('pyarrow')
+    pytest.importorskip('tables')
+    writer = export_formats[format](str(tmpdir.join('out')), columns, types = types)
+    row = ['c', 1.5, 2, False]
+    row[i] = value
+    with writer:
+        writer.write_rows(chunks[0])
+        # Inferred, hierarchy and boolean columns do not turn values that
+        # do not fit into missing ones
+        with pytest.raises(PGError) as e:
+            writer.write_rows([row])
+    assert columns[i] in str(e.value)
+    assert writer.num_rows == 2